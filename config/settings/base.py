@@ -226,6 +226,14 @@ IMPORT_REPO_PATH.mkdir(parents=True, exist_ok=True)
 
 IMPORT_SUB_DIRECTORY = "ddionrails/"
 
+# Load the largest tables with PostgreSQL COPY through a staging table
+IMPORT_COPY_LOADER = os.getenv("IMPORT_COPY_LOADER") == "True"
+
+# Number of worker processes for parallel imports: studies in the update command,
+# the per file dataset and instrument JSON imports without redis and the
+# reading of statistics files
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", default="1"))
+
 # Django RQ
 RQ_SHOW_ADMIN_LINK = True
 
@@ -2,15 +2,28 @@
 
 """ Views for ddionrails.api app """
 
-from typing import Any, Dict
+import hashlib
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlencode
 
+from django.core.files import File
 from django.db.models import QuerySet
-from django.http.response import Http404, HttpResponse
+from django.http.response import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseBase,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.cache import cache_page
-from rest_framework import viewsets
-from rest_framework.exceptions import NotAcceptable
+from rest_framework import status, viewsets
+from rest_framework.exceptions import NotAcceptable, ValidationError
 from rest_framework.request import Request
 from rest_framework.response import Response
 
@@ -22,9 +35,20 @@ from ddionrails.api.serializers import (
 from ddionrails.concepts.models import Concept, Topic
 from ddionrails.data.models.dataset import Dataset
 from ddionrails.data.models.variable import Variable
+from ddionrails.statistics.columns import (
+    build_column_store,
+    select_rows,
+    slice_columns,
+    to_csv,
+)
+from ddionrails.statistics.files import encoded_name, preferred_encoding
 from ddionrails.statistics.models import StatisticsMetadata, VariableStatistic
 from ddionrails.studies.models import Study
 
+# Query parameters of the statistic API, that select a part of the data
+SLICE_PARAMETERS = ("start_year", "end_year", "filter", "columns")
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
 
 class StatisticsMetadataViewSet(viewsets.GenericViewSet):
     """List metadata for a variables statistical data."""
@@ -45,12 +69,21 @@ class StatisticsMetadataViewSet(viewsets.GenericViewSet):
 
 
 class StatisticViewSet(viewsets.GenericViewSet):
-    """Display the statistical data in form of csv files."""
+    """Display the statistical data in form of csv files.
+
+    Besides the statistic, selected by variable, type and dimensions, the
+    following query parameters select a part of its data:
+
+    start_year, end_year: The range of years to include.
+    filter: The values of a dimension as "dimension:value", can be repeated.
+    columns: Comma separated names of the columns to include.
+    format: "json" returns the selected data as an object of columns.
+    """
 
     queryset = VariableStatistic.objects.all()
 
     @staticmethod
-    def list(request: Request) -> HttpResponse:
+    def list(request: Request) -> HttpResponseBase:
         """Retrieve the statistical data in form of csv files."""
         variable_id = request.query_params.get("variable", None)
         if (
@@ -67,14 +100,168 @@ class StatisticViewSet(viewsets.GenericViewSet):
             independent_variable_names=dimensions,
             plot_type=_type,
         )
-        with variable_statistic.statistics.open("r") as file:
-            content = file.read()
-        response = HttpResponse(content, content_type="text/csv")
-        response["Content-Disposition"] = f"attachement; filename={variable.name}.csv"
-
+        as_json = request.query_params.get("format", None) == "json"
+        if not as_json and not set(SLICE_PARAMETERS) & set(request.query_params):
+            return _file_response(request, variable_statistic, variable.name)
+        etag = _slice_etag(variable_statistic, request)
+        if etag and _not_modified(request, etag):
+            return HttpResponseNotModified(headers={"ETag": etag})
+        table = _slice_statistic(variable_statistic, request)
+        response: HttpResponse
+        if as_json:
+            response = Response(table)
+        else:
+            response = HttpResponse(to_csv(table), content_type="text/csv")
+            response["Content-Disposition"] = f"attachement; filename={variable.name}.csv"
+        if etag:
+            response["ETag"] = etag
         return response
 
 
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match", "")
+    return etag in parse_etags(if_none_match) or if_none_match.strip() == "*"
+
+
+def _slice_etag(variable_statistic: VariableStatistic, request: Request) -> str:
+    """Identify a slice by the digest of its file and the query parameters."""
+    if not variable_statistic.digest:
+        return ""
+    parameters = urlencode(sorted(request.query_params.lists()), doseq=True)
+    return quote_etag(
+        variable_statistic.digest
+        + "-"
+        + hashlib.sha256(parameters.encode("utf8")).hexdigest()[:16]
+    )
+
+
+def _file_response(
+    request: Request, variable_statistic: VariableStatistic, filename: str
+) -> HttpResponseBase:
+    """Stream the stored statistics file.
+
+    A precompressed variant is used, if the client accepts its content coding.
+    Every variant has a strong ETag based on the digest of the file. Single
+    byte ranges of the selected variant are supported.
+    """
+    storage = variable_statistic.statistics.storage
+    name = variable_statistic.statistics.name
+    encoding = preferred_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding and not storage.exists(encoded_name(name, encoding)):
+        encoding = None
+    headers = {"Accept-Ranges": "bytes", "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    etag = ""
+    if variable_statistic.digest:
+        etag = quote_etag(
+            variable_statistic.digest + (f".{encoding}" if encoding else "")
+        )
+        headers["ETag"] = etag
+        if _not_modified(request, etag):
+            return HttpResponseNotModified(headers=headers)
+
+    file = storage.open(encoded_name(name, encoding), "rb")
+    size = file.size
+    byte_range = _requested_range(request, etag, size)
+    if byte_range is None:
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=f"{filename}.csv",
+            content_type="text/csv",
+            headers=headers,
+        )
+    start, end = byte_range
+    if start >= size:
+        file.close()
+        headers["Content-Range"] = f"bytes */{size}"
+        return HttpResponse(
+            status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers
+        )
+    headers["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingHttpResponse(
+        _read_range(file, start, end),
+        status=status.HTTP_206_PARTIAL_CONTENT,
+        content_type="text/csv",
+        headers=headers,
+    )
+
+
+def _requested_range(request: Request, etag: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single byte range into its first and last position.
+
+    Returns None for the whole file, e.g. if the Range header is missing,
+    has several ranges or If-Range does not match the current ETag.
+    """
+    match = BYTE_RANGE.match(request.headers.get("Range", "").replace(" ", ""))
+    if not match or match.group(0) == "bytes=-":
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range is not None and (not etag or if_range != etag):
+        return None
+    first, last = match.groups()
+    if not first:
+        # A suffix range: the last bytes of the file.
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _read_range(file: File, start: int, end: int) -> Iterator[bytes]:
+    with file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(FileResponse.block_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _year_parameter(request: Request, name: str) -> Optional[int]:
+    value = request.query_params.get(name, "")
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError as error:
+        raise ValidationError({name: "Has to be a year."}) from error
+
+
+def _slice_statistic(
+    variable_statistic: VariableStatistic, request: Request
+) -> Dict[str, List[Any]]:
+    """Select the rows and columns of a statistic requested by the query parameters."""
+    store = variable_statistic.columns
+    if not store:
+        # Statistics imported before their columns were stored.
+        with variable_statistic.statistics.open("rb") as file:
+            store = build_column_store(file.read())
+    filters: Dict[str, Set[str]] = defaultdict(set)
+    for value_filter in request.query_params.getlist("filter"):
+        dimension, separator, value = value_filter.partition(":")
+        if not separator:
+            raise ValidationError({"filter": 'Has to be "dimension:value".'})
+        filters[dimension].add(value)
+    columns = request.query_params.get("columns", "")
+    try:
+        positions = select_rows(
+            store,
+            start_year=_year_parameter(request, "start_year"),
+            end_year=_year_parameter(request, "end_year"),
+            filters=filters,
+        )
+        return slice_columns(store, positions, columns.split(",") if columns else None)
+    except KeyError as error:
+        raise ValidationError(f"Unknown column: {error.args[0]}") from error
+
+
 class VariableViewSet(viewsets.ModelViewSet):  # pylint: disable=too-many-ancestors
     """List metadata about all variables."""
 
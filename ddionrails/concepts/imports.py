@@ -3,11 +3,15 @@
 """ Importer classes for ddionrails.concepts app """
 
 import json
+from typing import Dict, List
+from uuid import UUID
 
 from django.db.transaction import atomic
 
 from ddionrails.concepts.models import Concept
 from ddionrails.imports import imports
+from ddionrails.imports.delta import DigestStore, row_digest
+from ddionrails.imports.helpers import hash_with_base_uuid
 from ddionrails.studies.models import Study
 
 from .forms import (
@@ -61,12 +65,40 @@ class TopicJsonImport(imports.Import):
 
 
 class ConceptImport(imports.CSVImport):
+    """Import Concepts and link them to the Topics of a study.
+
+    Only concepts whose rows changed since the previous import are written.
+    Concepts are shared between studies, so concepts that disappear from the
+    file are never deleted.
+    """
+
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = ConceptForm
 
     @atomic
     def execute_import(self):
-        super().execute_import()
+        concept_rows: Dict[UUID, List[Dict[str, str]]] = {}
+        for element in self.content:
+            concept_name = element.get("name", "")
+            if not concept_name:
+                continue
+            concept_id = hash_with_base_uuid("concept:" + concept_name, cache=False)
+            concept_rows.setdefault(concept_id, []).append(element)
+
+        digest_store = DigestStore(self.study, "concepts", Concept)
+        digests = {
+            concept_id: row_digest(*rows) for concept_id, rows in concept_rows.items()
+        }
+        changed_concepts = digest_store.changed(digests)
+        for concept_id, rows in concept_rows.items():
+            if concept_id not in changed_concepts:
+                continue
+            for element in rows:
+                self.import_element(element)
+        digest_store.save(
+            {concept_id: digests[concept_id] for concept_id in changed_concepts}
+        )
+        digest_store.forget(digest_store.deleted())
 
     def import_element(self, element):
         concept_name = element.get("name", "")
@@ -93,6 +125,8 @@ class ConceptImport(imports.CSVImport):
 
 
 class AnalysisUnitImport(imports.CSVImport):
+    batch_import = True
+
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = AnalysisUnitForm
 
@@ -102,6 +136,8 @@ class AnalysisUnitImport(imports.CSVImport):
 
 
 class PeriodImport(imports.CSVImport):
+    batch_import = True
+
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = PeriodForm
 
@@ -111,6 +147,8 @@ class PeriodImport(imports.CSVImport):
 
 
 class ConceptualDatasetImport(imports.CSVImport):
+    batch_import = True
+
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = ConceptualDatasetForm
 
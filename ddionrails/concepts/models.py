@@ -81,13 +81,15 @@ class Topic(models.Model, ModelMixin):
         help_text="Foreign key to concepts.Topic",
     )
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_namespace_uuid(self.study_id, self.name, cache=cache)
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
         """ "Set id and call parents save()."""
-        self.id = hash_with_namespace_uuid(  # pylint: disable=C0103
-            self.study_id, self.name, cache=False
-        )
+        self.id = self.generate_id()  # pylint: disable=C0103
         super().save(
             force_insert=force_insert,
             force_update=force_update,
@@ -189,6 +191,10 @@ class Concept(ModelMixin, models.Model):
         """Returns a string representation using the "name" field"""
         return f"/concept/{self.name}"
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_base_uuid("concept:" + self.name, cache=cache)
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
@@ -202,9 +208,7 @@ class Concept(ModelMixin, models.Model):
         happen, it is circumvented by concatenating each name with the
         literal string `concept:`.
         """
-        self.id = hash_with_base_uuid(  # pylint: disable=C0103
-            "concept:" + self.name, cache=False
-        )
+        self.id = self.generate_id()  # pylint: disable=C0103
         super().save(
             force_insert=force_insert,
             force_update=force_update,
@@ -291,13 +295,15 @@ class Period(models.Model, ModelMixin):
         """Returns a string representation using the "name" field"""
         return f"/period/{self.name}"
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_namespace_uuid(self.study_id, self.name, cache=cache)
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
         """ "Set id and call parents save()."""
-        self.id = hash_with_namespace_uuid(  # pylint: disable=C0103
-            self.study_id, self.name, cache=False
-        )
+        self.id = self.generate_id()  # pylint: disable=C0103
         super().save(
             force_insert=force_insert,
             force_update=force_update,
@@ -374,13 +380,15 @@ class AnalysisUnit(models.Model, ModelMixin):
         """Returns a string representation using the "name" field"""
         return f"/analysis_unit/{self.name}"
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_namespace_uuid(self.study_id, self.name, cache=cache)
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
         """ "Set id and call parents save()."""
-        self.id = hash_with_namespace_uuid(  # pylint: disable=C0103
-            self.study_id, self.name, cache=False
-        )
+        self.id = self.generate_id()  # pylint: disable=C0103
         super().save(
             force_insert=force_insert,
             force_update=force_update,
@@ -454,13 +462,15 @@ class ConceptualDataset(models.Model, ModelMixin):
         """Returns a string representation using the "name" field"""
         return f"/conceptual_dataset/{self.name}"
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_namespace_uuid(self.study_id, self.name, cache=cache)
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
         """Set id and call parents save()."""
-        self.id = hash_with_namespace_uuid(  # pylint: disable=C0103
-            self.study_id, self.name, cache=False
-        )
+        self.id = self.generate_id()  # pylint: disable=C0103
         super().save(
             force_insert=force_insert,
             force_update=force_update,
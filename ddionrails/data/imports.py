@@ -2,45 +2,87 @@
 
 """ Importer classes for ddionrails.data app """
 
-import json
 from collections import OrderedDict
-from csv import DictReader
-from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Tuple, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from uuid import UUID
 
 from django.db.transaction import atomic
 
 from ddionrails.concepts.models import AnalysisUnit, Concept, ConceptualDataset, Period
 from ddionrails.imports import imports
+from ddionrails.imports.delta import DigestStore, row_digest
+from ddionrails.imports.helpers import BULK_BATCH_SIZE, chunks, hash_with_namespace_uuid
+from ddionrails.imports.json_stream import iter_json_items
+from ddionrails.imports.shadow import current_shadow_schema, use_live_schema
+from ddionrails.imports.sources import read_source
+from ddionrails.imports.staging import copy_loader_enabled, copy_upsert
 from ddionrails.studies.models import Study
 
 from .forms import DatasetForm, VariableForm
 from .models import Dataset, Transformation, Variable
 
+# The id of a variable together with its study, dataset and variable name
+VariableReference = Tuple[UUID, Tuple[str, str, str]]
 
-class DatasetJsonImport(imports.Import):
-    """Import Variable data from JSON files."""
+
+class DatasetJsonImport(imports.StreamingJSONImport):
+    """Import Variable data from JSON files.
+
+    The variables are decoded and written in chunks, so large files are
+    never held in memory as a whole.
+    """
 
     def execute_import(self):
-        self.content = json.JSONDecoder(object_pairs_hook=OrderedDict).decode(
-            self.content
-        )
-        self._import_dataset(self.name, self.content)
+        with self.open_content() as content:
+            self._import_dataset(
+                self.name, (variable for _, variable in iter_json_items(content))
+            )
 
-    def _import_dataset(self, name, content: Union[Dict, List]):
+    def _import_dataset(self, name, content: Union[Dict, Iterable]):
         dataset, _ = Dataset.objects.get_or_create(study=self.study, name=name)
-        sort_id = 0
         if isinstance(content, dict):
-            content = list(content.values())
-        for var in content:
-            self._import_variable(var, dataset, sort_id)
-            sort_id += 1
+            content = content.values()
+        variables = (
+            self._build_variable(var, dataset, sort_id)
+            for sort_id, var in enumerate(content)
+        )
+        for chunk in chunks(variables):
+            self._write_variables(chunk)
+
+    @classmethod
+    def _import_variable(cls, var, dataset, sort_id):
+        cls._write_variables([cls._build_variable(var, dataset, sort_id)])
 
     @staticmethod
-    def _import_variable(var, dataset, sort_id):
+    def _write_variables(variables: List[Tuple[Variable, Tuple[str, ...]]]) -> None:
+        """Upsert variables in bulk.
+
+        Fields missing from the JSON of a variable are not overwritten, so the
+        variables are written in groups, that update the same fields.
+        """
+        unique = {variable.id: (variable, fields) for variable, fields in variables}
+        groups: Dict[Tuple[str, ...], List[Variable]] = {}
+        for variable, fields in unique.values():
+            groups.setdefault(fields, []).append(variable)
+        for fields, group in groups.items():
+            Variable.objects.bulk_create(
+                group,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=list(fields),
+            )
+
+    @staticmethod
+    def _build_variable(
+        var, dataset: Dataset, sort_id: int
+    ) -> Tuple[Variable, Tuple[str, ...]]:
+        """Create a variable from its JSON and list the fields it sets."""
         name = var.get("name", var.get("variable"))
-        variable, _ = Variable.objects.get_or_create(name=name, dataset=dataset)
+        variable = Variable(name=name, dataset=dataset, period_id=dataset.period_id)
+        variable.id = variable.generate_id()
+        fields = ["sort_id", "label", "label_de", "scale", "period_id"]
         variable.sort_id = sort_id
         variable.label = var.get("label", name)
         variable.label_de = var.get("label_de", name)
@@ -52,12 +94,14 @@ class DatasetJsonImport(imports.Import):
             else:
                 statistics = var["statistics"]
             variable.statistics = statistics
+            fields.append("statistics")
         if "categories" in var:
             values = var["categories"].get("values")
             if values and len(values) > 0:
                 variable.categories = var["categories"]
+                fields.append("categories")
         variable.scale = var.get("scale", "")
-        variable.save()
+        return variable, tuple(fields)
 
 
 class DatasetImport(imports.CSVImport):
@@ -102,12 +146,41 @@ class DatasetImport(imports.CSVImport):
         dataset.save()
 
 
-class VariableImport(imports.CSVImport):
-    """Import Variable data from csv file."""
+VARIABLE_CSV_FIELDS = [
+    "concept",
+    "description",
+    "description_de",
+    "description_long",
+    "image_url",
+    "statistics_type",
+    "statistics_flag",
+    "label",
+    "label_de",
+    "period",
+]
+
+
+class VariableImport(imports.StreamingCSVImport):
+    """Import Variable data from csv file.
+
+    Rows are streamed and processed in chunks, each committed on its own.
+    Datasets are resolved once per import and concepts once per chunk.
+    Variable ids are computed the same way Variable.save() computes them, so
+    each chunk costs a constant number of queries instead of several queries
+    per row.
+
+    Only rows whose content differs from the previous import are written.
+    Variables that were removed from the file since then are deleted.
+    """
 
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = VariableForm
 
+    def __init__(self, filename, study=None, system=None):
+        super().__init__(filename, study, system)
+        self.datasets: Dict[str, Dataset] = {}
+        self.digest_store = DigestStore(study, "variables", Variable)
+
     def import_element(self, element):
         variable_metadata = element
         if "name" not in variable_metadata.keys():
@@ -127,8 +200,106 @@ class VariableImport(imports.CSVImport):
             )
 
     def execute_import(self):
-        for row in self.content:
-            self.import_element(row)
+        self.datasets = {
+            dataset.name: dataset for dataset in Dataset.objects.filter(study=self.study)
+        }
+        self.digest_store = DigestStore(self.study, "variables", Variable)
+        super().execute_import()
+        deleted_variables = self.digest_store.deleted()
+        with atomic():
+            for variable_ids in chunks(deleted_variables):
+                Variable.objects.filter(id__in=variable_ids).delete()
+            self.digest_store.forget(deleted_variables)
+
+    def import_chunk(self, rows: List[Dict[str, str]]) -> None:
+        self._import_variables(rows, self.datasets, self.digest_store)
+
+    def skip_chunk(self, rows: List[Dict[str, str]]) -> None:
+        # Variables of committed chunks must not be deleted as removed variables.
+        self.digest_store.seen.update(self._variable_rows(rows, self.datasets).keys())
+
+    def _import_variables(
+        self,
+        rows: List[Dict[str, str]],
+        datasets: Dict[str, Dataset],
+        digest_store: DigestStore,
+    ) -> None:
+        """Create or update the changed variables of one chunk with bulk queries."""
+        concept_names = {self._concept_name(row) for row in rows}
+        concept_names.discard("")
+        concepts = {
+            concept.name: concept
+            for concept in Concept.objects.filter(name__in=concept_names)
+        }
+
+        variables = self._variable_rows(rows, datasets)
+        digests = {
+            variable_id: row_digest(row, dataset.period_id)
+            for variable_id, (row, dataset) in variables.items()
+        }
+        changed_variables = digest_store.changed(digests)
+        variables = {
+            variable_id: variable
+            for variable_id, variable in variables.items()
+            if variable_id in changed_variables
+        }
+        if not variables:
+            return
+
+        existing_variables = Variable.objects.in_bulk(list(variables.keys()))
+        new_variables = []
+        updated_variables = []
+        for variable_id, (row, dataset) in variables.items():
+            if variable_id in existing_variables:
+                variable = existing_variables[variable_id]
+                updated_variables.append(variable)
+            else:
+                variable = Variable(id=variable_id, name=row["name"], dataset=dataset)
+                new_variables.append(variable)
+            concept_name = self._concept_name(row)
+            if concept_name and concept_name not in concepts:
+                raise Concept.DoesNotExist(
+                    f'Failed to import variable "{row["name"]}" '
+                    f'from dataset "{dataset.name}": '
+                    f'Concept "{concept_name}" does not exist.'
+                )
+            self._set_variable_fields(variable, row, concepts.get(concept_name))
+            variable.period_id = dataset.period_id
+
+        if copy_loader_enabled():
+            copy_upsert(Variable, new_variables + updated_variables, VARIABLE_CSV_FIELDS)
+        else:
+            Variable.objects.bulk_create(new_variables, batch_size=BULK_BATCH_SIZE)
+            Variable.objects.bulk_update(
+                updated_variables, VARIABLE_CSV_FIELDS, batch_size=BULK_BATCH_SIZE
+            )
+        digest_store.save(
+            {variable_id: digests[variable_id] for variable_id in variables.keys()}
+        )
+
+    @staticmethod
+    def _variable_rows(
+        rows: List[Dict[str, str]], datasets: Dict[str, Dataset]
+    ) -> Dict[UUID, Tuple[Dict[str, str], Dataset]]:
+        """Map the rows of a chunk to the ids of the variables they describe."""
+        variables: Dict[UUID, Tuple[Dict[str, str], Dataset]] = {}
+        for row in rows:
+            if "name" not in row.keys():
+                row["name"] = row.get("variable_name")
+            dataset_name = row.get("dataset", row.get("dataset_name"))
+            if dataset_name not in datasets:
+                raise Dataset.DoesNotExist(
+                    f'Failed to import variable "{row["name"]}" '
+                    f'from dataset "{dataset_name}"'
+                )
+            dataset = datasets[dataset_name]
+            variable_id = hash_with_namespace_uuid(dataset.id, row["name"], cache=False)
+            variables[variable_id] = (row, dataset)
+        return variables
+
+    @staticmethod
+    def _concept_name(element: Dict[str, str]) -> str:
+        return element.get("concept", element.get("concept_name", "")) or ""
 
     def _import_variable(self, element):
         dataset = Dataset.objects.get(
@@ -137,9 +308,19 @@ class VariableImport(imports.CSVImport):
         variable, _ = Variable.objects.get_or_create(
             dataset=dataset, dataset__study=self.study, name=element["name"]
         )
-        concept_name = element.get("concept", element.get("concept_name", ""))
+        concept_name = self._concept_name(element)
+        concept = None
         if concept_name != "":
             concept = Concept.objects.get(name=concept_name)
+        self._set_variable_fields(variable, element, concept)
+        variable.save()
+
+    @staticmethod
+    def _set_variable_fields(
+        variable: Variable, element: Dict[str, str], concept: Optional[Concept]
+    ) -> None:
+        """Copy the variables.csv metadata of a single row onto a Variable."""
+        if concept is not None:
             variable.concept = concept
         variable.description = element.get("description", "")
         variable.description_de = element.get("description_de", "")
@@ -151,11 +332,18 @@ class VariableImport(imports.CSVImport):
             variable.label = element.get("label", "")
         if not variable.label_de:
             variable.label_de = element.get("label_de", "")
-        variable.save()
 
 
 class TransformationImport(imports.CSVImport):
-    """Import Object relations from the transformations.csv file."""
+    """Import Object relations from the transformations.csv file.
+
+    Variable ids are derived from the study, dataset and variable names,
+    so every chunk of rows needs a single query to check that they exist.
+    During a clean import, variables of other studies are only found in the
+    live tables, they are looked up by a second query.
+    """
+
+    batch_import = True
 
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = VariableForm
@@ -165,14 +353,43 @@ class TransformationImport(imports.CSVImport):
         return super().execute_import()
 
     def import_element(self, element):
-
-        origin, target = self._get_origin_and_target(element)
-        Transformation.objects.get_or_create(origin=origin, target=target)
+        self.import_batch([element])
+
+    def import_batch(self, elements: List[Dict[str, str]]) -> List[Transformation]:
+        """Link the origin and target variables of a chunk of rows."""
+        variables = [self._get_origin_and_target(element) for element in elements]
+        ids = {
+            variable_id
+            for origin, target in variables
+            for variable_id, _ in (origin, target)
+        }
+        existing = set(Variable.objects.filter(id__in=ids).values_list("id", flat=True))
+        if current_shadow_schema() and ids - existing:
+            with use_live_schema():
+                existing.update(
+                    Variable.objects.filter(id__in=ids - existing)
+                    .exclude(dataset__study=self.study)
+                    .values_list("id", flat=True)
+                )
+        transformations: Dict[Tuple[UUID, UUID], Transformation] = {}
+        for origin, target in variables:
+            for (variable_id, names), _type in ((origin, "Origin"), (target, "Target")):
+                if variable_id not in existing:
+                    raise Variable.DoesNotExist(
+                        f"{_type} variable {'/'.join(names)} does not exist."
+                    )
+            transformations[(origin[0], target[0])] = Transformation(
+                origin_id=origin[0], target_id=target[0]
+            )
+        Transformation.objects.bulk_create(
+            transformations.values(), batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+        )
+        return list(transformations.values())
 
     @classmethod
     def _get_origin_and_target(
         cls, metadata: Dict[str, str]
-    ) -> Tuple[Variable, Variable]:
+    ) -> Tuple[VariableReference, VariableReference]:
         origin, target = ({}, {})
         origin["study"] = metadata.get("origin_study", metadata.get("origin_study_name"))
 
@@ -191,50 +408,55 @@ class TransformationImport(imports.CSVImport):
             "target_variable", metadata.get("target_variable_name")
         )
 
-        origin_variable = cls._get_variable(
-            origin["study"], origin["dataset"], origin["variable"], "Origin"
+        origin_variable = cls._get_variable_id(
+            origin["study"], origin["dataset"], origin["variable"]
         )
-        target_variable = cls._get_variable(
-            target["study"], target["dataset"], target["variable"], "Target"
+        target_variable = cls._get_variable_id(
+            target["study"], target["dataset"], target["variable"]
         )
         return (origin_variable, target_variable)
 
     @staticmethod
-    @lru_cache(maxsize=100)
-    def _get_variable(study, dataset, name, _type):
-        try:
-            _variable = (
-                Variable.objects.filter(dataset__study__name=study)
-                .filter(dataset__name=dataset)
-                .get(name=name)
-            )
-        except BaseException as error:
-            raise type(error)(
-                (f"{_type} variable " f"{study}/{dataset}/{name} does not exist.")
-            )
-        return _variable
+    def _get_variable_id(
+        study: Optional[str], dataset: Optional[str], name: Optional[str]
+    ) -> VariableReference:
+        """Derive the id of a variable like Study, Dataset and Variable.save do."""
+        study_id = Study(name=study or "").generate_id(cache=True)
+        dataset_id = Dataset(study_id=study_id, name=dataset or "").generate_id(
+            cache=True
+        )
+        variable_id = Variable(dataset_id=dataset_id, name=name or "").generate_id()
+        return variable_id, (str(study), str(dataset), str(name))
 
 
 def variables_images_import(file: Path, study: Study) -> None:
     "Initiate imports of all question images"
     if not file.exists():
         return
-    with open(file, "r", encoding="utf8") as csv:
-        reader = DictReader(csv)
-        variables: List[Variable] = []
-        for index, row in enumerate(reader):
-            variable = Variable.objects.get(
-                dataset__study=study,
-                dataset__name=row["dataset"],
-                name=row["variable"],
+    for rows in chunks(read_source(file)):
+        variables: Dict[UUID, Variable] = {}
+        sources: Dict[UUID, Dict[str, str]] = {}
+        for row in rows:
+            dataset_id = Dataset(study_id=study.id, name=row["dataset"]).generate_id(
+                cache=True
             )
+            variable = Variable(dataset_id=dataset_id, name=row["variable"])
+            variable.id = variable.generate_id()
             variable.images = {
                 "de": row["url_de"],
                 "en": row["url"],
             }
-            variables.append(variable)
-            if index % 1000:
-                Variable.objects.bulk_update(variables, ["images"])
-                variables = []
-        if variables:
-            Variable.objects.bulk_update(variables, ["images"])
+            variables[variable.id] = variable
+            sources[variable.id] = row
+        existing = set(
+            Variable.objects.filter(id__in=variables.keys()).values_list("id", flat=True)
+        )
+        for variable_id, row in sources.items():
+            if variable_id not in existing:
+                raise Variable.DoesNotExist(
+                    f"Variable {study.name}/{row['dataset']}/{row['variable']} "
+                    "does not exist."
+                )
+        Variable.objects.bulk_update(
+            variables.values(), ["images"], batch_size=BULK_BATCH_SIZE
+        )
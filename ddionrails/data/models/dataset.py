@@ -107,13 +107,15 @@ class Dataset(ModelMixin, models.Model):
         help_text="Foreign key to concepts.AnalysisUnit",
     )
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_namespace_uuid(self.study_id, self.name, cache=cache)
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
         """ "Set id and call parents save()."""
-        self.id = hash_with_namespace_uuid(  # pylint: disable=C0103
-            self.study_id, self.name, cache=False
-        )
+        self.id = self.generate_id()  # pylint: disable=C0103
         super().save(
             force_insert=force_insert,
             force_update=force_update,
@@ -149,13 +149,15 @@ class Variable(ModelMixin, models.Model):
     related_cache: Optional[Cache] = None
     languages: List[str] = []
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_namespace_uuid(self.dataset_id, self.name, cache=cache)
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
         """ "Set id and call parents save()."""
-        self.id = hash_with_namespace_uuid(  # pylint: disable=C0103
-            self.dataset_id, self.name, cache=False
-        )
+        self.id = self.generate_id()  # pylint: disable=C0103
         # Disable attribute-defined-outside-init warning.
         # Django magic defines _id fields.
         self.period_id = self.dataset.period_id  # pylint: disable=W0201
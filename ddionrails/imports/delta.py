@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+""" Row level change detection for importers of the ddionrails project """
+
+import json
+from hashlib import sha256
+from typing import Any, Dict, Iterable, Optional, Set, Type
+from uuid import UUID
+
+from django.db import models
+
+from ddionrails.studies.models import Study
+
+from .helpers import BULK_BATCH_SIZE, chunks
+from .models import RowDigest
+
+
+def row_digest(*rows: Any) -> str:
+    """Compute a stable SHA-256 digest for the source rows of a single object.
+
+    Surplus cells of a CSV row are stored under the key None, so the keys of
+    dictionaries are compared as strings.
+    """
+    rows = tuple(
+        {str(key): value for key, value in row.items()} if isinstance(row, dict) else row
+        for row in rows
+    )
+    content = json.dumps(rows, sort_keys=True, default=str, ensure_ascii=False)
+    return sha256(content.encode("utf8")).hexdigest()
+
+
+class DigestStore:
+    """Compare the row digests of an import with those of the previous import.
+
+    Importers compute a digest for every object they would write, keyed by the
+    deterministic UUID of the object, and only write the objects returned
+    by ``changed()``. Objects that were imported before but are missing from
+    the current source are returned by ``deleted()`` once all rows were seen.
+
+    Without a study nothing is stored and every object counts as changed.
+    """
+
+    def __init__(
+        self, study: Optional[Study], entity: str, model: Type[models.Model]
+    ) -> None:
+        self.study = study
+        self.entity = entity
+        self.model = model
+        self.seen: Set[UUID] = set()
+        self._stored: Optional[Dict[UUID, str]] = None
+
+    def _queryset(self) -> models.QuerySet:
+        return RowDigest.objects.filter(study=self.study, entity=self.entity)
+
+    @property
+    def stored(self) -> Dict[UUID, str]:
+        """Digests stored by previous imports, loaded on first access."""
+        if self._stored is None:
+            self._stored = {}
+            if self.study is not None:
+                self._stored = dict(self._queryset().values_list("object_id", "digest"))
+        return self._stored
+
+    def changed(self, digests: Dict[UUID, str]) -> Set[UUID]:
+        """Return the ids of all new or changed objects.
+
+        Objects with an unchanged digest count as changed as well, if they
+        were removed from the database since the last import.
+        """
+        self.seen.update(digests.keys())
+        changed = {
+            object_id
+            for object_id, digest in digests.items()
+            if self.stored.get(object_id) != digest
+        }
+        unchanged = set(digests.keys()) - changed
+        if unchanged:
+            existing = set(
+                self.model.objects.filter(id__in=unchanged).values_list("id", flat=True)
+            )
+            changed.update(unchanged - existing)
+        return changed
+
+    def save(self, digests: Dict[UUID, str]) -> None:
+        """Store the digests of objects, that were written successfully."""
+        if self.study is None or not digests:
+            return
+        RowDigest.objects.bulk_create(
+            [
+                RowDigest(
+                    study=self.study,
+                    entity=self.entity,
+                    object_id=object_id,
+                    digest=digest,
+                )
+                for object_id, digest in digests.items()
+            ],
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["study_id", "entity", "object_id"],
+            update_fields=["digest"],
+        )
+        self.stored.update(digests)
+
+    def deleted(self) -> Set[UUID]:
+        """Return the ids of previously imported objects missing from this import."""
+        return set(self.stored.keys()) - self.seen
+
+    def forget(self, ids: Iterable[UUID]) -> None:
+        """Remove stored digests, so the objects are written by the next import."""
+        if self.study is None:
+            return
+        for chunk in chunks(ids):
+            self._queryset().filter(object_id__in=chunk).delete()
+            for object_id in chunk:
+                self.stored.pop(object_id, None)
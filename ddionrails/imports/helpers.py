@@ -2,13 +2,23 @@
 
 """ Helper functions for ddionrails.imports app """
 
-import csv
 import os
 import uuid
 from functools import lru_cache
+from hashlib import sha256
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, TypeVar, Union
 
 from django.conf import settings
 
+from .sources import read_source
+
+T = TypeVar("T")
+
+# Number of rows written per bulk_create/bulk_update round trip.
+BULK_BATCH_SIZE = 1000
+
 
 def read_csv(filename, path=None):
     """
@@ -16,9 +26,26 @@ def read_csv(filename, path=None):
     """
     if path:
         filename = os.path.join(path, filename)
-    with open(filename, "r", encoding="utf8") as file:
-        content = list(csv.DictReader(file))
-    return content
+    return list(read_source(filename))
+
+
+def file_digest(filename: Union[Path, str]) -> str:
+    """Compute the SHA-256 digest of a file without loading it into memory."""
+    digest = sha256()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(2**20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunks(iterable: Iterable[T], size: int = BULK_BATCH_SIZE) -> Iterator[List[T]]:
+    """Split an iterable into lists of at most `size` elements.
+
+    The iterable is consumed lazily, so generators are never fully materialized.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 
 def hash_with_base_uuid(name: str, cache: bool = True) -> uuid.UUID:
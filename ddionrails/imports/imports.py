@@ -2,18 +2,25 @@
 
 """ Importer base classes for ddionrails project """
 
+import io
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple, Type, Union
 
 import frontmatter
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.validators import EMPTY_VALUES
 from django.db import transaction
-from django.forms import Form
+from django.db.models import Field, Model
+from django.forms import Form, ModelForm, modelform_factory
+from model_utils.fields import AutoLastModifiedField
 
 from ddionrails.studies.models import Study
 
-from .helpers import read_csv
+from .helpers import BULK_BATCH_SIZE, chunks, file_digest, read_csv
+from .models import ImportCheckpoint
+from .sources import stream_source
 
 
 class Import:
@@ -86,20 +93,139 @@ class JekyllImport(Import):
         raise NotImplementedError
 
 
+class StreamingJSONImport(Import):
+    """
+    **Abstract class.**
+
+    Decodes the JSON file incrementally in ``execute_import()``, instead of
+    reading the whole file in ``read_file()``. Content that was set as a
+    string is decoded from that string.
+
+    To use it, implement the ``execute_import()`` method and read the content
+    with ``open_content()`` and the readers of ``json_stream``.
+    """
+
+    def read_file(self):
+        """The file is opened by ``open_content()`` when it is imported."""
+
+    def open_content(self) -> TextIO:
+        """Open the content of the import for reading."""
+        if isinstance(self.content, str):
+            return io.StringIO(self.content)
+        return open(self.file_path(), "r", encoding="utf8")
+
+
+def _refreshed_on_save(field: Field) -> bool:
+    return getattr(field, "auto_now", False) or isinstance(field, AutoLastModifiedField)
+
+
+def _skip_validate_unique(form: ModelForm) -> None:  # pylint: disable=unused-argument
+    """Uniqueness of a batch is guaranteed by its upsert on the primary key."""
+
+
+@lru_cache(maxsize=None)
+def batch_form(form_class: Type[ModelForm]) -> Tuple[Type[ModelForm], Tuple[str, ...]]:
+    """Derive a form, that validates a single row without database queries.
+
+    Relations are left out of the form, they are resolved per chunk by the
+    importer. Returns the derived form and the names of the left out relations.
+    """
+    model = form_class._meta.model
+    model_fields = {field.name: field for field in model._meta.get_fields()}
+    relations = tuple(
+        name
+        for name in form_class.base_fields
+        if name in model_fields and model_fields[name].is_relation
+    )
+    fields = [name for name in form_class.base_fields if name not in relations]
+    form = modelform_factory(model, form=form_class, fields=fields)
+    batch_form_class = type(
+        f"Batch{form_class.__name__}", (form,), {"validate_unique": _skip_validate_unique}
+    )
+    return batch_form_class, relations
+
+
 class CSVImport(Import):
     """
     **Abstract class.**
 
     To use it, implement the ``process_element()`` method.
+
+    Importers with ``batch_import`` set validate the rows of a chunk with the
+    rules of their form and write each chunk with a single bulk upsert.
+    Their models have to compute their primary key in ``generate_id()``.
     """
 
+    batch_import = False
+
     def read_file(self):
         self.content: Iterable = read_csv(self.file_path())
 
     def execute_import(self):
+        if self.batch_import:
+            for elements in chunks(self.content):
+                self.import_batch(elements)
+            return
         for element in self.content:
             self.import_element(element)
 
+    def import_batch(self, elements: List[Dict[str, Any]]) -> List[Model]:
+        """Validate a chunk of rows with the import form and upsert them in bulk.
+
+        Related objects are resolved with one query per relation and chunk.
+        Invalid rows are skipped, like in ``import_element()``.
+        """
+        form_class, relations = batch_form(self.DOR.form)
+        model = form_class._meta.model
+        elements = [self.process_element(element) for element in elements]
+        related: Dict[str, Dict[str, Model]] = {}
+        for name in relations:
+            values = {
+                str(element[name])
+                for element in elements
+                if element.get(name) not in EMPTY_VALUES
+            }
+            related_model = model._meta.get_field(name).related_model
+            related[name] = {
+                str(key): value
+                for key, value in related_model.objects.in_bulk(values).items()
+            }
+
+        instances: Dict[Any, Model] = {}
+        for element in elements:
+            form = form_class(element)
+            if not form.is_valid():
+                continue
+            instance = form.instance
+            for name in relations:
+                value = element.get(name)
+                related_object = None
+                if value not in EMPTY_VALUES:
+                    related_object = related[name].get(str(value))
+                if related_object is None and not model._meta.get_field(name).null:
+                    break
+                setattr(instance, name, related_object)
+            else:
+                instance.pk = instance.generate_id()
+                instances[instance.pk] = instance
+
+        update_fields = [
+            model._meta.get_field(name).attname
+            for name in self.DOR.form.base_fields
+            if name != model._meta.pk.name
+        ] + [
+            field.attname
+            for field in model._meta.concrete_fields
+            if _refreshed_on_save(field)
+        ]
+        model.objects.bulk_create(
+            instances.values(),
+            update_conflicts=True,
+            unique_fields=[model._meta.pk.attname],
+            update_fields=update_fields,
+        )
+        return list(instances.values())
+
     def import_element(self, element):
         form = self.DOR.form
         element = self.process_element(element)
@@ -125,3 +251,78 @@ class CSVImport(Import):
 
     def process_element(self, element):
         return element
+
+
+class StreamingCSVImport(CSVImport):
+    """
+    **Abstract class.**
+
+    Reads the CSV file lazily and imports it in chunks of ``chunk_size`` rows.
+    Every chunk is committed in its own transaction and the number of
+    committed rows is stored in an ``ImportCheckpoint``. If an import is
+    interrupted, the next import of the same file continues after the last
+    committed chunk.
+
+    To use it, implement the ``import_element()`` or ``import_chunk()`` method.
+    """
+
+    chunk_size = BULK_BATCH_SIZE
+
+    def __init__(self, filename, study=None, system=None):
+        super().__init__(filename, study, system)
+        self.file_digest: Optional[str] = None
+
+    @classmethod
+    def run_import(cls, filename: Union[Path, str], study: Optional[Study] = None):
+        importer = cls(filename, study)
+        importer.read_file()
+        importer.execute_import()
+
+    def read_file(self):
+        self.file_digest = file_digest(self.file_path())
+        self.content = stream_source(self.file_path())
+
+    def execute_import(self):
+        checkpoint = self.get_checkpoint()
+        committed_rows = checkpoint.rows if checkpoint else 0
+        read_rows = 0
+        for rows in chunks(self.content, self.chunk_size):
+            read_rows += len(rows)
+            if read_rows <= committed_rows:
+                self.skip_chunk(rows)
+                continue
+            with transaction.atomic():
+                self.import_chunk(rows)
+                if checkpoint:
+                    checkpoint.rows = read_rows
+                    checkpoint.save(update_fields=["rows"])
+        if checkpoint:
+            checkpoint.delete()
+
+    def import_chunk(self, rows: List[Dict[str, str]]) -> None:
+        """Import all rows of a single chunk."""
+        for element in rows:
+            self.import_element(element)
+
+    def skip_chunk(self, rows: List[Dict[str, str]]) -> None:
+        """Handle a chunk, that was already committed by an interrupted import."""
+
+    def get_checkpoint(self) -> Optional[ImportCheckpoint]:
+        """Get the checkpoint for the current version of the imported file.
+
+        Content that was not read from a file by ``read_file()`` is imported
+        without a checkpoint.
+        """
+        if self.file_digest is None:
+            return None
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            study=self.study,
+            importer=type(self).__name__,
+            filename=str(self.file_path()),
+            defaults={"file_digest": self.file_digest},
+        )
+        if checkpoint.file_digest != self.file_digest:
+            checkpoint.file_digest = self.file_digest
+            checkpoint.rows = 0
+            checkpoint.save()
+        return checkpoint
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+""" Performance instrumentation for imports of the ddionrails project """
+
+import logging
+import resource
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from ddionrails.studies.models import Study
+
+from .models import ImportRun, ImportRunEntry
+from .shadow import use_shadow_schema
+from .sources import activate_source_cache, forget_row_count, row_count
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QueryCounter:  # pylint: disable=too-few-public-methods
+    """Count the SQL queries executed through a database connection."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def reset_peak_memory() -> bool:
+    """Reset the peak resident set size of this process to its current size.
+
+    Returns False on systems without /proc/self/clear_refs, i.e. other than Linux.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_memory() -> Optional[int]:
+    """Return the peak resident set size of this process in bytes since its reset."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def cpu_time() -> float:
+    """Return the CPU time of this process and of its terminated child processes.
+
+    Child processes are included, so the work of process pools, that were
+    shut down, is counted as well.
+    """
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def run_instrumented(  # pylint: disable=too-many-arguments
+    run_id: int,
+    entity: str,
+    import_function: Callable,
+    file: Union[Path, str],
+    study: Study,
+) -> Any:
+    """Call an import function and record its performance as an ImportRunEntry.
+
+    The entry is recorded for failed imports as well, before the error is
+    passed on. All imports of the run share a cache of parsed source files.
+    Rows are counted while the import reads its CSV file. Imports of a run
+    with a shadow schema write to the shadow tables.
+
+    The CPU time includes process pools of the import. Queries are counted on
+    the connection of this process, the workers of the statistics import do
+    not use the database. The peak memory is the peak resident set size of
+    this process during the import.
+    """
+    activate_source_cache(run_id)
+    forget_row_count(file)
+    schema = ImportRun.objects.values_list("schema", flat=True).get(id=run_id)
+    counter = QueryCounter()
+    started = timezone.now()
+    measure_memory = reset_peak_memory()
+    wall_start = time.perf_counter()
+    cpu_start = cpu_time()
+    succeeded = False
+    try:
+        with use_shadow_schema(schema), connection.execute_wrapper(counter):
+            result = import_function(file, study)
+        succeeded = True
+        return result
+    finally:
+        _record_entry(
+            run_id=run_id,
+            entity=entity,
+            filename=str(file),
+            started=started,
+            wall_time=time.perf_counter() - wall_start,
+            cpu_time=cpu_time() - cpu_start,
+            rows=row_count(file),
+            queries=counter.count,
+            peak_memory=peak_memory() if measure_memory else None,
+            succeeded=succeeded,
+        )
+
+
+def _record_entry(**figures) -> None:
+    """Save an ImportRunEntry without replacing an error of the import.
+
+    Inside of a transaction, that failed with the import, the entry can not
+    be saved. Its figures are logged instead.
+    """
+    if connection.needs_rollback:
+        LOGGER.warning("Import run entry lost with the transaction: %s", figures)
+        return
+    try:
+        with transaction.atomic():
+            ImportRunEntry.objects.create(**figures)
+    except DatabaseError:
+        if figures["succeeded"]:
+            raise
+        LOGGER.warning("Import run entry lost with the transaction: %s", figures)
+
+
+def summarize_run(run: ImportRun) -> Dict[str, Dict[str, Any]]:
+    """Sum up the entries of an import run per entity and in total.
+
+    The totals are stored under the key "Total", after all entities.
+    """
+    totals = _new_figures("Total")
+    entities: Dict[str, Dict[str, Any]] = OrderedDict()
+    for entry in run.entries.all():
+        if entry.entity not in entities:
+            entities[entry.entity] = _new_figures(entry.entity)
+        for figures in (entities[entry.entity], totals):
+            figures["files"] += 1
+            figures["wall"] += entry.wall_time
+            figures["cpu"] += entry.cpu_time
+            figures["rows"] += entry.rows or 0
+            figures["queries"] += entry.queries
+            figures["memory"] = max(figures["memory"], entry.peak_memory or 0)
+            figures["failed"] = figures["failed"] or not entry.succeeded
+    entities["Total"] = totals
+    return entities
+
+
+def format_report(run: ImportRun) -> str:
+    """Summarize the entries of an import run per entity, slowest entity first."""
+    entities = summarize_run(run)
+    totals = entities.pop("Total")
+    header = (
+        "Entity",
+        "Files",
+        "Wall (s)",
+        "CPU (s)",
+        "Rows",
+        "Queries",
+        "Peak (MB)",
+    )
+    lines = [header]
+    ordered = sorted(entities.values(), key=lambda figures: figures["wall"], reverse=True)
+    for figures in ordered + [totals]:
+        lines.append(
+            (
+                figures["entity"] + (" (failed)" if figures["failed"] else ""),
+                str(figures["files"]),
+                f"{figures['wall']:.2f}",
+                f"{figures['cpu']:.2f}",
+                str(figures["rows"]),
+                str(figures["queries"]),
+                f"{figures['memory'] / 2**20:.1f}",
+            )
+        )
+    widths = [max(len(line[column]) for line in lines) for column in range(len(header))]
+    table = [
+        "  ".join(
+            value.ljust(width) if column == 0 else value.rjust(width)
+            for column, (value, width) in enumerate(zip(line, widths))
+        )
+        for line in lines
+    ]
+    table.insert(1, "-" * len(table[0]))
+    table.insert(len(table) - 1, "-" * len(table[0]))
+    return "\n".join(table)
+
+
+def _new_figures(entity: str) -> Dict[str, Any]:
+    return {
+        "entity": entity,
+        "files": 0,
+        "wall": 0.0,
+        "cpu": 0.0,
+        "rows": 0,
+        "queries": 0,
+        "memory": 0,
+        "failed": False,
+    }
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+""" Incremental reader for large JSON import files """
+
+import json
+import re
+from typing import Any, Dict, Iterator, Optional, Sequence, TextIO, Tuple
+
+CHUNK_SIZE = 64 * 1024
+NUMBER_CHARACTERS = frozenset("0123456789+-.eE")
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JSONStreamReader:
+    """Decode the members of JSON containers one at a time.
+
+    Only the current member is decoded, so memory use depends on the largest
+    single value instead of the size of the file. The file is read in chunks
+    and already decoded content is dropped from the buffer.
+    """
+
+    def __init__(self, source: TextIO, chunk_size: int = CHUNK_SIZE) -> None:
+        self.source = source
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        """Read more content into the buffer. Returns False at the end of the file."""
+        if self.eof:
+            return False
+        chunk = self.source.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        return True
+
+    def _peek(self) -> str:
+        """Return the next character, that is not whitespace, without consuming it."""
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill(self.chunk_size):
+                raise json.JSONDecodeError(
+                    "Unexpected end of file", self.buffer, self.position
+                )
+
+    def _next(self) -> str:
+        character = self._peek()
+        self.position += 1
+        return character
+
+    def value(self) -> Any:
+        """Decode the next complete value."""
+        self._peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A number might continue after the end of the buffer.
+                if self.eof or (
+                    end < len(self.buffer) and self.buffer[end] not in NUMBER_CHARACTERS
+                ):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow the reads, so that large values are not decoded too often.
+            self._fill(size)
+            size *= 2
+
+    def skip(self) -> None:
+        """Consume the next value without keeping it in memory."""
+        if self._peek() in "[{":
+            for _ in self.members():
+                self.skip()
+        else:
+            self.value()
+
+    def members(self) -> Iterator[Optional[str]]:
+        """Iterate over the members of the next array or object.
+
+        Yields the key of every object member or None for array elements.
+        The value of each member has to be consumed before the next iteration,
+        e.g. with ``value()``, ``skip()`` or a nested ``members()``.
+        """
+        opening = self._next()
+        if opening not in "[{":
+            raise json.JSONDecodeError("Expected array or object", self.buffer, 0)
+        closing = "]" if opening == "[" else "}"
+        if self._peek() == closing:
+            self.position += 1
+            return
+        while True:
+            key = None
+            if opening == "{":
+                key = self.value()
+                if self._next() != ":":
+                    raise json.JSONDecodeError("Expected ':'", self.buffer, 0)
+            yield key
+            separator = self._next()
+            if separator == closing:
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expected ',' or closing bracket", "", 0)
+
+
+def iter_json_items(
+    source: TextIO, path: Sequence[str] = ()
+) -> Iterator[Tuple[Optional[str], Any]]:
+    """Iterate over the keys and values of a JSON container.
+
+    `path` selects a nested object by its keys, e.g. ``("questions",)``.
+    Members outside of the path are skipped. Array elements have None as key.
+    """
+    reader = JSONStreamReader(source)
+    yield from _iter_path(reader, tuple(path))
+
+
+def _iter_path(
+    reader: JSONStreamReader, path: Tuple[str, ...]
+) -> Iterator[Tuple[Optional[str], Any]]:
+    for key in reader.members():
+        if not path:
+            yield key, reader.value()
+        elif key == path[0]:
+            yield from _iter_path(reader, path[1:])
+        else:
+            reader.skip()
+
+
+def read_json_object(source: TextIO, exclude: Sequence[str] = ()) -> Dict[str, Any]:
+    """Decode a JSON object without the members named in `exclude`."""
+    reader = JSONStreamReader(source)
+    content = {}
+    for key in reader.members():
+        if key in exclude:
+            reader.skip()
+        else:
+            content[key] = reader.value()
+    return content
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+""" "Benchmark" management command for ddionrails project """
+
+import json
+import shutil
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, Tuple
+
+import git
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from git.exc import InvalidGitRepositoryError, NoSuchPathError
+
+from ddionrails.imports.instrumentation import format_report, summarize_run
+from ddionrails.imports.manager import StudyImportManager
+from ddionrails.imports.synthetic import SCALES, SyntheticStudy, SyntheticStudyScale
+from ddionrails.studies.models import Study
+
+
+class Command(BaseCommand):
+    """Time the import of synthetic studies at several scales."""
+
+    help = """Benchmark command
+
+        This command generates synthetic studies, imports them without redis
+        and times every entity as well as the full import pipeline.
+        Results are stored in a JSON file, keyed by the commit of the code,
+        to compare them across commits.
+        The statistics import queues its metadata job, so redis must be reachable.
+
+        \b
+        Arguments:
+            scales: One or more of small, medium and large (optional).
+            output: JSON file to store the results in (optional).
+            seed: Seed for the content of the synthetic studies (optional).
+        """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scales", nargs="*", choices=list(SCALES.keys()), default=["small"]
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            type=Path,
+            help="JSON file to store the results in.",
+            default=Path("import_benchmark.json"),
+        )
+        parser.add_argument(
+            "-s",
+            "--seed",
+            type=int,
+            help="Seed for the content of the synthetic studies.",
+            default=0,
+        )
+        return super().add_arguments(parser)
+
+    def handle(self, *args, **options):
+        output: Path = options["output"]
+        commit = code_commit()
+        results: Dict[str, Dict[str, Any]] = {}
+        if output.is_file():
+            with open(output, "r", encoding="utf8") as results_file:
+                results = json.load(results_file)
+
+        for scale_name in options["scales"]:
+            self.stdout.write(self.style.SUCCESS(f'Benchmarking scale "{scale_name}"'))
+            result, report = benchmark_import(
+                f"benchmark-{scale_name}", SCALES[scale_name], options["seed"]
+            )
+            self.stdout.write(report)
+            self.stdout.write(f"Full pipeline: {result['wall_time']:.2f} s")
+            for previous_commit, previous_results in reversed(list(results.items())):
+                if previous_commit != commit and scale_name in previous_results:
+                    previous_time = previous_results[scale_name]["wall_time"]
+                    self.stdout.write(
+                        f"Previous: {previous_time:.2f} s at commit {previous_commit}"
+                    )
+                    break
+            results.setdefault(commit, {})[scale_name] = result
+
+        # Move the current commit to the end, so it is the latest result.
+        results[commit] = results.pop(commit)
+        with open(output, "w", encoding="utf8") as results_file:
+            json.dump(results, results_file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+
+def code_commit() -> str:
+    """Return the commit of the ddionrails code base, if it is available."""
+    try:
+        repo = git.Repo(settings.BASE_DIR, search_parent_directories=True)
+        return repo.head.commit.hexsha
+    except (InvalidGitRepositoryError, NoSuchPathError, ValueError):
+        return "unknown"
+
+
+def benchmark_import(
+    study_name: str, scale: SyntheticStudyScale, seed: int = 0
+) -> Tuple[Dict[str, Any], str]:
+    """Import a synthetic study and return timings per entity and a report.
+
+    The study and its files are removed afterwards.
+    """
+    Study.objects.filter(name=study_name).delete()
+    study = Study(name=study_name, label=study_name)
+    study.save()
+    base_path = settings.IMPORT_REPO_PATH.joinpath(study_name)
+    shutil.rmtree(base_path, ignore_errors=True)
+    try:
+        SyntheticStudy(study_name, scale, seed).write(base_path)
+        manager = StudyImportManager(study, redis=False)
+        start = perf_counter()
+        manager.import_all_entities()
+        wall_time = perf_counter() - start
+        run = manager.run
+        entities = summarize_run(run)  # type: ignore
+        result = {
+            "scale": scale._asdict(),
+            "wall_time": wall_time,
+            "entities": {
+                entity: {
+                    key: value
+                    for key, value in figures.items()
+                    if key not in ("entity", "failed")
+                }
+                for entity, figures in entities.items()
+            },
+        }
+        return result, format_report(run)  # type: ignore
+    finally:
+        study.delete()
+        shutil.rmtree(base_path, ignore_errors=True)
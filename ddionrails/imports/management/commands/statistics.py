@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+""" "Statistics" management command for ddionrails project """
+
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ddionrails.imports.sources import read_source
+from ddionrails.statistics.engine import compute_statistics, read_microdata
+from ddionrails.studies.models import Study
+
+
+class Command(BaseCommand):
+    """Compute the statistics files of a study from a dataset extract."""
+
+    help = """Statistics command
+
+        This command writes the statistics files, that are imported with the
+        "statistics" entity of the update command, from microdata.
+
+        \b
+        Arguments:
+            study_name: The name of a study.
+            microdata: A CSV file with one column per variable.
+            dataset: Only compute statistics of this dataset's variables (optional).
+            year: The name of the year column (optional).
+            weight: The name of the weight column (optional).
+            labels: A JSON file with variable and value labels (optional).
+            dimensions: The independent variables (optional).
+            combinations: The largest number of combined dimensions (optional).
+            workers: Number of worker processes (optional).
+        """
+
+    def add_arguments(self, parser):
+        parser.add_argument("study_name", type=str)
+        parser.add_argument("microdata", type=Path)
+        parser.add_argument("--dataset", type=str, default=None)
+        parser.add_argument("--year", type=str, default="syear")
+        parser.add_argument("--weight", type=str, default=None)
+        parser.add_argument("--labels", type=Path, default=None)
+        parser.add_argument("-d", "--dimensions", nargs="*", default=[])
+        parser.add_argument("-c", "--combinations", type=int, default=2)
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            help="Number of worker processes.",
+            default=settings.IMPORT_WORKERS,
+        )
+
+    def handle(self, *args, **options):
+        study_name = options["study_name"]
+        try:
+            study = Study.objects.get(name=study_name)
+        except Study.DoesNotExist:
+            self.log_error(f'Study "{study_name}" does not exist.')
+            sys.exit(1)
+
+        variables = {
+            variable["name"]: variable["type"]
+            for variable in read_source(study.import_path().joinpath("variables.csv"))
+            if variable.get("statistics") == "True"
+            and options["dataset"] in (None, variable["dataset"])
+        }
+        try:
+            data = read_microdata(
+                options["microdata"],
+                [*variables, *options["dimensions"]],
+                year=options["year"],
+                weight=options["weight"],
+                labels=options["labels"],
+            )
+        except KeyError as error:
+            self.log_error(str(error.args[0]))
+            sys.exit(1)
+        files = compute_statistics(
+            data,
+            variables,
+            study.import_path().parent.joinpath("statistics"),
+            options["dimensions"],
+            options["combinations"],
+            workers=options["workers"],
+        )
+        self.log_success(f'Wrote {len(files)} statistics files of study "{study_name}".')
+
+    def log_success(self, message: str):
+        """Log success messages."""
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def log_error(self, message: str):
+        """Log error messages."""
+        self.stderr.write(self.style.ERROR(message))
@@ -1,15 +1,21 @@
 # -*- coding: utf-8 -*-
 
-""" "Update" management command for ddionrails project """
+""" "Update" management command for ddionrails project"""
+
+import multiprocessing
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from time import perf_counter
+from typing import List, Tuple
 
-from django.core.management import call_command
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 
+from ddionrails.imports.instrumentation import format_report
 from ddionrails.imports.manager import StudyImportManager
 from ddionrails.studies.models import Study
-from ddionrails.workspace.models import Basket, BasketVariable
 
 
 class Command(BaseCommand):
@@ -26,6 +32,10 @@ class Command(BaseCommand):
             local: Set this flag to suppress updating from GitHub (optional).
             filename: The filename of a single file, only used in combination
                       with a single 'entity' (optional).
+            incremental: Only import entities affected by files changed since
+                         the last imported commit (optional).
+            workers: Number of studies updated in parallel, when all studies
+                     are updated (optional).
         """
 
     def add_arguments(self, parser):
@@ -43,7 +53,17 @@ class Command(BaseCommand):
             "-c",
             "--clean-import",
             action="store_true",
-            help="Remove study content before import.",
+            help="Replace the study content with the imported content.",
+            default=False,
+        )
+        parser.add_argument(
+            "-i",
+            "--incremental",
+            action="store_true",
+            help=(
+                "Only import entities affected by files changed "
+                "since the last imported commit."
+            ),
             default=False,
         )
         parser.add_argument(
@@ -53,6 +73,13 @@ class Command(BaseCommand):
             help="Do not queue jobs with redis.",
             default=False,
         )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            help="Number of studies updated in parallel, when updating all studies.",
+            default=settings.IMPORT_WORKERS,
+        )
         return super().add_arguments(parser)
 
     def handle(self, *args, **options):
@@ -62,11 +89,15 @@ class Command(BaseCommand):
         filename = options["filename"]
         clean_import = options["clean_import"]
         redis = not options["no_redis"]
+        incremental = options["incremental"]
+        workers = options["workers"]
 
         # if no study_name is given, update all studies
         if study_name == "all":
             self.log_success("Updating all studies")
-            update_all_studies_completely(local, clean_import, redis=redis)
+            update_all_studies_completely(
+                local, clean_import, redis=redis, incremental=incremental, workers=workers
+            )
             sys.exit(0)
 
         # if study_name is given, select study from database or exit
@@ -92,7 +123,13 @@ class Command(BaseCommand):
             sys.exit(1)
 
         update_single_study(
-            study, local, tuple(entity), filename, clean_import, manager=manager
+            study,
+            local,
+            tuple(entity),
+            filename,
+            clean_import,
+            manager=manager,
+            incremental=incremental,
         )
 
         # Populate the search index from the database (indexes everything)
@@ -109,8 +146,10 @@ class Command(BaseCommand):
 
 def update_study_partial(manager: StudyImportManager, entity: tuple):
     """Update only selected entitites for study"""
-    for single_entity in entity:
-        manager.import_single_entity(single_entity)
+    return {
+        single_entity: manager.import_single_entity(single_entity)
+        for single_entity in entity
+    }
 
 
 # Maybe replace study arg with manager arg in future refactor
@@ -121,32 +160,143 @@ def update_single_study(  # pylint: disable=R0913
     filename: str = None,
     clean_import=False,
     manager: StudyImportManager = None,
+    incremental: bool = False,
 ) -> None:
-    """Update a single study"""
-    backup_file = Path()
-    if clean_import:
-        backup_file = Basket.backup()
-        study.delete()
-        study.save()
+    """Update a single study
+
+    An incremental update only imports entities affected by the files,
+    that changed since the last imported commit. It falls back to a full
+    import if there is no such commit to compare against. A pulled commit
+    is only recorded as imported after all entities were imported, so
+    failed and partial imports are repeated by the next incremental update.
+
+    Imports without redis print a performance summary of the import run.
+
+    A clean import writes to the shadow schema of its import run, while
+    readers keep seeing the previous content of the study. Once all entities
+    are imported, the shadow content is swapped in by a short transaction.
+    Content missing from the import is removed afterwards, unchanged rows
+    and the baskets referring to them are kept. A failed clean import leaves
+    the previous content in place, its shadow schema is dropped.
+    """
     if not manager:
-        StudyImportManager(study)
+        manager = StudyImportManager(study)
+    manager.shadow = clean_import
+    previous_commit = study.current_commit
     if not local:
         manager.update_repo()
-    if not entity:
-        manager.import_all_entities()
-    elif filename:
-        manager.import_single_entity(entity[0], filename)
-    else:
-        update_study_partial(manager, entity)
+    incremental = (
+        incremental
+        and not clean_import
+        and bool(previous_commit)
+        and manager.repo.repo is not None
+    )
+    try:
+        if not entity and incremental:
+            jobs = manager.import_changed_entities(
+                manager.repo.list_changed_files(previous_commit)
+            )
+        elif not entity:
+            jobs = manager.import_all_entities()
+        elif filename:
+            jobs = {entity[0]: manager.import_single_entity(entity[0], filename)}
+        else:
+            jobs = update_study_partial(manager, entity)
+        if clean_import or (not entity and not local):
+            manager.finish_import(jobs, record_commit=not entity and not local)
+    except Exception:
+        manager.discard_shadow()
+        raise
 
-    if backup_file.is_file():
-        call_command("loaddata", backup_file)
-        BasketVariable.clean_basket_variables(study.name)
+    if not manager.redis and manager.run is not None:
+        print(format_report(manager.run))
 
 
-def update_all_studies_completely(local: bool, clean_import=False, redis=True) -> None:
-    """Update all studies in the database"""
+def update_all_studies_completely(
+    local: bool,
+    clean_import=False,
+    redis=True,
+    incremental: bool = False,
+    workers: int = 1,
+) -> None:
+    """Update all studies in the database
+
+    With more than one worker, the studies are updated in parallel processes.
+    Clean imports swap in rows shared by all studies, e.g. concepts, so they
+    are always run one study after another.
+    """
+    if workers > 1 and not clean_import:
+        update_studies_in_parallel(local, redis, incremental, workers)
+        return
     for study in Study.objects.all():
         manager = StudyImportManager(study, redis=redis)
-        update_single_study(study, local, clean_import=clean_import, manager=manager)
+        update_single_study(
+            study,
+            local,
+            clean_import=clean_import,
+            manager=manager,
+            incremental=incremental,
+        )
         del manager
+
+
+def update_studies_in_parallel(
+    local: bool, redis: bool, incremental: bool, workers: int
+) -> List[Tuple[str, float, str]]:
+    """Update all studies in a pool of worker processes.
+
+    Database connections are closed before the workers are forked, so every
+    process opens its own connection. A summary of all studies is printed
+    once all of them are done. Failed studies do not stop the other updates,
+    they are reported with a CommandError afterwards.
+
+    Returns the name, duration and error message of every study.
+    """
+    study_names = list(Study.objects.values_list("name", flat=True))
+    connections.close_all()
+    start = perf_counter()
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        futures = [
+            executor.submit(_update_study_process, name, local, redis, incremental)
+            for name in study_names
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+    print(_format_results(results, perf_counter() - start))
+    failed = sorted(name for name, _, error in results if error)
+    if failed:
+        raise CommandError(f'Update failed for studies: {", ".join(failed)}')
+    return results
+
+
+def _update_study_process(
+    study_name: str, local: bool, redis: bool, incremental: bool
+) -> Tuple[str, float, str]:
+    """Update a single study inside a worker process."""
+    start = perf_counter()
+    error = ""
+    try:
+        study = Study.objects.get(name=study_name)
+        manager = StudyImportManager(study, redis=redis)
+        update_single_study(study, local, manager=manager, incremental=incremental)
+    except Exception as exception:  # pylint: disable=broad-except
+        error = f"{type(exception).__name__}: {exception}"
+    finally:
+        connections.close_all()
+    return study_name, perf_counter() - start, error
+
+
+def _format_results(results: List[Tuple[str, float, str]], wall_time: float) -> str:
+    width = max([len("Study")] + [len(name) for name, _, _ in results])
+    lines = [f"{'Study':<{width}}  {'Time (s)':>8}  Result"]
+    for name, duration, error in sorted(results, key=lambda result: -result[1]):
+        lines.append(f"{name:<{width}}  {duration:>8.2f}  {error or 'updated'}")
+    failed = len([error for _, _, error in results if error])
+    lines.append(
+        f"Updated {len(results) - failed} of {len(results)} studies "
+        f"in {wall_time:.2f} s, {failed} failed."
+    )
+    return "\n".join(lines)
@@ -4,18 +4,23 @@
 
 import csv
 import logging
+import multiprocessing
 import shutil
 import sys
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
 from inspect import isfunction, isgenerator
 from pathlib import Path
 from types import FunctionType
-from typing import Any, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import django_rq
 import git
 from django.conf import settings
+from django.db import connection, connections
 from git.exc import InvalidGitRepositoryError, NoSuchPathError
+from rq.job import Job
 
 from ddionrails.base.models import System
 from ddionrails.concepts.imports import (
@@ -33,6 +38,19 @@ from ddionrails.data.imports import (
     VariableImport,
     variables_images_import,
 )
+from ddionrails.imports.instrumentation import run_instrumented
+from ddionrails.imports.models import ImportRun
+from ddionrails.imports.shadow import (
+    create_shadow_schema,
+    drop_shadow_schema,
+    remove_stale_rows,
+    swap_shadow_schema,
+)
+from ddionrails.imports.sources import (
+    invalidate_source,
+    read_source,
+    release_source_cache,
+)
 from ddionrails.instruments.imports import (
     concept_question_import,
     instrument_import,
@@ -49,6 +67,73 @@ from ddionrails.workspace.imports import script_metadata_import
 logging.config.fileConfig("logging.conf")
 LOGGER = logging.getLogger(__name__)
 
+# Entities whose imported content another entity reads from the database.
+# An entity is only started after all of its dependencies have been imported.
+# Entities without a path between them in this graph are imported concurrently
+# when jobs are queued with redis.
+IMPORT_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "topics.csv": (),
+    "topics.json": (),
+    "concepts": ("topics.csv",),
+    "analysis_units": (),
+    "periods": (),
+    "conceptual_datasets": (),
+    "instruments.json": ("periods", "analysis_units"),
+    "instruments": ("instruments.json",),
+    "questions": ("instruments",),
+    "answers": (),
+    "answers_relations": ("questions", "answers"),
+    "datasets.csv": ("periods", "analysis_units", "conceptual_datasets"),
+    "datasets.json": ("datasets.csv",),
+    "variables": ("datasets.json", "concepts"),
+    "questions_variables": ("questions", "variables"),
+    "concepts_questions": ("questions", "concepts"),
+    "transformations": ("variables",),
+    "attachments": ("variables", "questions"),
+    "publications": (),
+    # Both entities save the whole study object.
+    "study": ("topics.json",),
+    "statistics": ("variables",),
+    "questions_images": ("questions",),
+    "variables_images": ("variables",),
+    "script_metadata": (),
+}
+
+# Directory of the statistics files of a study repository, next to the import path.
+STATISTICS_SUB_DIRECTORY = "statistics/"
+
+# Files read by each entity, as glob patterns relative to a study's import path.
+IMPORT_SOURCES: Dict[str, Tuple[str, ...]] = {
+    "topics.csv": ("topics.csv",),
+    "topics.json": ("topics.json",),
+    # Orphaned concepts from the variables.csv are added to the concepts.csv.
+    "concepts": ("concepts.csv", "variables.csv"),
+    "analysis_units": ("analysis_units.csv",),
+    "periods": ("periods.csv",),
+    "conceptual_datasets": ("conceptual_datasets.csv",),
+    "instruments.json": ("instruments/*.json",),
+    "instruments": ("instruments.csv", "questions.csv"),
+    "questions": ("questions.csv",),
+    "answers": ("answers.csv",),
+    "answers_relations": ("answers.csv", "questions.csv"),
+    "datasets.csv": ("datasets.csv",),
+    "datasets.json": ("datasets/*.json",),
+    "variables": ("variables.csv",),
+    "questions_variables": ("questions_variables.csv",),
+    "concepts_questions": ("questions.csv",),
+    "transformations": ("transformations.csv",),
+    "attachments": ("attachments.csv",),
+    "publications": ("publications.csv",),
+    "study": ("study.md",),
+    "statistics": ("variables.csv", "../statistics/*"),
+    "questions_images": ("questions_images.csv",),
+    "variables_images": ("variables_images.csv",),
+    "script_metadata": ("script_metadata.csv",),
+}
+
+# Entities that import each of their files separately.
+SINGLE_FILE_ENTITIES = ("instruments.json", "datasets.json")
+
 
 class Repository:
     """A helper class to handle git related activities"""
@@ -87,12 +172,17 @@ class Repository:
         """Check if current commit is still the newest or of new import is required."""
         return self.study_or_system.current_commit != str(self.repo.head.commit)
 
-    def list_changed_files(self) -> List:
-        """Returns a list of changed files since the "current_commit" in the database."""
+    def list_changed_files(self, commit: Optional[str] = None) -> List:
+        """Returns a list of changed files since the "current_commit" in the database.
+
+        Another commit to compare against can be passed explicitly.
+        Changes of the import path and of the statistics files are listed.
+        """
         diff = self.repo.git.diff(
-            self.study_or_system.current_commit,
+            commit or self.study_or_system.current_commit,
             "--",
             settings.IMPORT_SUB_DIRECTORY,
+            STATISTICS_SUB_DIRECTORY,
             name_only=True,
         )
         return diff.split()
@@ -135,17 +225,51 @@ def system_import_manager(system):
     repo.set_commit_id()
 
 
+def save_imported_commit(study_id: str, commit: str) -> None:
+    """Record a commit of a study repository as the last imported one."""
+    Study.objects.filter(id=study_id).update(current_commit=commit)
+
+
+def _run_import_in_worker(*arguments) -> None:
+    try:
+        run_instrumented(*arguments)
+    finally:
+        connections.close_all()
+
+
+def import_files_in_parallel(imports: List[Tuple[Any, ...]]) -> None:
+    """Run the imports of independent files in a pool of worker processes.
+
+    Every item of `imports` holds the arguments of one run_instrumented call.
+    Database connections are closed before the workers are forked, so every
+    worker opens its own connection. The first failed import is raised
+    after all files were processed.
+    """
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=settings.IMPORT_WORKERS,
+        mp_context=multiprocessing.get_context("fork"),
+    ) as executor:
+        futures = [
+            executor.submit(_run_import_in_worker, *arguments) for arguments in imports
+        ]
+    for future in futures:
+        future.result()
+
+
 class StudyImportManager:
     """Manage the import of all study ressources."""
 
     import_order: OrderedDict[str, Tuple[Any, Any]]
 
-    def __init__(self, study: Study, redis: bool = True):
+    def __init__(self, study: Study, redis: bool = True, shadow: bool = False):
         self.study = study
         self.repo = Repository(study)
         self.base_dir = study.import_path()
         self._concepts_fixed = False
         self.redis = redis
+        self.shadow = shadow
+        self.run: Optional[ImportRun] = None
 
         self.import_order = OrderedDict(
             {
@@ -223,11 +347,10 @@ class StudyImportManager:
         if not concept_path.exists():
             return None
         variable_path = self.import_order["variables"][1]
-        with open(variable_path, "r", encoding="utf8") as variable_csv:
-            variable_concepts = {
-                row.get("concept", row.get("concept_name"))
-                for row in csv.DictReader(variable_csv)
-            }
+        variable_concepts = {
+            row.get("concept", row.get("concept_name"))
+            for row in read_source(variable_path)
+        }
         with open(concept_path, "r", encoding="utf8") as concepts_csv:
             _reader = csv.DictReader(concepts_csv)
             concept_csv_content = list(_reader)
@@ -244,22 +367,101 @@ class StudyImportManager:
             for concept in orphaned_concepts:
                 concept_fields["name"] = concept
                 writer.writerow(concept_fields)
+        invalidate_source(concept_path)
         self._concepts_fixed = True
         return None
 
     def update_repo(self):
-        "Update metadata git repository."
+        """Update metadata git repository.
+
+        The pulled commit is only recorded as imported by finish_import().
+        """
         self.repo.pull_or_clone()
-        self.repo.set_commit_id()
 
-    def _execute(self, import_function: FunctionType, *args):
-        """Queue or call an import function."""
+    def start_run(self) -> ImportRun:
+        """Start a new import run, that records the performance of all imports.
+
+        A shadow import run gets its own shadow schema. The shadow schemas of
+        earlier runs of the study were left behind by failed or abandoned
+        imports, they are dropped first.
+        """
+        commit = self.study.current_commit or ""
+        if self.repo.repo is not None:
+            commit = str(self.repo.repo.head.commit)
+        if self.shadow:
+            for run in ImportRun.objects.filter(study=self.study).exclude(schema=""):
+                drop_shadow_schema(run)
+        self.run = ImportRun.objects.create(study=self.study, commit=commit)
+        if self.shadow:
+            create_shadow_schema(self.run)
+        return self.run
+
+    def finish_import(
+        self, jobs: Dict[str, List[Job]], record_commit: bool = True
+    ) -> Optional[Job]:
+        """Swap in the shadow schema and record the commit of the current import run.
+
+        Incremental imports compare against this commit, so it is only
+        recorded once all imports succeeded. Queued imports have only
+        succeeded when their jobs finished. The swap and the commit are then
+        handled by jobs, that depend on all of them and are not started if any
+        of them fails. Stale rows are removed after the swap, by a job of its own.
+        """
+        if self.run is None:
+            return None
+        depends_on = [job for entity_jobs in jobs.values() for job in entity_jobs]
+        swap_job = None
+        if self.run.schema and depends_on:
+            swap_job = django_rq.enqueue(
+                swap_shadow_schema, self.run.id, depends_on=depends_on
+            )
+            django_rq.enqueue(remove_stale_rows, self.run.id, depends_on=[swap_job])
+            depends_on = [swap_job]
+        elif self.run.schema:
+            swap_shadow_schema(self.run.id)
+            remove_stale_rows(self.run.id)
+            self.run.refresh_from_db()
+        if not record_commit or not self.run.commit:
+            return swap_job
+        if depends_on:
+            return django_rq.enqueue(
+                save_imported_commit,
+                self.study.id,
+                self.run.commit,
+                depends_on=depends_on,
+            )
+        save_imported_commit(self.study.id, self.run.commit)
+        self.study.current_commit = self.run.commit
+        return None
+
+    def discard_shadow(self) -> None:
+        """Drop the shadow schema of the current import run, e.g. after a failure."""
+        if self.run is not None:
+            drop_shadow_schema(self.run)
+
+    def _execute(
+        self,
+        import_function: FunctionType,
+        *args,
+        depends_on: Optional[List[Job]] = None,
+    ) -> Optional[Job]:
+        """Queue or call an import function.
+
+        Queued jobs are only started after all jobs in `depends_on` finished.
+        """
         if self.redis:
-            django_rq.enqueue(import_function, *args)
-        else:
-            import_function(*args)
+            if depends_on:
+                return django_rq.enqueue(import_function, *args, depends_on=depends_on)
+            return django_rq.enqueue(import_function, *args)
+        import_function(*args)
+        return None
 
-    def import_single_entity(self, entity: str, filename: str = None):
+    def import_single_entity(
+        self,
+        entity: str,
+        filename: str = None,
+        depends_on: Optional[List[Job]] = None,
+    ) -> List[Job]:
         """
         Example usage:
 
@@ -270,7 +472,11 @@ class StudyImportManager:
         manager.import_single_entity("periods")
         manager.import_single_entity("instruments", "instruments/some-instrument.json")
 
+        Returns the queued jobs, if the import is run with redis.
+        Every imported file is recorded in the current import run.
         """
+        if self.run is None:
+            self.start_run()
         if "concepts" in entity or "variables" in entity:
             self.fix_concepts_csv()
         self.__log_import_start(entity)
@@ -291,6 +497,7 @@ class StudyImportManager:
                 self.__log_import_fail(file)
                 sys.exit(1)
 
+        imports = []
         for file in default_importer_files:
             self.__log_import_start(file.name)
             if not file.is_file():  # type: ignore
@@ -301,7 +508,31 @@ class StudyImportManager:
             else:
                 _importer = importer_class(file, self.study)
                 importer = _importer.run_import
-            self._execute(importer, file, self.study)
+            imports.append((self.run.id, entity, importer, file, self.study))
+
+        if entity in SINGLE_FILE_ENTITIES and self._run_in_pool(len(imports)):
+            import_files_in_parallel(imports)
+            return []
+        jobs = []
+        for arguments in imports:
+            job = self._execute(run_instrumented, *arguments, depends_on=depends_on)
+            if job is not None:
+                jobs.append(job)
+        return jobs
+
+    def _run_in_pool(self, number_of_files: int) -> bool:
+        """Check if the files of an entity can be imported by a pool of processes.
+
+        Queued imports already run one job per file. Imports inside of a
+        transaction stay in this process, because the workers could not see
+        the uncommitted content.
+        """
+        return (
+            not self.redis
+            and number_of_files > 1
+            and settings.IMPORT_WORKERS > 1
+            and not connection.in_atomic_block
+        )
 
     def __log_import_start(self, file: str) -> None:
         LOGGER.info('Study "%s" starts import of: "%s"', self.study.name, file)
@@ -318,7 +549,130 @@ class StudyImportManager:
 
         manager.import_all_entities()
 
+        Returns the queued jobs per entity, if the import is run with redis.
         """
         self.__log_import_start("all entities")
-        for entity in self.import_order.keys():
-            self.import_single_entity(entity)
+        return self.import_entities(self.import_order.keys())
+
+    def import_entities(
+        self,
+        entities: Iterable[str],
+        entity_files: Optional[Dict[str, List[Path]]] = None,
+    ) -> Dict[str, List[Job]]:
+        """Import entities in an order that satisfies IMPORT_DEPENDENCIES.
+
+        `entity_files` can restrict per file entities to a selection of files.
+
+        With redis, every entity is queued right away and chained to the jobs
+        of its dependencies through `depends_on`. Independent entities can then
+        be processed concurrently by multiple workers.
+        If a dependency produced no job, e.g. because its file does not exist,
+        the entity waits for the dependencies of that dependency instead.
+        All entities are recorded in a new import run. Without redis, the
+        parsed source files of the run are released once all entities are imported.
+        """
+        self.start_run()
+        jobs: Dict[str, List[Job]] = {}
+        barriers: Dict[str, List[Job]] = {}
+        for entity in self.schedule(entities):
+            depends_on = [
+                job
+                for dependency in IMPORT_DEPENDENCIES.get(entity, ())
+                for job in barriers.get(dependency, [])
+            ]
+            if entity_files and entity in entity_files:
+                jobs[entity] = [
+                    job
+                    for file in entity_files[entity]
+                    for job in self.import_single_entity(
+                        entity, str(file), depends_on=depends_on
+                    )
+                ]
+            else:
+                jobs[entity] = self.import_single_entity(entity, depends_on=depends_on)
+            barriers[entity] = jobs[entity] or depends_on
+        if not self.redis:
+            release_source_cache()
+        return jobs
+
+    def import_changed_entities(
+        self, changed_files: Iterable[str]
+    ) -> Dict[str, List[Job]]:
+        """Import only the entities affected by a list of changed files.
+
+        Paths are expected relative to the repository root, as returned by
+        Repository.list_changed_files. Entities reading a changed file are
+        imported together with all their downstream dependents.
+        Per file entities, whose dependencies did not change, only import the
+        changed files themselves.
+        Deleted files can not be handled incrementally and lead to a full import.
+        """
+        files = []
+        for changed_file in changed_files:
+            path = Path(changed_file)
+            if path.is_relative_to(STATISTICS_SUB_DIRECTORY):
+                # Statistics files lie next to the import path.
+                files.append(Path("..", path))
+            elif path.is_relative_to(settings.IMPORT_SUB_DIRECTORY):
+                files.append(path.relative_to(settings.IMPORT_SUB_DIRECTORY))
+        if not files:
+            self.__log_import_start("no changed entities")
+            return {}
+        if not all(self.base_dir.joinpath(file).is_file() for file in files):
+            LOGGER.info(
+                'Study "%s" has deleted files. Falling back to full import.',
+                self.study.name,
+            )
+            return self.import_all_entities()
+
+        changed = self.changed_entities(files)
+        selected = self.with_dependents(changed)
+        entity_files: Dict[str, List[Path]] = {}
+        for entity in SINGLE_FILE_ENTITIES:
+            if entity not in changed:
+                continue
+            if selected.intersection(IMPORT_DEPENDENCIES[entity]):
+                continue
+            entity_files[entity] = [
+                file
+                for file in files
+                if any(
+                    fnmatch(file.as_posix(), source) for source in IMPORT_SOURCES[entity]
+                )
+            ]
+        self.__log_import_start(", ".join(self.schedule(selected)))
+        return self.import_entities(selected, entity_files)
+
+    @staticmethod
+    def changed_entities(files: Iterable[Path]) -> Set[str]:
+        """Return the entities that read any of the files.
+
+        Files are expected relative to the import path of the study.
+        """
+        entities = set()
+        for file in files:
+            for entity, sources in IMPORT_SOURCES.items():
+                if any(fnmatch(Path(file).as_posix(), source) for source in sources):
+                    entities.add(entity)
+        return entities
+
+    @staticmethod
+    def with_dependents(entities: Iterable[str]) -> Set[str]:
+        """Extend a set of entities by all entities that depend on them."""
+        selected = set(entities)
+        extended = True
+        while extended:
+            extended = False
+            for entity, dependencies in IMPORT_DEPENDENCIES.items():
+                if entity not in selected and selected.intersection(dependencies):
+                    selected.add(entity)
+                    extended = True
+        return selected
+
+    def schedule(self, entities: Iterable[str]) -> List[str]:
+        """Order entities so that each one follows all of its dependencies.
+
+        The import_order is kept in a topological order of IMPORT_DEPENDENCIES.
+        """
+        selected = set(entities)
+        return [entity for entity in self.import_order if entity in selected]
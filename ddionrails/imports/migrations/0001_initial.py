@@ -0,0 +1,51 @@
+# Generated by Django 4.1.2 on 2026-10-18 09:12
+# pylint: disable=all
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("studies", "0004_study_menu_order"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RowDigest",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "entity",
+                    models.CharField(
+                        help_text="Name of the import entity, e.g. variables",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.UUIDField(help_text="UUID of the imported object"),
+                ),
+                (
+                    "digest",
+                    models.CharField(
+                        help_text="SHA-256 digest of the source rows", max_length=64
+                    ),
+                ),
+                (
+                    "study",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="row_digests",
+                        to="studies.study",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("study", "entity", "object_id")},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.1.2 on 2026-10-18 10:03
+# pylint: disable=all
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("studies", "0004_study_menu_order"),
+        ("imports", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "importer",
+                    models.CharField(
+                        help_text="Name of the importer class", max_length=255
+                    ),
+                ),
+                (
+                    "filename",
+                    models.TextField(help_text="Path of the imported file"),
+                ),
+                (
+                    "file_digest",
+                    models.CharField(
+                        help_text="SHA-256 digest of the imported file", max_length=64
+                    ),
+                ),
+                (
+                    "rows",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of rows that were already committed"
+                    ),
+                ),
+                (
+                    "study",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_checkpoints",
+                        to="studies.study",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("study", "importer", "filename")},
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.1.2 on 2026-10-18 10:41
+# pylint: disable=all
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("studies", "0004_study_menu_order"),
+        ("imports", "0002_importcheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportRun",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "commit",
+                    models.CharField(
+                        blank=True,
+                        help_text="Imported commit of the study repository",
+                        max_length=255,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "study",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_runs",
+                        to="studies.study",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ImportRunEntry",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "entity",
+                    models.CharField(
+                        help_text="Name of the import entity", max_length=255
+                    ),
+                ),
+                ("filename", models.TextField(help_text="Path of the imported file")),
+                ("started", models.DateTimeField()),
+                ("wall_time", models.FloatField(help_text="Elapsed time in seconds")),
+                (
+                    "cpu_time",
+                    models.FloatField(
+                        help_text="CPU time of the importing process in seconds"
+                    ),
+                ),
+                (
+                    "rows",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Number of data rows in CSV files",
+                        null=True,
+                    ),
+                ),
+                (
+                    "queries",
+                    models.PositiveIntegerField(
+                        help_text="Number of executed SQL queries"
+                    ),
+                ),
+                (
+                    "peak_memory",
+                    models.PositiveBigIntegerField(
+                        help_text="Peak resident set size of the importing process in bytes"
+                    ),
+                ),
+                ("succeeded", models.BooleanField(default=True)),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entries",
+                        to="imports.importrun",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["started"],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.2 on 2026-10-18 14:12
+# pylint: disable=all
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("imports", "0003_importrun_importrunentry"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="importrunentry",
+            old_name="peak_memory",
+            new_name="process_peak_memory",
+        ),
+        migrations.AlterField(
+            model_name="importrunentry",
+            name="process_peak_memory",
+            field=models.PositiveBigIntegerField(
+                help_text="Peak resident set size of the whole importing process in bytes"
+            ),
+        ),
+    ]
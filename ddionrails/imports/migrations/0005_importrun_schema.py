@@ -0,0 +1,23 @@
+# Generated by Django 4.1.2 on 2026-10-18 15:40
+# pylint: disable=all
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("imports", "0004_rename_peak_memory_importrunentry_process_peak_memory"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importrun",
+            name="schema",
+            field=models.CharField(
+                blank=True,
+                help_text="Shadow schema of a clean import, until it is swapped in",
+                max_length=63,
+            ),
+        ),
+    ]
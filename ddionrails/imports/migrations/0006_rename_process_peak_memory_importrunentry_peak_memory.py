@@ -0,0 +1,35 @@
+# Generated by Django 4.1.2 on 2026-10-18 16:40
+# pylint: disable=all
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("imports", "0005_importrun_schema"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="importrunentry",
+            old_name="process_peak_memory",
+            new_name="peak_memory",
+        ),
+        migrations.AlterField(
+            model_name="importrunentry",
+            name="peak_memory",
+            field=models.PositiveBigIntegerField(
+                blank=True,
+                help_text="Peak resident set size during the import in bytes",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="importrunentry",
+            name="cpu_time",
+            field=models.FloatField(
+                help_text="CPU time of the importing process and its children in seconds"
+            ),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+""" Model definitions for ddionrails.imports app """
+
+from django.db import models
+
+from ddionrails.studies.models import Study
+
+
+class RowDigest(models.Model):
+    """Content digest of the source rows an imported object was built from.
+
+    Digests are keyed by the deterministic UUID of the imported object.
+    A re-import compares the digests of the new source rows with the stored
+    ones and only writes the objects whose rows changed.
+    """
+
+    id = models.AutoField(primary_key=True)  # pylint: disable=invalid-name
+    study = models.ForeignKey(Study, on_delete=models.CASCADE, related_name="row_digests")
+    entity = models.CharField(
+        max_length=255, help_text="Name of the import entity, e.g. variables"
+    )
+    object_id = models.UUIDField(help_text="UUID of the imported object")
+    digest = models.CharField(
+        max_length=64, help_text="SHA-256 digest of the source rows"
+    )
+
+    class Meta:  # pylint: disable=missing-docstring,too-few-public-methods
+        unique_together = ("study", "entity", "object_id")
+
+
+class ImportCheckpoint(models.Model):
+    """Progress of a streaming import, that was interrupted.
+
+    The checkpoint belongs to a specific version of the imported file.
+    It is ignored if the digest of the file changed in the meantime.
+    """
+
+    id = models.AutoField(primary_key=True)  # pylint: disable=invalid-name
+    study = models.ForeignKey(
+        Study,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name="import_checkpoints",
+    )
+    importer = models.CharField(max_length=255, help_text="Name of the importer class")
+    filename = models.TextField(help_text="Path of the imported file")
+    file_digest = models.CharField(
+        max_length=64, help_text="SHA-256 digest of the imported file"
+    )
+    rows = models.PositiveIntegerField(
+        default=0, help_text="Number of rows that were already committed"
+    )
+
+    class Meta:  # pylint: disable=missing-docstring,too-few-public-methods
+        unique_together = ("study", "importer", "filename")
+
+
+class ImportRun(models.Model):
+    """A single import of a study, e.g. by the update management command."""
+
+    id = models.AutoField(primary_key=True)  # pylint: disable=invalid-name
+    study = models.ForeignKey(Study, on_delete=models.CASCADE, related_name="import_runs")
+    commit = models.CharField(
+        max_length=255, blank=True, help_text="Imported commit of the study repository"
+    )
+    schema = models.CharField(
+        max_length=63,
+        blank=True,
+        help_text="Shadow schema of a clean import, until it is swapped in",
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:  # pylint: disable=missing-docstring,too-few-public-methods
+        ordering = ["-created"]
+
+
+class ImportRunEntry(models.Model):
+    """Performance figures of importing a single file of an entity."""
+
+    id = models.AutoField(primary_key=True)  # pylint: disable=invalid-name
+    run = models.ForeignKey(ImportRun, on_delete=models.CASCADE, related_name="entries")
+    entity = models.CharField(max_length=255, help_text="Name of the import entity")
+    filename = models.TextField(help_text="Path of the imported file")
+    started = models.DateTimeField()
+    wall_time = models.FloatField(help_text="Elapsed time in seconds")
+    cpu_time = models.FloatField(
+        help_text="CPU time of the importing process and its children in seconds"
+    )
+    rows = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Number of data rows in CSV files"
+    )
+    queries = models.PositiveIntegerField(help_text="Number of executed SQL queries")
+    peak_memory = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Peak resident set size during the import in bytes",
+    )
+    succeeded = models.BooleanField(default=True)
+
+    class Meta:  # pylint: disable=missing-docstring,too-few-public-methods
+        ordering = ["started"]
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+
+""" Shadow schemas for clean imports of the ddionrails project """
+
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple, Type
+
+from django.apps import apps
+from django.db import connection, models, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.expressions import RawSQL
+
+from ddionrails.studies.models import Study
+
+from .models import ImportRun
+
+# Models holding the imported content of a study, with the lookup from each
+# model to its study. Rows of models without a lookup are shared by all
+# studies. Their shadow tables start with a copy of the live rows and they
+# are only added or updated by a swap, never removed.
+SHADOW_MODELS: Tuple[Tuple[str, Optional[str]], ...] = (
+    ("concepts.Topic", "study"),
+    ("concepts.Concept", None),
+    ("concepts.Concept_topics", "topic__study"),
+    ("concepts.Period", "study"),
+    ("concepts.AnalysisUnit", "study"),
+    ("concepts.ConceptualDataset", "study"),
+    ("data.Dataset", "study"),
+    ("data.Variable", "dataset__study"),
+    ("data.Transformation", "origin__dataset__study"),
+    ("instruments.Instrument", "study"),
+    ("instruments.Instrument_datasets", "instrument__study"),
+    ("instruments.Question", "instrument__study"),
+    ("instruments.QuestionItem", "question__instrument__study"),
+    ("instruments.Answer", None),
+    ("instruments.Answer_question_items", "questionitem__question__instrument__study"),
+    ("instruments.ConceptQuestion", "question__instrument__study"),
+    ("instruments.QuestionVariable", "question__instrument__study"),
+    ("publications.Publication", "study"),
+    ("publications.Attachment", "context_study"),
+    ("statistics.IndependentVariable", "variable__dataset__study"),
+    ("statistics.VariableStatistic", "variable__dataset__study"),
+    (
+        "statistics.VariableStatistic_independent_variables",
+        "variablestatistic__variable__dataset__study",
+    ),
+    ("statistics.StatisticsMetadata", "variable__dataset__study"),
+    ("studies.TopicList", "study"),
+    ("workspace.ScriptMetadata", "study"),
+    ("imports.RowDigest", "study"),
+    ("imports.ImportCheckpoint", "study"),
+)
+
+# The shadow schema used by the imports of this process.
+_SCHEMA: Optional[str] = None
+
+
+def shadow_models() -> List[Tuple[Type[models.Model], Optional[str]]]:
+    """Return the models of SHADOW_MODELS with their study lookups."""
+    return [(apps.get_model(label), lookup) for label, lookup in SHADOW_MODELS]
+
+
+def shadow_schema_name(run: ImportRun) -> str:
+    """Return the name of the shadow schema of an import run."""
+    return f"import_run_{run.id}"
+
+
+def current_shadow_schema() -> Optional[str]:
+    """Return the shadow schema the imports of this process write to, if any."""
+    return _SCHEMA
+
+
+def _prepend_to_search_path(database_connection, schema: str) -> None:
+    with database_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('search_path', %s || ', ' || "
+            "current_setting('search_path'), false)",
+            [database_connection.ops.quote_name(schema)],
+        )
+
+
+def _on_connection_created(sender, connection, **kwargs):  # pylint: disable=W0613,W0621
+    """Put the shadow schema in front of the search path of new connections.
+
+    Importers reading files in a pool of processes close the connection in
+    the middle of an import. The next connection still has to use the shadow.
+    """
+    if _SCHEMA is not None:
+        _prepend_to_search_path(connection, _SCHEMA)
+
+
+connection_created.connect(_on_connection_created)
+
+
+def _reset_search_path() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute("RESET search_path")
+
+
+@contextmanager
+def use_shadow_schema(schema: Optional[str]) -> Iterator[None]:
+    """Resolve the tables of SHADOW_MODELS in a shadow schema.
+
+    All other tables are still resolved in the live schema. Without a schema
+    nothing changes.
+    """
+    global _SCHEMA  # pylint: disable=global-statement
+    if not schema:
+        yield
+        return
+    connection.ensure_connection()
+    _prepend_to_search_path(connection, schema)
+    _SCHEMA = schema
+    try:
+        yield
+    finally:
+        _SCHEMA = None
+        _reset_search_path()
+
+
+@contextmanager
+def use_live_schema() -> Iterator[None]:
+    """Resolve all tables in the live schema during a shadow import.
+
+    Rows of other studies are only found in the live schema.
+    """
+    global _SCHEMA  # pylint: disable=global-statement
+    schema = _SCHEMA
+    if schema is None:
+        yield
+        return
+    _SCHEMA = None
+    _reset_search_path()
+    try:
+        yield
+    finally:
+        _prepend_to_search_path(connection, schema)
+        _SCHEMA = schema
+
+
+def create_shadow_schema(run: ImportRun) -> str:
+    """Create an empty copy of the tables of SHADOW_MODELS for an import run.
+
+    The copies keep the indexes and unique constraints of the live tables,
+    which the upserts of the importers rely on. Foreign keys are left out,
+    so shadow rows can refer to live rows, e.g. to the study. Tables shared
+    by all studies are filled with the live rows, so the imports can refer to
+    rows imported by other studies.
+    """
+    schema = shadow_schema_name(run)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {quote(schema)}")
+        for model, lookup in shadow_models():
+            table = quote(model._meta.db_table)
+            cursor.execute(
+                f"CREATE TABLE {quote(schema)}.{table} (LIKE {table} INCLUDING ALL)"
+            )
+            if lookup is None:
+                cursor.execute(
+                    f"INSERT INTO {quote(schema)}.{table} SELECT * FROM {table}"
+                )
+    run.schema = schema
+    run.save(update_fields=["schema"])
+    return schema
+
+
+def drop_shadow_schema(run: ImportRun) -> None:
+    """Remove the shadow schema of an import run with all of its rows."""
+    if not run.schema:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DROP SCHEMA IF EXISTS {connection.ops.quote_name(run.schema)} CASCADE"
+        )
+    run.schema = ""
+    run.save(update_fields=["schema"])
+
+
+def _key_columns(model: Type[models.Model]) -> List[str]:
+    """Return the columns identifying the same row in the shadow and live tables.
+
+    Generated ids identify rows by their content. Serial ids differ between
+    the tables, so rows are identified by their unique fields instead. Rows
+    without either are all replaced.
+    """
+    options = model._meta
+    if not isinstance(options.pk, models.AutoField):
+        return [options.pk.column]
+    if options.unique_together:
+        return [options.get_field(name).column for name in options.unique_together[0]]
+    return []
+
+
+def _delete_stale_rows(
+    model: Type[models.Model], lookup: str, study: Study, schema: str
+) -> None:
+    """Delete the live rows of a study, that are missing from the shadow table.
+
+    Rows identified by their primary key are deleted by the ORM, so the rows
+    referring to them are deleted as well. Rows identified by other columns
+    have no such rows and are deleted by a single statement.
+    """
+    quote = connection.ops.quote_name
+    options = model._meta
+    shadow_table = f"{quote(schema)}.{quote(options.db_table)}"
+    study_rows = model.objects.filter(**{lookup: study})
+    key = _key_columns(model)
+    if key == [options.pk.column]:
+        study_rows.exclude(
+            pk__in=RawSQL(f"SELECT {quote(key[0])} FROM {shadow_table}", [])
+        ).delete()
+        return
+    study_sql, params = study_rows.values("pk").query.sql_with_params()
+    matches = " AND ".join(
+        f"shadow.{quote(column)} = live.{quote(column)}" for column in key
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(options.db_table)} AS live "
+            f"WHERE live.{quote(options.pk.column)} IN ({study_sql}) "
+            f"AND NOT EXISTS (SELECT 1 FROM {shadow_table} AS shadow WHERE {matches})",
+            params,
+        )
+
+
+def _copy_shadow_rows(model: Type[models.Model], schema: str) -> None:
+    """Insert the shadow rows into the live table, updating rows with the same key.
+
+    Rows are only rewritten if their content changed.
+    """
+    quote = connection.ops.quote_name
+    options = model._meta
+    key = _key_columns(model)
+    columns = [
+        field.column
+        for field in options.concrete_fields
+        if not (field.primary_key and isinstance(field, models.AutoField))
+    ]
+    names = ", ".join(quote(column) for column in columns)
+    live_table = quote(options.db_table)
+    sql = (
+        f"INSERT INTO {live_table} ({names}) "
+        f"SELECT {names} FROM {quote(schema)}.{live_table}"
+    )
+    updated = [column for column in columns if column not in key]
+    if key and updated:
+        sql += (
+            f" ON CONFLICT ({', '.join(quote(column) for column in key)}) DO UPDATE SET "
+            + ", ".join(
+                f"{quote(column)} = EXCLUDED.{quote(column)}" for column in updated
+            )
+            + " WHERE ("
+            + ", ".join(f"{live_table}.{quote(column)}" for column in updated)
+            + ") IS DISTINCT FROM ("
+            + ", ".join(f"EXCLUDED.{quote(column)}" for column in updated)
+            + ")"
+        )
+    elif key:
+        sql += " ON CONFLICT DO NOTHING"
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+def swap_shadow_schema(run_id: int) -> None:
+    """Copy the content of a shadow schema into the live tables.
+
+    The shadow rows are copied in a single transaction, so readers switch
+    from the old to the new content at once. Only changed rows are rewritten.
+    Rows without key columns can not be matched to their shadow rows, they
+    are replaced by the transaction. Stale rows are left to remove_stale_rows.
+    """
+    run = ImportRun.objects.select_related("study").get(id=run_id)
+    with transaction.atomic():
+        for model, lookup in shadow_models():
+            if lookup is not None and not _key_columns(model):
+                model.objects.filter(**{lookup: run.study}).delete()
+            _copy_shadow_rows(model, run.schema)
+
+
+def remove_stale_rows(run_id: int) -> None:
+    """Delete the live rows of a study, that are missing from its swapped shadow schema.
+
+    Rows, that are kept, are left as they are, together with the rows
+    referring to them, e.g. variables in baskets. The shadow schema is
+    dropped afterwards.
+    """
+    run = ImportRun.objects.select_related("study").get(id=run_id)
+    if not run.schema:
+        return
+    for model, lookup in shadow_models():
+        if lookup is not None and _key_columns(model):
+            _delete_stale_rows(model, lookup, run.study, run.schema)
+    drop_shadow_schema(run)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+""" Run scoped cache of parsed import source files """
+
+import csv
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+
+class ParsedSource(NamedTuple):
+    """The rows of a CSV file, stored as a header and one tuple per row.
+
+    Repeated cell values share a single string object, which keeps files with
+    many repeated names, e.g. the instrument column of questions.csv, compact.
+    """
+
+    modified: int
+    size: int
+    header: Tuple[str, ...]
+    rows: List[Tuple[Optional[str], ...]]
+
+    def __iter__(self) -> Iterator[Dict[Optional[str], str]]:  # type: ignore
+        """Iterate over the rows as dictionaries, like csv.DictReader does."""
+        header = self.header
+        width = len(header)
+        for row in self.rows:
+            element = dict(zip(header, row))
+            if len(row) > width:
+                element[None] = list(row[width:])  # type: ignore
+            yield element  # type: ignore
+
+
+def parse_source(filename: Union[Path, str]) -> ParsedSource:
+    """Parse a CSV file into a ParsedSource."""
+    path = Path(filename)
+    stat = path.stat()
+    values: Dict[str, str] = {}
+    rows: List[Tuple[Optional[str], ...]] = []
+    with open(path, "r", encoding="utf8", newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        header = tuple(next(reader, ()))
+        width = len(header)
+        for row in reader:
+            # csv.DictReader skips empty rows and fills missing cells with None.
+            if not row:
+                continue
+            cells: List[Optional[str]] = [values.setdefault(cell, cell) for cell in row]
+            cells.extend([None] * (width - len(cells)))
+            rows.append(tuple(cells))
+    return ParsedSource(stat.st_mtime_ns, stat.st_size, header, rows)
+
+
+class SourceCache:
+    """Parsed source files of a single import run.
+
+    Files are parsed on first use and handed out as fresh row dictionaries on
+    every read. A file is parsed again, if its modification time or size
+    changed since it was cached.
+    """
+
+    def __init__(self, run_id: Optional[int] = None) -> None:
+        self.run_id = run_id
+        self._sources: Dict[Path, ParsedSource] = {}
+
+    def get(self, filename: Union[Path, str]) -> ParsedSource:
+        """Return the parsed content of a file."""
+        path = Path(filename).resolve()
+        stat = path.stat()
+        source = self._sources.get(path)
+        if source is None or (source.modified, source.size) != (
+            stat.st_mtime_ns,
+            stat.st_size,
+        ):
+            source = parse_source(path)
+            self._sources[path] = source
+        return source
+
+    def invalidate(self, filename: Union[Path, str]) -> None:
+        """Drop a file from the cache, e.g. after it was rewritten."""
+        self._sources.pop(Path(filename).resolve(), None)
+
+
+_CACHE: Optional[SourceCache] = None
+# Number of data rows of the CSV files read by the importers of this process.
+_ROW_COUNTS: Dict[Path, int] = {}
+
+
+def activate_source_cache(run_id: int) -> SourceCache:
+    """Use a source cache for all imports of an import run in this process.
+
+    Synchronous imports share one cache for the whole run. Queued imports run
+    in a forked work horse per job, so their cache only lives as long as
+    a single job.
+    """
+    global _CACHE  # pylint: disable=global-statement
+    if _CACHE is None or _CACHE.run_id != run_id:
+        _CACHE = SourceCache(run_id)
+    return _CACHE
+
+
+def release_source_cache() -> None:
+    """Free the source cache of the current import run."""
+    global _CACHE  # pylint: disable=global-statement
+    _CACHE = None
+
+
+def invalidate_source(filename: Union[Path, str]) -> None:
+    """Drop a rewritten file from the source cache of the current import run."""
+    if _CACHE is not None:
+        _CACHE.invalidate(filename)
+
+
+def source_header(filename: Union[Path, str]) -> Tuple[str, ...]:
+    """Return the column names of a CSV file."""
+    if _CACHE is not None:
+        return _CACHE.get(filename).header
+    with open(filename, "r", encoding="utf8") as csv_file:
+        return tuple(next(csv.reader(csv_file), ()))
+
+
+def read_source(filename: Union[Path, str]) -> Iterator[Dict[str, str]]:
+    """Iterate over the rows of a CSV file as dictionaries.
+
+    Inside an import run the file is parsed only once and shared by all
+    importers reading it. Outside of a run the file is read lazily from disk.
+    """
+    if _CACHE is not None:
+        source = _CACHE.get(filename)
+        _ROW_COUNTS[Path(filename).resolve()] = len(source.rows)
+        yield from source  # type: ignore
+        return
+    yield from stream_source(filename)
+
+
+def stream_source(filename: Union[Path, str]) -> Iterator[Dict[str, str]]:
+    """Iterate over the rows of a CSV file as dictionaries, read lazily from disk.
+
+    The source cache of the current import run is bypassed, so large files,
+    that are read once in chunks, are never held in memory as a whole.
+    """
+    rows = 0
+    with open(filename, "r", encoding="utf8") as csv_file:
+        for rows, row in enumerate(csv.DictReader(csv_file), start=1):
+            yield row
+    _ROW_COUNTS[Path(filename).resolve()] = rows
+
+
+def forget_row_count(filename: Union[Path, str]) -> None:
+    """Drop the recorded number of data rows of a CSV file."""
+    _ROW_COUNTS.pop(Path(filename).resolve(), None)
+
+
+def row_count(filename: Union[Path, str]) -> Optional[int]:
+    """Return the number of data rows of a CSV file, without its header.
+
+    Rows are counted while the file is read by the importers, so the count is
+    only known for files that were read completely since the count was last
+    forgotten.
+    """
+    return _ROW_COUNTS.get(Path(filename).resolve())
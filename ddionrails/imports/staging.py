@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+""" PostgreSQL COPY based bulk loader for imports of the ddionrails project """
+
+import json
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Type
+
+from django.conf import settings
+from django.db import connection, models, transaction
+
+STAGING_POSITION = "staging_position"
+
+
+def copy_loader_enabled() -> bool:
+    """Check if large tables should be loaded with COPY instead of the ORM."""
+    return bool(settings.IMPORT_COPY_LOADER) and connection.vendor == "postgresql"
+
+
+def _array_element(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _copy_text(value: Any) -> str:
+    """Convert a database value into a field of the COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (list, tuple)):
+        value = "{" + ",".join(_array_element(element) for element in value) + "}"
+    elif isinstance(value, dict):
+        value = json.dumps(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+        .replace("\t", "\\t")
+    )
+
+
+class CopyStream:
+    """File like object, that reads the COPY text lines of model instances."""
+
+    def __init__(self, objects: Iterable[models.Model], fields: Sequence[models.Field]):
+        self._lines = self._read_lines(objects, fields)
+        self._buffer = ""
+
+    @staticmethod
+    def _read_lines(
+        objects: Iterable[models.Model], fields: Sequence[models.Field]
+    ) -> Iterator[str]:
+        for instance in objects:
+            values = (
+                field.get_db_prep_save(field.pre_save(instance, True), connection)
+                for field in fields
+            )
+            yield "\t".join(_copy_text(value) for value in values) + "\n"
+
+    def read(self, size: int = -1) -> str:
+        """Read at most `size` characters, or everything for a negative size."""
+        parts = [self._buffer]
+        length = len(self._buffer)
+        for line in self._lines:
+            parts.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+        content = "".join(parts)
+        if size < 0:
+            self._buffer = ""
+            return content
+        self._buffer = content[size:]
+        return content[:size]
+
+    readline = read
+
+
+def copy_upsert(
+    model: Type[models.Model],
+    objects: Iterable[models.Model],
+    update_fields: Optional[Sequence[str]] = None,
+) -> int:
+    """Load model instances through a staging table and merge them in one statement.
+
+    The instances are streamed into a temporary table with ``COPY FROM STDIN``
+    and then inserted into the table of the model with a single
+    ``INSERT ... SELECT``. Instances that already exist get their
+    `update_fields` updated, or are left alone if no `update_fields` are given.
+
+    Instances are identified by their primary key, which therefore has to be
+    set, e.g. from the deterministic UUIDs of ``hash_with_namespace_uuid``.
+    Models with an automatic primary key are identified by their unique
+    fields instead and get their key from the database. If an instance occurs
+    more than once, the last occurrence wins.
+
+    Returns the number of inserted or updated rows.
+    """
+    opts = model._meta
+    quote = connection.ops.quote_name
+    fields: List[models.Field] = [
+        field
+        for field in opts.concrete_fields
+        if not (field.primary_key and isinstance(field, models.AutoField))
+    ]
+    if opts.pk in fields:
+        key_columns = [opts.pk.column]
+    else:
+        key_columns = [
+            opts.get_field(name).column for name in (opts.unique_together or [()])[0]
+        ]
+    columns = ", ".join(quote(field.column) for field in fields)
+    keys = ", ".join(quote(column) for column in key_columns)
+    staging_table = quote(f"staging_{opts.db_table}")
+
+    if update_fields:
+        updates = ", ".join(
+            f"{column} = EXCLUDED.{column}"
+            for column in (quote(opts.get_field(name).column) for name in update_fields)
+        )
+        conflict = f"ON CONFLICT ({keys}) DO UPDATE SET {updates}"
+    else:
+        conflict = "ON CONFLICT DO NOTHING"
+    if key_columns:
+        select = (
+            f"SELECT DISTINCT ON ({keys}) {columns} FROM {staging_table} "
+            f"ORDER BY {keys}, {quote(STAGING_POSITION)} DESC"
+        )
+    else:
+        select = f"SELECT {columns} FROM {staging_table}"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {staging_table} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {quote(opts.db_table)} WITH NO DATA"
+        )
+        cursor.execute(
+            f"ALTER TABLE {staging_table} ADD COLUMN {quote(STAGING_POSITION)} bigserial"
+        )
+        cursor.copy_expert(
+            f"COPY {staging_table} ({columns}) FROM STDIN",
+            CopyStream(objects, fields),
+        )
+        cursor.execute(
+            f"INSERT INTO {quote(opts.db_table)} ({columns}) {select} {conflict}"
+        )
+        merged = cursor.rowcount
+        cursor.execute(f"DROP TABLE {staging_table}")
+    return merged
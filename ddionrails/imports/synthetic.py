@@ -0,0 +1,594 @@
+# -*- coding: utf-8 -*-
+
+""" Generator for synthetic study repositories used in import benchmarks """
+
+import csv
+import json
+from pathlib import Path
+from random import Random
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence
+
+from django.conf import settings
+
+DIMENSION_VARIABLE = "sex"
+DIMENSION_VALUES = ["maennlich", "weiblich"]
+
+
+class SyntheticStudyScale(NamedTuple):
+    """Number of objects in a synthetic study.
+
+    Variables are counted per dataset, questions per instrument, items per
+    question and answers per answer list.
+    """
+
+    datasets: int = 2
+    variables: int = 50
+    instruments: int = 2
+    questions: int = 20
+    items: int = 3
+    answers: int = 5
+    concepts: int = 20
+    transformations: int = 50
+    statistics: int = 5
+    periods: int = 3
+
+    def multiply(self, factor: int) -> "SyntheticStudyScale":
+        """Scale the objects of the biggest entities by a factor."""
+        return self._replace(
+            datasets=self.datasets * factor,
+            instruments=self.instruments * factor,
+            concepts=self.concepts * factor,
+            transformations=self.transformations * factor,
+            statistics=self.statistics * factor,
+        )
+
+
+SCALES = {
+    "small": SyntheticStudyScale(),
+    "medium": SyntheticStudyScale().multiply(10),
+    "large": SyntheticStudyScale().multiply(100),
+}
+
+
+def _write_csv(path: Path, header: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _write_json(path: Path, content: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf8") as json_file:
+        json.dump(content, json_file, ensure_ascii=False)
+
+
+class SyntheticStudy:
+    """Write a synthetic study in the formats the study importers expect.
+
+    The study is written to ``<base_path>/ddionrails/`` and its statistics
+    to ``<base_path>/statistics/``, like a study repository inside the
+    IMPORT_REPO_PATH. Content is derived from a seeded random generator,
+    so equal arguments always produce equal files.
+    """
+
+    def __init__(
+        self, name: str, scale: SyntheticStudyScale = SyntheticStudyScale(), seed=0
+    ) -> None:
+        self.name = name
+        self.scale = scale
+        self.random = Random(seed)
+        self.periods = [str(2000 + period) for period in range(scale.periods)]
+        self.concepts = [f"concept-{number}" for number in range(scale.concepts)]
+        self.topics = [f"topic-{number}" for number in range(max(scale.concepts // 5, 1))]
+        self.datasets = [f"dataset-{number}" for number in range(scale.datasets)]
+        self.instruments = [f"instrument-{number}" for number in range(scale.instruments)]
+
+    def variables(self, dataset: str) -> List[str]:
+        """Variable names of a dataset. Names are unique across datasets."""
+        number = self.datasets.index(dataset)
+        names = [
+            f"var{number}x{variable:06d}" for variable in range(self.scale.variables)
+        ]
+        if number == 0:
+            names.append(DIMENSION_VARIABLE)
+        return names
+
+    def questions(self, instrument: str) -> List[str]:
+        """Question names of an instrument."""
+        number = self.instruments.index(instrument)
+        return [f"q{number}x{question:06d}" for question in range(self.scale.questions)]
+
+    def statistics_variables(self) -> Dict[str, str]:
+        """Map variables with statistics to their statistics type."""
+        variables = [
+            variable
+            for dataset in self.datasets
+            for variable in self.variables(dataset)
+            if variable != DIMENSION_VARIABLE
+        ]
+        return {
+            variable: ("numerical", "categorical")[index % 2]
+            for index, variable in enumerate(variables[: self.scale.statistics])
+        }
+
+    def write(self, base_path: Path) -> Path:
+        """Write all files of the study and return its import path."""
+        import_path = base_path.joinpath(settings.IMPORT_SUB_DIRECTORY)
+        import_path.mkdir(parents=True, exist_ok=True)
+        self._write_study(import_path)
+        self._write_topics(import_path)
+        self._write_concepts(import_path)
+        self._write_study_structure(import_path)
+        self._write_datasets(import_path)
+        self._write_variables(import_path)
+        self._write_instruments(import_path)
+        self._write_questions(import_path)
+        self._write_relations(import_path)
+        self._write_publications(import_path)
+        self._write_statistics(base_path.joinpath("statistics"))
+        return import_path
+
+    def _label(self, prefix: str) -> str:
+        return f"{prefix} {self.random.randint(0, 10**6)}"
+
+    def _write_study(self, path: Path) -> None:
+        with open(path.joinpath("study.md"), "w", encoding="utf8") as study_file:
+            study_file.write(
+                f"---\nname: {self.name}\nlabel: {self.name}\nconfig: {{}}\n---\n\n"
+                f"# {self.name}\n\nSynthetic study\n"
+            )
+
+    def _write_topics(self, path: Path) -> None:
+        _write_csv(
+            path.joinpath("topics.csv"),
+            [
+                "study",
+                "name",
+                "parent",
+                "label",
+                "label_de",
+                "description",
+                "description_de",
+            ],
+            (
+                [
+                    self.name,
+                    topic,
+                    "",
+                    topic,
+                    topic,
+                    self._label("Topic"),
+                    self._label("Thema"),
+                ]
+                for topic in self.topics
+            ),
+        )
+        topic_list = []
+        for language in ("en", "de"):
+            tree = [
+                {
+                    "title": topic,
+                    "key": f"topic_{topic}",
+                    "type": "topic",
+                    "children": [
+                        {
+                            "title": concept,
+                            "key": f"concept_{concept}",
+                            "type": "concept",
+                        }
+                        for index, concept in enumerate(self.concepts)
+                        if index % len(self.topics) == topic_index
+                    ],
+                }
+                for topic_index, topic in enumerate(self.topics)
+            ]
+            topic_list.append({"language": language, "topics": tree})
+        _write_json(path.joinpath("topics.json"), topic_list)
+
+    def _write_concepts(self, path: Path) -> None:
+        _write_csv(
+            path.joinpath("concepts.csv"),
+            ["study", "name", "label", "label_de", "description", "topic"],
+            (
+                [
+                    self.name,
+                    concept,
+                    self._label("Concept"),
+                    self._label("Konzept"),
+                    "",
+                    self.topics[index % len(self.topics)],
+                ]
+                for index, concept in enumerate(self.concepts)
+            ),
+        )
+
+    def _write_study_structure(self, path: Path) -> None:
+        _write_csv(
+            path.joinpath("periods.csv"),
+            ["study", "name", "label", "label_de", "description", "definition"],
+            ([self.name, period, period, period, "", period] for period in self.periods),
+        )
+        _write_csv(
+            path.joinpath("analysis_units.csv"),
+            ["study", "name", "label", "label_de", "description"],
+            [[self.name, "p", "Person", "Person", ""]],
+        )
+        _write_csv(
+            path.joinpath("conceptual_datasets.csv"),
+            ["study", "name", "label", "label_de", "description"],
+            [[self.name, "synthetic", "Synthetic", "Synthetisch", ""]],
+        )
+
+    def _write_datasets(self, path: Path) -> None:
+        _write_csv(
+            path.joinpath("datasets.csv"),
+            [
+                "study",
+                "name",
+                "period",
+                "analysis_unit",
+                "conceptual_dataset",
+                "label",
+                "description",
+            ],
+            (
+                [
+                    self.name,
+                    dataset,
+                    self.periods[index % len(self.periods)],
+                    "p",
+                    "synthetic",
+                    self._label("Dataset"),
+                    "",
+                ]
+                for index, dataset in enumerate(self.datasets)
+            ),
+        )
+        for dataset in self.datasets:
+            _write_json(
+                path.joinpath("datasets", f"{dataset}.json"),
+                [
+                    {
+                        "study": self.name,
+                        "dataset": dataset,
+                        "name": variable,
+                        "label": self._label("Variable"),
+                        "label_de": self._label("Variable"),
+                        "scale": "cat",
+                        "categories": {
+                            "values": ["-1", "1", "2"],
+                            "labels": ["[-1] missing", "[1] yes", "[2] no"],
+                            "labels_de": ["[-1] fehlend", "[1] ja", "[2] nein"],
+                            "frequencies": [
+                                self.random.randint(0, 1000) for _ in range(3)
+                            ],
+                            "missings": [True, False, False],
+                        },
+                        "statistics": {
+                            "names": ["valid", "invalid"],
+                            "values": [str(self.random.randint(0, 1000)), "0"],
+                        },
+                    }
+                    for variable in self.variables(dataset)
+                ],
+            )
+
+    def _write_variables(self, path: Path) -> None:
+        statistics = self.statistics_variables()
+        _write_csv(
+            path.joinpath("variables.csv"),
+            [
+                "study",
+                "dataset",
+                "name",
+                "concept",
+                "label",
+                "label_de",
+                "description",
+                "image_url",
+                "type",
+                "statistics",
+            ],
+            (
+                [
+                    self.name,
+                    dataset,
+                    variable,
+                    self.concepts[index % len(self.concepts)] if self.concepts else "",
+                    self._label("Variable"),
+                    self._label("Variable"),
+                    self._label("Description"),
+                    "",
+                    statistics.get(variable, ""),
+                    str(variable in statistics),
+                ]
+                for dataset in self.datasets
+                for index, variable in enumerate(self.variables(dataset))
+            ),
+        )
+
+    def _write_instruments(self, path: Path) -> None:
+        _write_csv(
+            path.joinpath("instruments.csv"),
+            [
+                "study",
+                "name",
+                "label",
+                "label_de",
+                "description",
+                "description_de",
+                "analysis_unit",
+                "period",
+                "mode",
+                "type_position",
+                "type",
+                "type_de",
+            ],
+            (
+                [
+                    self.name,
+                    instrument,
+                    self._label("Instrument"),
+                    self._label("Instrument"),
+                    "",
+                    "",
+                    "p",
+                    self.periods[index % len(self.periods)],
+                    "CAPI",
+                    "1",
+                    "questionnaire",
+                    "Fragebogen",
+                ]
+                for index, instrument in enumerate(self.instruments)
+            ),
+        )
+        for index, instrument in enumerate(self.instruments):
+            questions = {}
+            for number, question in enumerate(self.questions(instrument)):
+                questions[question] = {
+                    "question": question,
+                    "name": question,
+                    "sn": number,
+                    "label": self._label("Question"),
+                    "label_de": self._label("Frage"),
+                    "items": [
+                        {"item": str(item), "text": self._label("Item")}
+                        for item in range(self.scale.items)
+                    ],
+                }
+            _write_json(
+                path.joinpath("instruments", f"{instrument}.json"),
+                {
+                    "study_name": self.name,
+                    "instrument": instrument,
+                    "label": self._label("Instrument"),
+                    "label_de": self._label("Instrument"),
+                    "period_name": self.periods[index % len(self.periods)],
+                    "analysis_unit_name": "p",
+                    "questions": questions,
+                },
+            )
+
+    def _write_questions(self, path: Path) -> None:
+        question_rows = []
+        answer_rows = []
+        for instrument in self.instruments:
+            answer_list = f"{instrument}-answers"
+            answer_rows.extend(
+                [
+                    self.name,
+                    instrument,
+                    answer_list,
+                    value,
+                    f"Antwort {value}",
+                    f"Answer {value}",
+                ]
+                for value in range(1, self.scale.answers + 1)
+            )
+            for number, question in enumerate(self.questions(instrument)):
+                concept = (
+                    self.concepts[number % len(self.concepts)] if self.concepts else ""
+                )
+                for item in range(self.scale.items):
+                    categorical = item > 0 and self.scale.answers > 0
+                    question_rows.append(
+                        [
+                            self.name,
+                            instrument,
+                            question,
+                            concept,
+                            str(item),
+                            self._label("Question"),
+                            self._label("Frage"),
+                            "",
+                            "",
+                            answer_list if categorical else "",
+                            "",
+                            "",
+                            "",
+                            "",
+                            "cat" if categorical else "txt",
+                        ]
+                    )
+        _write_csv(
+            path.joinpath("questions.csv"),
+            [
+                "study",
+                "instrument",
+                "name",
+                "concept",
+                "item",
+                "text",
+                "text_de",
+                "description",
+                "description_de",
+                "answer_list",
+                "instruction",
+                "instruction_de",
+                "filter",
+                "goto",
+                "scale",
+            ],
+            question_rows,
+        )
+        _write_csv(
+            path.joinpath("answers.csv"),
+            ["study", "instrument", "answer_list", "value", "label_de", "label"],
+            answer_rows,
+        )
+
+    def _write_relations(self, path: Path) -> None:
+        variables = [
+            (dataset, variable)
+            for dataset in self.datasets
+            for variable in self.variables(dataset)
+        ]
+        questions = [
+            (instrument, question)
+            for instrument in self.instruments
+            for question in self.questions(instrument)
+        ]
+        relations = []
+        if questions:
+            for index, (dataset, variable) in enumerate(variables):
+                instrument, question = questions[index % len(questions)]
+                relations.append([self.name, dataset, variable, instrument, question])
+        _write_csv(
+            path.joinpath("questions_variables.csv"),
+            ["study", "dataset", "variable", "instrument", "question"],
+            relations,
+        )
+        transformations = []
+        for _ in range(self.scale.transformations if len(variables) > 1 else 0):
+            origin, target = self.random.sample(variables, 2)
+            transformations.append([self.name, *origin, self.name, *target])
+        _write_csv(
+            path.joinpath("transformations.csv"),
+            [
+                "origin_study_name",
+                "origin_dataset_name",
+                "origin_variable_name",
+                "target_study_name",
+                "target_dataset_name",
+                "target_variable_name",
+            ],
+            transformations,
+        )
+        attachments = [["study", self.name, "", "", "", "", "https://example.org", "Web"]]
+        attachments.extend(
+            ["variable", self.name, dataset, variable, "", "", "https://example.org", ""]
+            for dataset, variable in variables[:: max(len(variables) // 10, 1)]
+        )
+        attachments.extend(
+            [
+                "question",
+                self.name,
+                "",
+                "",
+                instrument,
+                question,
+                "https://example.org",
+                "",
+            ]
+            for instrument, question in questions[:: max(len(questions) // 10, 1)]
+        )
+        _write_csv(
+            path.joinpath("attachments.csv"),
+            [
+                "type",
+                "study_name",
+                "dataset_name",
+                "variable_name",
+                "instrument_name",
+                "question_name",
+                "url",
+                "url_text",
+            ],
+            attachments,
+        )
+
+    def _write_publications(self, path: Path) -> None:
+        _write_csv(
+            path.joinpath("publications.csv"),
+            [
+                "name",
+                "title",
+                "author",
+                "year",
+                "abstract",
+                "cite",
+                "period",
+                "sub_type",
+                "study",
+                "url",
+                "doi",
+            ],
+            (
+                [
+                    str(number),
+                    self._label("Publication"),
+                    "Surname, Firstname",
+                    self.periods[number % len(self.periods)],
+                    "",
+                    "",
+                    self.periods[number % len(self.periods)],
+                    "article",
+                    self.name,
+                    "",
+                    "",
+                ]
+                for number in range(max(self.scale.datasets, 1))
+            ),
+        )
+
+    def _write_statistics(self, path: Path) -> None:
+        years = [int(period) for period in self.periods]
+        for variable, statistics_type in self.statistics_variables().items():
+            variable_path = path.joinpath(statistics_type, variable)
+            _write_json(
+                variable_path.joinpath("meta.json"),
+                [
+                    {
+                        "variable": DIMENSION_VARIABLE,
+                        "label": "Geschlecht",
+                        "values": DIMENSION_VALUES,
+                    }
+                ],
+            )
+            if statistics_type == "numerical":
+                header = ["year", "mean", "median", "n"]
+                header += [
+                    f"{measure}_{bound}_confidence"
+                    for measure in ("mean", "median")
+                    for bound in ("lower", "upper")
+                ]
+                groups: List[List[str]] = [[str(year)] for year in years]
+            else:
+                header = [variable, "year", "n", "percent"]
+                header += ["lower_confidence", "upper_confidence"]
+                groups = [
+                    [f"[{value}] Answer {value}", str(year)]
+                    for value in range(1, 4)
+                    for year in years
+                ]
+            measures = len(header) - len(groups[0]) if groups else 0
+            _write_csv(
+                variable_path.joinpath(f"{variable}_year.csv"),
+                header,
+                (group + self._measures(measures) for group in groups),
+            )
+            position = header.index("year") + 1
+            _write_csv(
+                variable_path.joinpath(f"{variable}_year_{DIMENSION_VARIABLE}.csv"),
+                header[:position] + [DIMENSION_VARIABLE] + header[position:],
+                (
+                    group + [value] + self._measures(measures)
+                    for group in groups
+                    for value in DIMENSION_VALUES
+                ),
+            )
+
+    def _measures(self, number: int) -> List[str]:
+        return [str(self.random.random()) for _ in range(number)]
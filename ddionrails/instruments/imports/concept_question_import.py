@@ -2,16 +2,22 @@
 
 """ Importer classes for ddionrails.instruments app """
 
-from csv import DictReader
-from typing import Dict, Optional, Set, Tuple
+import uuid
+from typing import Dict, Optional, Set, Tuple, Type
 
+from django.db import models
 from django.db.transaction import atomic
 
 from ddionrails.concepts.models import Concept
 from ddionrails.imports import imports
-from ddionrails.instruments.models import ConceptQuestion, Question
+from ddionrails.imports.helpers import BULK_BATCH_SIZE, chunks
+from ddionrails.imports.sources import read_source
+from ddionrails.instruments.models import ConceptQuestion, Instrument, Question
 from ddionrails.studies.models import Study
 
+ConceptQuestionRow = Tuple[str, str, str, Optional[str]]
+ConceptQuestionLinks = Dict[Tuple[uuid.UUID, uuid.UUID], ConceptQuestionRow]
+
 
 class ConceptQuestionImport(imports.CSVImport):
     """Imports links between Concepts and Questions
@@ -20,52 +26,78 @@ class ConceptQuestionImport(imports.CSVImport):
     Both Question and Concept have to already exist.
     """
 
-    content: Set[Tuple[str, str, str, Optional[str]]]
+    content: Set[ConceptQuestionRow]
 
     def read_file(self):
         self.content = set()
-        with open(self.file_path(), "r", encoding="utf8") as questions_csv:
-            reader = DictReader(questions_csv)
-            for row in reader:
-                _question = (
-                    row.get("study", row.get("study_name", "")),
-                    row.get("instrument", row.get("instrument_name", "")),
-                    row.get("name", row.get("question_name", "")),
-                    row.get("concept", row.get("concept_name", None)),
-                )
-                if _question[3] == "":
-                    continue
-                if "" in _question:
-                    raise ValueError(
-                        (
-                            "Expected values in columns: "
-                            "study, instrument, name and concept. "
-                            f"Got {_question}"
-                        )
+        for row in read_source(self.file_path()):
+            _question = (
+                row.get("study", row.get("study_name", "")),
+                row.get("instrument", row.get("instrument_name", "")),
+                row.get("name", row.get("question_name", "")),
+                row.get("concept", row.get("concept_name", None)),
+            )
+            if _question[3] == "":
+                continue
+            if "" in _question:
+                raise ValueError(
+                    (
+                        "Expected values in columns: "
+                        "study, instrument, name and concept. "
+                        f"Got {_question}"
                     )
-                self.content.add(_question)
+                )
+            self.content.add(_question)
 
     @atomic
     def execute_import(self):
-        studies: Dict[str, Study] = {}
+        studies = {
+            name: Study(name=name).generate_id(cache=True)
+            for name in {concept_question[0] for concept_question in self.content}
+        }
+        existing_studies = set(
+            Study.objects.filter(id__in=studies.values()).values_list("id", flat=True)
+        )
+        links: ConceptQuestionLinks = {}
         for concept_question_data in self.content:
-            if concept_question_data[0] not in studies:
-                try:
-                    study = Study.objects.get(name=concept_question_data[0])
-                    studies[study.name] = study
-                except Study.DoesNotExist:
-                    continue
-            try:
-                concept_question = Question.objects.get(
-                    instrument__study=studies[concept_question_data[0]],
-                    instrument__name=concept_question_data[1],
-                    name=concept_question_data[2],
-                )
-                concept = Concept.objects.get(name=concept_question_data[3])
-            except BaseException as error:
-                raise type(error)(
+            study_id = studies[concept_question_data[0]]
+            if study_id not in existing_studies:
+                continue
+            instrument_id = Instrument(
+                study_id=study_id, name=concept_question_data[1]
+            ).generate_id(cache=True)
+            question_id = Question(
+                instrument_id=instrument_id, name=concept_question_data[2]
+            ).generate_id()
+            concept_id = Concept(name=concept_question_data[3]).generate_id(cache=True)
+            links[(question_id, concept_id)] = concept_question_data
+
+        self._validate_existence(Question, 0, links)
+        self._validate_existence(Concept, 1, links)
+        ConceptQuestion.objects.bulk_create(
+            [
+                ConceptQuestion(question_id=question_id, concept_id=concept_id)
+                for question_id, concept_id in links
+            ],
+            batch_size=BULK_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def _validate_existence(
+        model: Type[models.Model],
+        position: int,
+        links: ConceptQuestionLinks,
+    ) -> None:
+        """Raise DoesNotExist for the first link to a missing object."""
+        ids = {link[position] for link in links}
+        existing = set()
+        for chunk in chunks(ids):
+            existing.update(
+                model.objects.filter(id__in=chunk).values_list("id", flat=True)
+            )
+        for link, concept_question_data in links.items():
+            if link[position] not in existing:
+                raise model.DoesNotExist(  # type: ignore
                     f"Could not import ConceptQuestion: {concept_question_data}"
                 )
-            ConceptQuestion.objects.get_or_create(
-                question=concept_question, concept=concept
-            )
@@ -2,15 +2,16 @@
 
 """ Importer classes for ddionrails.instruments app """
 
-import json
-from collections import OrderedDict
-from csv import DictReader
 from pathlib import Path
-from typing import Dict, Set
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from uuid import UUID
 
 from ddionrails.concepts.models import AnalysisUnit, Period
 from ddionrails.imports import imports
-from ddionrails.imports.helpers import hash_with_namespace_uuid
+from ddionrails.imports.delta import DigestStore
+from ddionrails.imports.helpers import BULK_BATCH_SIZE, chunks, hash_with_namespace_uuid
+from ddionrails.imports.json_stream import iter_json_items, read_json_object
+from ddionrails.imports.sources import read_source
 from ddionrails.instruments.models import Instrument, Question
 from ddionrails.studies.models import Study
 
@@ -23,17 +24,21 @@ required_fields = [
 ]
 
 optional_fields = ["mode"]
+QUESTION_JSON_FIELDS = [
+    "sort_id",
+    "label",
+    "label_de",
+    "description",
+    "description_de",
+    "items",
+]
 optional_nested_fields: Dict[str, Dict[str, str]] = {
     "type": {"position": "type_position", "en": "type", "de": "type_de"}
 }
 
 
 def _get_instruments_with_questions(base_path: Path) -> Set[str]:
-    instruments_with_questions = set()
-    with open(base_path / "questions.csv", encoding="utf8") as questions_csv:
-        for row in DictReader(questions_csv):
-            instruments_with_questions.add(row["instrument"])
-    return instruments_with_questions
+    return {row["instrument"] for row in read_source(base_path / "questions.csv")}
 
 
 def instrument_import(file: Path, study: Study) -> None:
@@ -45,29 +50,28 @@ def instrument_import(file: Path, study: Study) -> None:
         unit.name: unit for unit in AnalysisUnit.objects.filter(study=study)
     }
 
-    with open(file, encoding="utf8") as instruments_csv:
-        instruments = []
-        for row in DictReader(instruments_csv):
-            instrument = Instrument()
-            instrument.study = study
-            instrument.id = hash_with_namespace_uuid(  # pylint: disable=invalid-name
-                study.id, row["name"], cache=False
-            )
-            instrument.period = periods.get(row["period"], None)
-            instrument.analysis_unit = analysis_units.get(row["analysis_unit"], None)
-
-            for field in required_fields:
-                setattr(instrument, field, row[field])
-            for field in optional_fields:
-                setattr(instrument, field, row.get(field, ""))
-            for field, field_mapper in optional_nested_fields.items():
-                value = {}
-                for model_field, csv_field in field_mapper.items():
-                    value[model_field] = row.get(csv_field, "")
-                setattr(instrument, field, value)
-            instrument.has_questions = instrument.name in instruments_with_questions
-
-            instruments.append(instrument)
+    instruments = []
+    for row in read_source(file):
+        instrument = Instrument()
+        instrument.study = study
+        instrument.id = hash_with_namespace_uuid(  # pylint: disable=invalid-name
+            study.id, row["name"], cache=False
+        )
+        instrument.period = periods.get(row["period"], None)
+        instrument.analysis_unit = analysis_units.get(row["analysis_unit"], None)
+
+        for field in required_fields:
+            setattr(instrument, field, row[field])
+        for field in optional_fields:
+            setattr(instrument, field, row.get(field, ""))
+        for field, field_mapper in optional_nested_fields.items():
+            value = {}
+            for model_field, csv_field in field_mapper.items():
+                value[model_field] = row.get(csv_field, "")
+            setattr(instrument, field, value)
+        instrument.has_questions = instrument.name in instruments_with_questions
+
+        instruments.append(instrument)
 
     Instrument.objects.bulk_update(
         instruments,
@@ -78,23 +82,26 @@ def instrument_import(file: Path, study: Study) -> None:
     )
 
 
-class InstrumentImport(imports.Import):
+class InstrumentImport(imports.StreamingJSONImport):
     """Import a single Instrument and its containing questions.
 
     Is called with a single instrument JSON file.
     Also imports associated Periods and analysis_units, if they are not
     already present.
+    The questions are decoded and written in chunks.
     """
 
-    content: str
-
     def execute_import(self):
-        self.content = json.JSONDecoder(object_pairs_hook=OrderedDict).decode(
-            self.content
-        )
-        self._import_instrument(self.name, self.content)
+        with self.open_content() as content:
+            metadata = read_json_object(content, exclude=("questions",))
+        with self.open_content() as content:
+            self._import_instrument(
+                self.name, metadata, iter_json_items(content, ("questions",))
+            )
 
-    def _import_instrument(self, name, content):
+    def _import_instrument(
+        self, name, content, questions: Iterable[Tuple[str, Dict[str, Any]]]
+    ):
         instrument, _ = Instrument.objects.get_or_create(study=self.study, name=name)
 
         # add period relation to instrument
@@ -121,20 +128,46 @@ class InstrumentImport(imports.Import):
         )[0]
         instrument.analysis_unit = analysis_unit
 
-        for _name, _question in content["questions"].items():
-            question, _ = Question.objects.get_or_create(
-                name=_question["question"], instrument=instrument
-            )
-            question.sort_id = int(_question.get("sn", 0))
-            question.label = _question.get("label", _question.get("text", _name))
-            question.label_de = _question.get("label_de", _question.get("text_de", ""))
-            question.description = _question.get("description", "")
-            question.description_de = _question.get("description_de", "")
-            question.items = _question.get("items", list)
-            question.save()
+        question_ids = []
+        for chunk in chunks(questions):
+            question_ids.extend(self._import_questions(instrument, chunk))
+        # Question.save sets the period of the instrument on questions without one.
+        Question.objects.filter(instrument=instrument, period=None).update(
+            period=instrument.period
+        )
+        # Labels from the questions.csv have to be imported again on top of these.
+        DigestStore(self.study, "questions", Question).forget(question_ids)
 
         instrument.label = content.get("label", "")
         instrument.label_de = content.get("label_de", "")
         instrument.description = content.get("description", "")
         instrument.description_de = content.get("description_de", "")
         instrument.save()
+
+    @staticmethod
+    def _import_questions(
+        instrument: Instrument, items: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[UUID]:
+        questions: Dict[UUID, Question] = {}
+        for _name, _question in items:
+            question = Question(
+                name=_question["question"],
+                instrument=instrument,
+                period_id=instrument.period_id,
+            )
+            question.id = question.generate_id()
+            question.sort_id = int(_question.get("sn", 0))
+            question.label = _question.get("label", _question.get("text", _name))
+            question.label_de = _question.get("label_de", _question.get("text_de", ""))
+            question.description = _question.get("description", "")
+            question.description_de = _question.get("description_de", "")
+            question.items = _question.get("items", [])
+            questions[question.id] = question
+        Question.objects.bulk_create(
+            questions.values(),
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=QUESTION_JSON_FIELDS,
+        )
+        return list(questions.keys())
@@ -2,10 +2,13 @@
 
 """ Importer classes for ddionrails.instruments app """
 
-from csv import DictReader
 from pathlib import Path
-from typing import List
+from typing import Dict
+from uuid import UUID
 
+from ddionrails.imports.helpers import BULK_BATCH_SIZE, chunks
+from ddionrails.imports.sources import read_source
+from ddionrails.instruments.models.instrument import Instrument
 from ddionrails.instruments.models.question import Question
 from ddionrails.studies.models import Study
 
@@ -14,22 +17,30 @@ def questions_images_import(file: Path, study: Study) -> None:
     "Initiate imports of all question images"
     if not file.exists():
         return
-    with open(file, "r", encoding="utf8") as csv:
-        reader = DictReader(csv)
-        questions: List[Question] = []
-        for index, row in enumerate(reader):
-            question = Question.objects.get(
-                instrument__study=study,
-                instrument__name=row["instrument"],
-                name=row["question"],
-            )
+    for rows in chunks(read_source(file)):
+        questions: Dict[UUID, Question] = {}
+        sources: Dict[UUID, Dict[str, str]] = {}
+        for row in rows:
+            instrument_id = Instrument(
+                study_id=study.id, name=row["instrument"]
+            ).generate_id(cache=True)
+            question = Question(instrument_id=instrument_id, name=row["question"])
+            question.id = question.generate_id()
             question.images = {
                 "de": {"url": row["url_de"], "label": row["label_de"]},
                 "en": {"url": row["url"], "label": row["label"]},
             }
-            questions.append(question)
-            if index % 1000:
-                Question.objects.bulk_update(questions, ["images"])
-                questions = []
-        if questions:
-            Question.objects.bulk_update(questions, ["images"])
+            questions[question.id] = question
+            sources[question.id] = row
+        existing = set(
+            Question.objects.filter(id__in=questions.keys()).values_list("id", flat=True)
+        )
+        for question_id, row in sources.items():
+            if question_id not in existing:
+                raise Question.DoesNotExist(
+                    f"Question {study.name}/{row['instrument']}/{row['question']} "
+                    "does not exist."
+                )
+        Question.objects.bulk_update(
+            questions.values(), ["images"], batch_size=BULK_BATCH_SIZE
+        )
@@ -3,13 +3,20 @@
 """ Importer classes for ddionrails.instruments app """
 
 import uuid
-from csv import DictReader
 from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Generator, List, Tuple
 
 from ddionrails.base.helpers.ddionrails_typing import QuestionAnswer
-from ddionrails.imports.helpers import hash_with_base_uuid, hash_with_namespace_uuid
+from ddionrails.imports.delta import DigestStore, row_digest
+from ddionrails.imports.helpers import (
+    BULK_BATCH_SIZE,
+    chunks,
+    hash_with_base_uuid,
+    hash_with_namespace_uuid,
+)
+from ddionrails.imports.sources import read_source
+from ddionrails.imports.staging import copy_loader_enabled, copy_upsert
 from ddionrails.instruments.models import Instrument, Question
 from ddionrails.instruments.models.answer import Answer
 from ddionrails.instruments.models.question_item import QuestionItem
@@ -30,13 +37,11 @@ def question_import(file: Path, study: Study) -> None:
     """Import Questions and QuestionItems from the questions.csv."""
     question_grouper = _group_question_items(study=study)
     next(question_grouper)
-    with open(file, "r", encoding="utf8") as csv_file:
-        csv_reader = DictReader(csv_file)
-        for line in csv_reader:
-            if line["scale"] == "":
-                line["scale"] = "txt"
-            question_grouper.send(line)
-        question_grouper.send({})
+    for line in read_source(file):
+        if line["scale"] == "":
+            line["scale"] = "txt"
+        question_grouper.send(line)
+    question_grouper.send({})
 
 
 # TODO: Remove study argument, when possible on the manager side
@@ -52,42 +57,58 @@ def answer_relation_import(file: Path, study: Study) -> None:
     """Link answers and QuestionItems"""
     answers: Dict[Tuple[str, str], List[uuid.UUID]] = {}
     questions = file.parent.joinpath("questions.csv")
-    with open(file, "r", encoding="utf-8") as answers_file:
-        for answer in DictReader(answers_file):
-            answerlist_key = (answer["instrument"], answer["answer_list"])
-            if answerlist_key not in answers:
-                answers[answerlist_key] = []
-            answer_id = hash_with_base_uuid(
-                f"{answer['value']}{answer['label']}{answer['label_de']}"
-            )
-            answers[answerlist_key].append(answer_id)
+    for answer in read_source(file):
+        answerlist_key = (answer["instrument"], answer["answer_list"])
+        if answerlist_key not in answers:
+            answers[answerlist_key] = []
+        answer_id = hash_with_base_uuid(
+            f"{answer['value']}{answer['label']}{answer['label_de']}"
+        )
+        answers[answerlist_key].append(answer_id)
     relations = []
-    categorical_question_items = QuestionItem.objects.filter(
-        scale="cat", question__instrument__study=study
-    ).prefetch_related("question", "question__instrument")
-    with open(questions, "r", encoding="utf8") as questions_file:
-        for question_item in DictReader(questions_file):
-            if question_item["scale"] != "cat":
-                continue
-            question_item_object = categorical_question_items.get(
-                question__instrument__name=question_item["instrument"],
-                question__name=question_item["name"],
-                name=question_item["item"],
-            )
-            answerlist_key = (question_item["instrument"], question_item["answer_list"])
-            try:
-                for answer_id in answers[answerlist_key]:
-                    relation = Answer.question_items.through()
-                    relation.questionitem_id = question_item_object.id  # type: ignore
-                    relation.answer_id = answer_id  # type: ignore
-                    relations.append(relation)
-            except KeyError as error:
-                raise KeyError(f"{question_item}") from error
-    Answer.question_items.through.objects.bulk_create(relations, ignore_conflicts=True)
+    categorical_question_items = _categorical_question_item_index(study)
+    for question_item in read_source(questions):
+        if question_item["scale"] != "cat":
+            continue
+        item_key = (
+            question_item["instrument"],
+            question_item["name"],
+            question_item["item"],
+        )
+        try:
+            question_item_id = categorical_question_items[item_key]
+        except KeyError as error:
+            raise QuestionItem.DoesNotExist(
+                f"QuestionItem matching query does not exist: {item_key}"
+            ) from error
+        answerlist_key = (question_item["instrument"], question_item["answer_list"])
+        try:
+            for answer_id in answers[answerlist_key]:
+                relation = Answer.question_items.through()
+                relation.questionitem_id = question_item_id  # type: ignore
+                relation.answer_id = answer_id  # type: ignore
+                relations.append(relation)
+        except KeyError as error:
+            raise KeyError(f"{question_item}") from error
+    Answer.question_items.through.objects.bulk_create(
+        relations, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def _categorical_question_item_index(
+    study: Study,
+) -> Dict[Tuple[str, str, str], uuid.UUID]:
+    """Map instrument, question and item names to the ids of categorical items."""
+    return {
+        (instrument, question, name): question_item_id
+        for instrument, question, name, question_item_id in QuestionItem.objects.filter(
+            scale="cat", question__instrument__study=study
+        ).values_list("question__instrument__name", "question__name", "name", "id")
+    }
 
 
 def _bulk_import_answers(
-    answers: Dict[str, List[QuestionAnswer]]
+    answers: Dict[str, List[QuestionAnswer]],
 ) -> Dict[str, List[uuid.UUID]]:
     answer_list_answer_ids: Dict[str, List[uuid.UUID]] = {}
     unique_answer_tuples = set()
@@ -119,29 +140,37 @@ def _bulk_import_answers(
 
 def _read_answers(file: Path) -> Dict[str, List[QuestionAnswer]]:
     answers: Dict[str, List[QuestionAnswer]] = {}
-    with open(file, "r", encoding="utf8") as csv_file:
-        csv_reader = DictReader(csv_file)
-        for line in csv_reader:
-            if line["answer_list"] in answers:
-                answers[line["answer_list"]].append(
-                    {
-                        "value": int(line["value"]),
-                        "label": line["label"],
-                        "label_de": line["label_de"],
-                    }
-                )
-            else:
-                answers[line["answer_list"]] = [
-                    {
-                        "value": int(line["value"]),
-                        "label": line["label"],
-                        "label_de": line["label_de"],
-                    }
-                ]
+    for line in read_source(file):
+        if line["answer_list"] in answers:
+            answers[line["answer_list"]].append(
+                {
+                    "value": int(line["value"]),
+                    "label": line["label"],
+                    "label_de": line["label_de"],
+                }
+            )
+        else:
+            answers[line["answer_list"]] = [
+                {
+                    "value": int(line["value"]),
+                    "label": line["label"],
+                    "label_de": line["label_de"],
+                }
+            ]
     return answers
 
 
 def _group_question_items(study: Study) -> Generator[None, Dict[str, Any], None]:
+    """Group the rows of the questions.csv into question blocks and import them.
+
+    Only questions whose block of rows changed since the previous import are
+    written. Questions that were removed from the file are deleted.
+    """
+    digest_store = DigestStore(study, "questions", Question)
+    # Without stored digests, items of all questions are replaced like before.
+    replace_all_items = not digest_store.stored
+    digests: Dict[uuid.UUID, str] = {}
+    question_blocks = []
     question_block = []
     question = yield
     question_block.append(question)
@@ -152,15 +181,37 @@ def _group_question_items(study: Study) -> Generator[None, Dict[str, Any], None]
     while question:
         # Questions of a Block have the same name and the same instrument
         if _question_id_matches_block_id(question, question_block):
-            question_items.extend(_import_question_block(question_block, study))
+            question_blocks.append(question_block)
             question_block = []
+        if len(question_blocks) == BULK_BATCH_SIZE:
+            question_items.extend(
+                _import_question_blocks(question_blocks, study, digest_store, digests)
+            )
+            question_blocks = []
         question_block.append(question)
         question = yield
-    question_items.extend(_import_question_block(question_block, study))
-
-    QuestionItem.objects.filter(question__instrument__study=study).delete()
+    question_blocks.append(question_block)
+    question_items.extend(
+        _import_question_blocks(question_blocks, study, digest_store, digests)
+    )
 
-    QuestionItem.objects.bulk_create(question_items, ignore_conflicts=True)
+    deleted_questions = digest_store.deleted()
+    if replace_all_items:
+        QuestionItem.objects.filter(question__instrument__study=study).delete()
+    else:
+        for question_ids in chunks(set(digests.keys()) | deleted_questions):
+            QuestionItem.objects.filter(question_id__in=question_ids).delete()
+    for question_ids in chunks(deleted_questions):
+        Question.objects.filter(id__in=question_ids).delete()
+    digest_store.forget(deleted_questions)
+
+    if copy_loader_enabled():
+        copy_upsert(QuestionItem, question_items)
+    else:
+        QuestionItem.objects.bulk_create(
+            question_items, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+        )
+    digest_store.save(digests)
     yield
 
 
@@ -173,22 +224,70 @@ def _question_id_matches_block_id(
     )
 
 
+def _import_question_blocks(
+    blocks: List[List[Dict[str, str]]],
+    study: Study,
+    digest_store: DigestStore,
+    digests: Dict[uuid.UUID, str],
+) -> List[QuestionItem]:
+    """Import the changed question blocks and collect their digests."""
+    block_digests = {}
+    keyed_blocks = []
+    for block in blocks:
+        instrument = _get_instrument(name=block[0]["instrument"], study=study)
+        question_id = hash_with_namespace_uuid(
+            instrument.id, block[0]["name"], cache=False
+        )
+        block_digests[question_id] = row_digest(*block)
+        keyed_blocks.append((question_id, block))
+    changed_questions = digest_store.changed(block_digests)
+
+    questions: Dict[uuid.UUID, Question] = {}
+    question_items = []
+    for question_id, block in keyed_blocks:
+        if question_id not in changed_questions:
+            continue
+        digests[question_id] = block_digests[question_id]
+        question, items = _import_question_block(block, study)
+        questions[question.id] = question
+        question_items.extend(items)
+    _upsert_questions(list(questions.values()))
+    return question_items
+
+
 def _import_question_block(
     block: List[Dict[str, str]], study: Study
-) -> List[QuestionItem]:
+) -> Tuple[Question, List[QuestionItem]]:
     instrument = _get_instrument(name=block[0]["instrument"], study=study)
 
-    main_question, _ = Question.objects.get_or_create(
-        name=block[0]["name"], instrument=instrument
+    main_question = Question(
+        name=block[0]["name"], instrument=instrument, period_id=instrument.period_id
     )
+    main_question.id = main_question.generate_id()
     _import_main_question(main_question, block[0])
-    return _import_question_items(main_question, block)
+    return main_question, _import_question_items(main_question, block)
 
 
 def _import_main_question(question: Question, metadata: Dict[str, str]) -> None:
     for field in QUESTION_FIELDS:
         setattr(question, field, metadata[_field_mapper(field)])
-    question.save()
+
+
+def _upsert_questions(questions: List[Question]) -> None:
+    """Insert new questions and update the metadata fields of existing ones.
+
+    Other fields of existing questions, e.g. their period or images, are kept.
+    """
+    if copy_loader_enabled():
+        copy_upsert(Question, questions, QUESTION_FIELDS)
+        return
+    Question.objects.bulk_create(
+        questions,
+        batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=QUESTION_FIELDS,
+    )
 
 
 def _import_question_items(
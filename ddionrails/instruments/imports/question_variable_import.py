@@ -10,6 +10,7 @@ from uuid import UUID
 from ddionrails.data.models import Dataset
 from ddionrails.imports import imports
 from ddionrails.imports.helpers import hash_with_namespace_uuid
+from ddionrails.imports.staging import copy_loader_enabled, copy_upsert
 from ddionrails.instruments.models import Question, QuestionVariable
 from ddionrails.instruments.models.instrument import Instrument
 from ddionrails.studies.models import Study
@@ -58,7 +59,10 @@ def question_variable_import(file_path: str, study: Study) -> None:
                 question_id=question_relation.question,
             )
         )
-    QuestionVariable.objects.bulk_create(question_relations)
+    if copy_loader_enabled():
+        copy_upsert(QuestionVariable, question_relations)
+    else:
+        QuestionVariable.objects.bulk_create(question_relations)
     instrument_relations: List[Instrument.datasets.through] = []
     for instrument_relation in instrument_dataset_relations:
         instrument_relations.append(
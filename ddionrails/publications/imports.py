@@ -4,20 +4,34 @@
 
 import json
 from collections import OrderedDict
-from typing import Dict
+from typing import Dict, Optional, Set, Tuple, Type
+from uuid import UUID
 
+from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import Model
 from django.db.transaction import atomic
 
 from ddionrails.data.models import Dataset, Variable
 from ddionrails.imports import imports
+from ddionrails.imports.helpers import BULK_BATCH_SIZE, chunks
 from ddionrails.instruments.models import Instrument, Question
 from ddionrails.publications.models import Attachment
+from ddionrails.studies.models import Study
 
 from .forms import AttachmentForm, PublicationForm
 
+TARGET_MODELS: Dict[str, Type[Model]] = {
+    "study": Study,
+    "dataset": Dataset,
+    "variable": Variable,
+    "instrument": Instrument,
+    "question": Question,
+}
+
 
 class PublicationImport(imports.CSVImport):
+    batch_import = True
+
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = PublicationForm
 
@@ -36,15 +50,35 @@ class AttachmentImport(imports.CSVImport):
 
     @atomic
     def execute_import(self):
-        for attachment in self.content:
-            try:
-                attachment = self._process_field_names(attachment)
-                related = self._get_related_object(attachment)
-                attachment = dict(
-                    **related, url=attachment["url"], url_text=attachment["url_text"]
+        """Resolve the targets of all attachments and create them in bulk.
+
+        Target ids are derived from their names, like the save methods of the
+        targets do, and checked with one query per target type.
+        """
+        attachments = [
+            self._process_field_names(attachment) for attachment in self.content
+        ]
+        targets = [self._get_target_id(attachment) for attachment in attachments]
+        existing: Dict[str, Set[UUID]] = {}
+        for _type, model in TARGET_MODELS.items():
+            ids = {
+                target_id for target_type, target_id in targets if target_type == _type
+            }
+            existing[_type] = set()
+            for chunk in chunks(ids):
+                existing[_type].update(
+                    model.objects.filter(id__in=chunk).values_list("id", flat=True)
                 )
-                self.import_element(attachment)
-            except BaseException as error:
+
+        objects = []
+        for attachment, (_type, target_id) in zip(attachments, targets):
+            try:
+                if _type not in TARGET_MODELS:
+                    raise KeyError(_type)
+                if target_id not in existing[_type]:
+                    raise TARGET_MODELS[_type].DoesNotExist()
+            except (KeyError, ObjectDoesNotExist) as error:
+                attachment["context_study"] = self.study
                 raise type(error)(
                     "\n"
                     + json.dumps(
@@ -56,13 +90,15 @@ class AttachmentImport(imports.CSVImport):
                         separators=(",", ": "),
                     )
                 )
-
-    def import_element(self, element):
-        attachment = Attachment()
-        attachment.context_study = self.study
-        for key, value in element.items():
-            setattr(attachment, key, value)
-        attachment.save()
+            objects.append(
+                Attachment(
+                    context_study=self.study,
+                    url=attachment["url"],
+                    url_text=attachment["url_text"],
+                    **{f"{_type}_id": target_id},
+                )
+            )
+        Attachment.objects.bulk_create(objects, batch_size=BULK_BATCH_SIZE)
 
     @staticmethod
     def _process_field_names(dictionairy: Dict[str, str]) -> Dict[str, str]:
@@ -81,44 +117,34 @@ class AttachmentImport(imports.CSVImport):
                 cleaned_dictionairy[key] = value
         return cleaned_dictionairy
 
-    def _get_related_object(self, element: Dict[str, str]) -> Dict[str, Model]:
-        """Retrieve the attachement target from the database.
+    def _get_target_id(self, element: Dict[str, str]) -> Tuple[str, Optional[UUID]]:
+        """Derive the id of the attachment target from its names.
 
         Arguments:
             element: Metadata about the target object of the attachment.
 
         Returns:
-            A single key dictionairy where the key is the field name of the
-            target and the value is the target object.
+            The type of the target and its id.
         """
-        element["context_study"] = self.study
-        _type = element.get("type")
-        dataset = element.get("dataset")
+        _type = element.get("type", "")
         if _type == "study":
-            return {"study": self.study}
-        call_dict = {
-            "variable": (
-                Variable,
-                {
-                    "dataset__study": self.study,
-                    "dataset__name": dataset,
-                    "name": element.get("variable"),
-                },
-            ),
-            "dataset": (Dataset, {"name": element.get("dataset"), "study": self.study}),
-            "question": (
-                Question,
-                {
-                    "instrument__study": self.study,
-                    "instrument__name": element.get("instrument"),
-                    "name": element.get("question"),
-                },
-            ),
-            "instrument": (
-                Instrument,
-                {"study": self.study, "name": element.get("instrument")},
-            ),
-        }
-        model, kwargs = call_dict[_type]
-        _object = model.objects.get(**kwargs)
-        return {_type: _object}
+            return _type, self.study.id
+        if _type in ("dataset", "variable"):
+            dataset = Dataset(study_id=self.study.id, name=element.get("dataset", ""))
+            dataset_id = dataset.generate_id(cache=True)
+            if _type == "dataset":
+                return _type, dataset_id
+            variable = Variable(dataset_id=dataset_id, name=element.get("variable", ""))
+            return _type, variable.generate_id()
+        if _type in ("instrument", "question"):
+            instrument = Instrument(
+                study_id=self.study.id, name=element.get("instrument", "")
+            )
+            instrument_id = instrument.generate_id(cache=True)
+            if _type == "instrument":
+                return _type, instrument_id
+            question = Question(
+                instrument_id=instrument_id, name=element.get("question", "")
+            )
+            return _type, question.generate_id()
+        return _type, None
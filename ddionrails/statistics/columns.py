@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+""" Columnar representation of statistics CSV files """
+
+import csv
+import io
+from typing import Any, Collection, Dict, Iterable, List, Mapping, Optional, Union
+
+# A column holds either numbers, with None for empty cells, or the codes of
+# its text values, which are stored once as levels.
+Column = Union[List[Optional[Union[int, float]]], Dict[str, List[Any]]]
+ColumnStore = Dict[str, Any]
+
+YEAR_COLUMN = "year"
+
+
+def _numeric_column(values: List[str]) -> Optional[List[Optional[Union[int, float]]]]:
+    for cast in (int, float):
+        try:
+            return [cast(value) if value != "" else None for value in values]
+        except ValueError:
+            continue
+    return None
+
+
+def _encode_column(values: List[str]) -> Column:
+    numbers = _numeric_column(values)
+    if numbers is not None:
+        return numbers
+    levels: Dict[str, int] = {}
+    codes = [levels.setdefault(value, len(levels)) for value in values]
+    return {"levels": list(levels), "codes": codes}
+
+
+def decode_column(column: Column) -> List[Any]:
+    """Return the values of a column."""
+    if isinstance(column, dict):
+        levels = column["levels"]
+        return [levels[code] for code in column["codes"]]
+    return column
+
+
+def build_column_store(content: Union[bytes, str]) -> ColumnStore:
+    """Parse the content of a statistics CSV file into columns.
+
+    Numeric columns are stored as numbers and text columns as codes of their
+    distinct values. The result is JSON serializable.
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf8")
+    reader = csv.reader(io.StringIO(content))
+    names = next(reader, [])
+    rows = [row for row in reader if row]
+    columns = [
+        _encode_column([row[index] if index < len(row) else "" for row in rows])
+        for index in range(len(names))
+    ]
+    return {"names": names, "length": len(rows), "columns": columns}
+
+
+def select_rows(
+    store: ColumnStore,
+    start_year: Optional[int] = None,
+    end_year: Optional[int] = None,
+    filters: Optional[Mapping[str, Collection[str]]] = None,
+) -> List[int]:
+    """Return the positions of the rows in a year range with the given values.
+
+    `filters` maps column names, e.g. the names of dimensions, to the values
+    to keep. Unknown columns raise a KeyError.
+    """
+    positions: Iterable[int] = range(store["length"])
+    columns = dict(zip(store["names"], store["columns"]))
+    if start_year is not None or end_year is not None:
+        years = decode_column(columns[YEAR_COLUMN])
+        positions = [
+            position
+            for position in positions
+            if years[position] is not None
+            and (start_year is None or years[position] >= start_year)
+            and (end_year is None or years[position] <= end_year)
+        ]
+    for name, values in (filters or {}).items():
+        column = columns[name]
+        if isinstance(column, dict):
+            codes = column["codes"]
+            wanted = {
+                code for code, level in enumerate(column["levels"]) if level in values
+            }
+            positions = [position for position in positions if codes[position] in wanted]
+        else:
+            positions = [
+                position for position in positions if str(column[position]) in values
+            ]
+    return list(positions)
+
+
+def slice_columns(
+    store: ColumnStore,
+    positions: List[int],
+    names: Optional[Collection[str]] = None,
+) -> Dict[str, List[Any]]:
+    """Return the values of the selected rows and columns, in the order of the file.
+
+    Unknown column names raise a KeyError.
+    """
+    selected = store["names"] if names is None else names
+    unknown = set(selected) - set(store["names"])
+    if unknown:
+        raise KeyError(", ".join(sorted(unknown)))
+    return {
+        name: [values[position] for position in positions]
+        for name, values in (
+            (name, decode_column(column))
+            for name, column in zip(store["names"], store["columns"])
+            if name in selected
+        )
+    }
+
+
+def to_csv(table: Mapping[str, List[Any]]) -> str:
+    """Write sliced columns as CSV."""
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(table.keys())
+    writer.writerows(
+        ["" if value is None else value for value in row] for row in zip(*table.values())
+    )
+    return output.getvalue()
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+""" Compute statistics files for data visualization from microdata """
+
+import csv
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+# Quantile of the standard normal distribution for 95% confidence intervals
+Z_95 = 1.959963984540054
+
+NUMERICAL_COLUMNS = (
+    "mean",
+    "median",
+    "n",
+    "mean_lower_confidence",
+    "mean_upper_confidence",
+    "median_lower_confidence",
+    "median_upper_confidence",
+)
+CATEGORICAL_COLUMNS = ("n", "percent", "lower_confidence", "upper_confidence")
+
+
+class Microdata(NamedTuple):
+    """Columns of a dataset extract with the labels of their values.
+
+    All columns are numeric. Empty cells and negative values, which mark the
+    different kinds of missing values in the microdata, are stored as NaN.
+    """
+
+    columns: Dict[str, np.ndarray]
+    year: str
+    weight: Optional[str] = None
+    labels: Dict[str, Dict[str, Any]] = {}
+
+    def value_labels(self, name: str) -> Dict[int, str]:
+        """Map the codes of a variable to their labels."""
+        values = self.labels.get(name, {}).get("values", {})
+        return {int(float(code)): label for code, label in values.items()}
+
+    def label(self, name: str) -> str:
+        """Return the label of a variable."""
+        return self.labels.get(name, {}).get("label", name)
+
+
+def read_microdata(
+    path: Path,
+    names: Iterable[str],
+    year: str = "syear",
+    weight: Optional[str] = None,
+    labels: Optional[Path] = None,
+) -> Microdata:
+    """Read the columns of a dataset extract from a CSV file.
+
+    `labels` is an optional JSON file, that maps variable names to an object
+    with their "label" and the labels of their "values" by code.
+    """
+    wanted = list(dict.fromkeys([year, *([weight] if weight else []), *names]))
+    with open(path, "r", encoding="utf8", newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader)
+        missing = set(wanted) - set(header)
+        if missing:
+            raise KeyError(f"{path} has no columns: {', '.join(sorted(missing))}")
+        positions = [header.index(name) for name in wanted]
+        rows = [[row[position] or "nan" for position in positions] for row in reader]
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(wanted))
+    values[values < 0] = np.nan
+    label_content: Dict[str, Dict[str, Any]] = {}
+    if labels:
+        with open(labels, "r", encoding="utf8") as labels_file:
+            label_content = json.load(labels_file)
+    return Microdata(
+        {name: values[:, index] for index, name in enumerate(wanted)},
+        year,
+        weight,
+        label_content,
+    )
+
+
+def _weights(data: Microdata) -> np.ndarray:
+    if data.weight is None:
+        return np.ones_like(data.columns[data.year])
+    weights = data.columns[data.weight]
+    return np.where(weights > 0, weights, np.nan)
+
+
+def _groups(
+    data: Microdata, keys: Sequence[str], valid: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Number the distinct combinations of the key columns of the valid rows.
+
+    Returns the combinations in sorted order and the group of every valid row.
+    """
+    distinct_values = []
+    combined = np.zeros(int(valid.sum()), dtype=np.int64)
+    # Combine the codes of all columns into a single integer, which is much
+    # faster to group than the rows of a two dimensional array.
+    for key in keys:
+        values, codes = np.unique(data.columns[key][valid], return_inverse=True)
+        distinct_values.append(values.astype(np.int64))
+        combined = combined * len(values) + codes.reshape(-1)
+    unique_combined, group = np.unique(combined, return_inverse=True)
+    positions = np.unravel_index(
+        unique_combined, [len(values) for values in distinct_values]
+    )
+    combinations_ = np.column_stack(
+        [values[position] for values, position in zip(distinct_values, positions)]
+    )
+    return combinations_, group.reshape(-1)
+
+
+def weighted_quantiles(
+    values: np.ndarray, weights: np.ndarray, group: np.ndarray, quantiles: np.ndarray
+) -> np.ndarray:
+    """Compute weighted quantiles for every group at once.
+
+    The last axis of `quantiles` holds one probability per group, so several
+    quantiles can share one sort. The result is the smallest value of the
+    group, whose cumulative weight share reaches the probability.
+    """
+    order = np.lexsort((values, group))
+    sorted_group = group[order]
+    cumulative = np.cumsum(weights[order])
+    totals = np.bincount(group, weights=weights)
+    starts = np.concatenate(([0.0], np.cumsum(totals)[:-1]))
+    share = (cumulative - starts[sorted_group]) / totals[sorted_group]
+    # Groups are consecutive integers and shares lie in (0, 1], so the sum
+    # of both is sorted over all groups.
+    keys = sorted_group + np.minimum(share, 1.0)
+    targets = np.arange(len(totals)) + np.clip(quantiles, 1e-12, 1.0)
+    positions = np.searchsorted(keys, targets - 1e-12)
+    # Rounding errors of the cumulative sums must not leave the group.
+    last = np.cumsum(np.bincount(group)) - 1
+    first = np.concatenate(([0], last[:-1] + 1))
+    return values[order][np.clip(positions, first, last)]
+
+
+def numerical_statistics(
+    data: Microdata, variable: str, dimensions: Sequence[str] = ()
+) -> List[List[Any]]:
+    """Compute weighted means and medians per year and dimension values."""
+    keys = [data.year, *dimensions]
+    weights = _weights(data)
+    values = data.columns[variable]
+    valid = ~np.isnan(values) & ~np.isnan(weights)
+    for key in keys:
+        valid &= ~np.isnan(data.columns[key])
+    if not valid.any():
+        return []
+    combinations_, group = _groups(data, keys, valid)
+    values, weights = values[valid], weights[valid]
+    count = np.bincount(group)
+    total = np.bincount(group, weights=weights)
+    mean = np.bincount(group, weights=weights * values) / total
+    variance = np.bincount(group, weights=weights * (values - mean[group]) ** 2) / total
+    mean_error = Z_95 * np.sqrt(variance / count)
+    # Confidence interval of the median from the ranks of the binomial
+    # distribution of the number of values below it.
+    median_error = Z_95 * 0.5 / np.sqrt(count)
+    median, median_lower, median_upper = weighted_quantiles(
+        values,
+        weights,
+        group,
+        np.stack([np.full(len(count), 0.5), 0.5 - median_error, 0.5 + median_error]),
+    )
+    labels = [data.value_labels(dimension) for dimension in dimensions]
+    return [
+        [
+            int(key[0]),
+            *(_label(labels[index], code) for index, code in enumerate(key[1:])),
+            *row,
+        ]
+        for key, row in zip(
+            combinations_,
+            zip(
+                mean.tolist(),
+                median.tolist(),
+                count.tolist(),
+                (mean - mean_error).tolist(),
+                (mean + mean_error).tolist(),
+                median_lower.tolist(),
+                median_upper.tolist(),
+            ),
+        )
+    ]
+
+
+def categorical_statistics(
+    data: Microdata, variable: str, dimensions: Sequence[str] = ()
+) -> List[List[Any]]:
+    """Compute weighted frequencies per year and dimension values."""
+    keys = [data.year, *dimensions, variable]
+    weights = _weights(data)
+    valid = ~np.isnan(weights)
+    for key in keys:
+        valid &= ~np.isnan(data.columns[key])
+    if not valid.any():
+        return []
+    combinations_, group = _groups(data, keys, valid)
+    weights = weights[valid]
+    count = np.bincount(group)
+    weighted = np.bincount(group, weights=weights)
+    # Cells with the same year and dimension values form one distribution.
+    # The combinations are sorted, so a distribution starts where its key changes.
+    starts = np.any(combinations_[1:, :-1] != combinations_[:-1, :-1], axis=1)
+    distribution = np.concatenate(([0], np.cumsum(starts)))
+    distribution_count = np.bincount(distribution, weights=count)
+    percent = weighted / np.bincount(distribution, weights=weighted)[distribution]
+    error = Z_95 * np.sqrt(percent * (1 - percent) / distribution_count[distribution])
+    labels = [data.value_labels(dimension) for dimension in dimensions]
+    value_labels = data.value_labels(variable)
+    return [
+        [
+            _label(value_labels, key[-1]),
+            int(key[0]),
+            *(_label(labels[index], code) for index, code in enumerate(key[1:-1])),
+            *row,
+        ]
+        for key, row in zip(
+            combinations_,
+            zip(
+                count.tolist(),
+                percent.tolist(),
+                np.maximum(percent - error, 0).tolist(),
+                np.minimum(percent + error, 1).tolist(),
+            ),
+        )
+    ]
+
+
+def _label(labels: Dict[int, str], code: int) -> str:
+    return labels.get(int(code), str(int(code)))
+
+
+def dimension_sets(dimensions: Sequence[str], size: int = 2) -> List[Tuple[str, ...]]:
+    """List the combinations of up to `size` dimensions, including none."""
+    return [
+        combination
+        for length in range(size + 1)
+        for combination in combinations(dimensions, length)
+    ]
+
+
+def write_statistics(
+    data: Microdata,
+    variable: str,
+    stat_type: str,
+    base_path: Path,
+    dimensions: Sequence[str] = (),
+    combination_size: int = 2,
+) -> List[Path]:
+    """Write the statistics files of a variable, as read by the statistics import.
+
+    The files are written to `base_path`/`stat_type`/`variable`, one file
+    per combination of dimensions and a meta.json with the dimension labels.
+    """
+    path = base_path.joinpath(stat_type, variable)
+    path.mkdir(parents=True, exist_ok=True)
+    meta = [
+        {
+            "variable": dimension,
+            "label": data.label(dimension),
+            "values": [
+                _label(data.value_labels(dimension), code)
+                for code in np.unique(
+                    data.columns[dimension][~np.isnan(data.columns[dimension])]
+                )
+            ],
+        }
+        for dimension in dimensions
+    ]
+    with open(path.joinpath("meta.json"), "w", encoding="utf8") as meta_file:
+        json.dump(meta, meta_file, ensure_ascii=False, indent=2)
+    files = []
+    for combination in dimension_sets(dimensions, combination_size):
+        file = path.joinpath("_".join((variable, "year", *combination)) + ".csv")
+        if stat_type == "numerical":
+            header = ["year", *combination, *NUMERICAL_COLUMNS]
+            rows = numerical_statistics(data, variable, combination)
+        else:
+            header = [variable, "year", *combination, *CATEGORICAL_COLUMNS]
+            rows = categorical_statistics(data, variable, combination)
+        with open(file, "w", encoding="utf8", newline="") as csv_file:
+            writer = csv.writer(csv_file, lineterminator="\n")
+            writer.writerow(header)
+            writer.writerows(rows)
+        files.append(file)
+    return files
+
+
+def _write_variable_statistics(
+    data: Microdata,
+    variable: str,
+    variable_type: str,
+    base_path: Path,
+    dimensions: Sequence[str],
+    combination_size: int,
+) -> List[Path]:
+    # Ordinal variables are imported with both plot types.
+    stat_types = (
+        ["numerical", "categorical"] if variable_type == "ordinal" else [variable_type]
+    )
+    files = []
+    for stat_type in stat_types:
+        files.extend(
+            write_statistics(
+                data, variable, stat_type, base_path, dimensions, combination_size
+            )
+        )
+    return files
+
+
+# Microdata inherited by the forked workers of compute_statistics
+_SHARED_DATA: Optional[Microdata] = None
+
+
+def compute_statistics(
+    data: Microdata,
+    variables: Dict[str, str],
+    base_path: Path,
+    dimensions: Sequence[str] = (),
+    combination_size: int = 2,
+    workers: Optional[int] = None,
+) -> List[Path]:
+    """Write the statistics files of many variables in parallel.
+
+    `variables` maps variable names to their type, as in variables.csv.
+    Variables are distributed over `workers` forked processes, IMPORT_WORKERS
+    by default, that share the microdata read by this process.
+    """
+    workers = workers or settings.IMPORT_WORKERS
+    tasks = [
+        (variable, variable_type, base_path, dimensions, combination_size)
+        for variable, variable_type in variables.items()
+        if variable_type in ("numerical", "categorical", "ordinal")
+    ]
+    if workers < 2 or len(tasks) < 2:
+        results = [_write_variable_statistics(data, *task) for task in tasks]
+    else:
+        global _SHARED_DATA  # pylint: disable=global-statement
+        _SHARED_DATA = data
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("fork"),
+            ) as executor:
+                results = list(executor.map(_write_shared_variable_statistics, tasks))
+        finally:
+            _SHARED_DATA = None
+    return [file for files in results for file in files]
+
+
+def _write_shared_variable_statistics(task: Tuple[Any, ...]) -> List[Path]:
+    """Use the microdata inherited from the parent instead of a pickled copy."""
+    assert _SHARED_DATA is not None
+    return _write_variable_statistics(_SHARED_DATA, *task)
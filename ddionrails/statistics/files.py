@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+""" Precompressed variants of stored statistics files """
+
+import gzip
+from functools import partial
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Content codings in order of preference, with the suffix of their files.
+ENCODINGS: Dict[str, Tuple[str, Callable[[bytes], bytes]]] = {}
+if brotli is not None:  # pragma: no cover
+    ENCODINGS["br"] = (".br", brotli.compress)
+ENCODINGS["gzip"] = (".gz", partial(gzip.compress, mtime=0))
+
+
+def encoded_name(name: str, encoding: Optional[str]) -> str:
+    """Return the name of the stored file with the given content coding."""
+    if encoding is None:
+        return name
+    return name + ENCODINGS[encoding][0]
+
+
+def store_encoded_variants(storage: Storage, name: str, content: bytes) -> None:
+    """Store a compressed copy of a file for every available content coding.
+
+    Existing variants of the same name are replaced, so the variants always
+    belong to the current file.
+    """
+    for encoding, (_, compress) in ENCODINGS.items():
+        variant = encoded_name(name, encoding)
+        storage.delete(variant)
+        storage.save(variant, ContentFile(compress(content)))
+
+
+def accepted_encodings(header: str) -> Iterable[str]:
+    """Return the accepted content codings of an Accept-Encoding header."""
+    for coding in header.split(","):
+        name, _, parameters = coding.partition(";")
+        quality = parameters.strip().partition("=")[2]
+        try:
+            refused = bool(quality) and float(quality) == 0
+        except ValueError:
+            refused = True
+        if name.strip() and not refused:
+            yield name.strip().lower()
+
+
+def preferred_encoding(header: str) -> Optional[str]:
+    """Select the preferred available content coding for an Accept-Encoding header."""
+    accepted = set(accepted_encodings(header))
+    for encoding in ENCODINGS:
+        if encoding in accepted:
+            return encoding
+    return None
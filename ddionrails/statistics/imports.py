@@ -1,14 +1,33 @@
 """ Import functions for statistical data used in data visualization."""
+import hashlib
 import json
-from csv import DictReader
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from glob import glob
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from uuid import UUID
 
-from django.core.files import File
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
 from django_rq import enqueue
 
 from ddionrails.data.models.variable import Variable
+from ddionrails.imports.helpers import BULK_BATCH_SIZE, chunks
+from ddionrails.imports.shadow import current_shadow_schema
+from ddionrails.imports.sources import read_source, source_header
+from ddionrails.statistics.columns import (
+    YEAR_COLUMN,
+    ColumnStore,
+    build_column_store,
+    select_rows,
+    slice_columns,
+)
+from ddionrails.statistics.files import store_encoded_variants
 from ddionrails.statistics.models import (
     IndependentVariable,
     StatisticsMetadata,
@@ -18,79 +37,188 @@ from ddionrails.studies.models import Study
 
 CACHE: Dict[str, IndependentVariable] = {}
 
+STATISTICS_FIELDS = (
+    "statistics",
+    "start_year",
+    "end_year",
+    "digest",
+    "columns",
+    "independent_variable_names",
+)
+
+
+class StatisticsFile(NamedTuple):
+    """A statistics CSV file and the statistic it is imported into."""
+
+    path: Path
+    statistic: VariableStatistic
+    independent_variables: List[IndependentVariable]
+
+
+class StatisticsFileContent(NamedTuple):
+    """The result of reading a statistics file.
+
+    The years, content and columns are only set, if the digest changed.
+    """
+
+    digest: str
+    start_year: Optional[int] = None
+    end_year: Optional[int] = None
+    content: Optional[bytes] = None
+    columns: Optional[ColumnStore] = None
+
 
 def statistics_import(file: Path, study: Study) -> None:
-    """Import variable statistics."""
-    VariableStatistic.objects.filter(variable__dataset__study=study).delete()
-    with open(file, "r", encoding="utf8") as variables_file:
-        variables = DictReader(variables_file)
-        if "statistics" not in variables.fieldnames:  # type: ignore
-            return None
-        for variable in variables:
-            if not variable["statistics"] == "True":
+    """Import variable statistics.
+
+    Statistics files are read by a pool of IMPORT_WORKERS processes. Every
+    file is read once to compute its digest. Files with the same digest as in
+    the last import are skipped, only new and changed files are stored.
+    Statistics without a file are removed.
+    """
+    # Independent variables of an earlier import might have been deleted since.
+    CACHE.clear()
+    existing = VariableStatistic.objects.filter(variable__dataset__study=study)
+    if "statistics" not in source_header(file):
+        existing.delete()
+        return None
+    files = _collect_statistics_files(file, study)
+    digests = dict(existing.values_list("id", "digest"))
+    # Only the content of one chunk of changed files is held in memory.
+    for files_chunk in chunks(files):
+        contents = _read_statistics_files(
+            [
+                (
+                    statistics_file.path,
+                    _independent_variable_ids(statistics_file),
+                    digests.get(statistics_file.statistic.id, ""),
+                )
+                for statistics_file in files_chunk
+            ]
+        )
+        changed = []
+        for statistics_file, content in zip(files_chunk, contents):
+            if content.content is None:
                 continue
-            _import_single_variable(variable, study)
-    enqueue(_metadata_import, study)
+            statistic = statistics_file.statistic
+            statistic.digest = content.digest
+            statistic.start_year = content.start_year
+            statistic.end_year = content.end_year
+            statistic.columns = content.columns
+            path = statistics_file.path
+            statistic.statistics.save(
+                path.name + "/" + path.parent.parent.name,
+                ContentFile(content.content),
+                save=False,
+            )
+            store_encoded_variants(
+                statistic.statistics.storage, statistic.statistics.name, content.content
+            )
+            changed.append(statistics_file)
+        _write_statistics(changed)
+    existing.exclude(
+        id__in=[statistics_file.statistic.id for statistics_file in files]
+    ).delete()
+    # A queued job could not see the statistics of a shadow import. Inside of
+    # a transaction the job has to wait for the statistics to be committed.
+    if current_shadow_schema():
+        _metadata_import(study)
+    else:
+        transaction.on_commit(partial(enqueue, _metadata_import, study))
     return None
 
 
 def _metadata_import(study: Study) -> None:
-    objects = []
+    """Build the metadata documents of all variables with statistics of a study.
+
+    The years are aggregated in the database and the dimensions are read in
+    a single query, so the number of queries does not depend on the number
+    of variables.
+    """
     StatisticsMetadata.objects.filter(variable__dataset__study=study).delete()
-    for variable in (
-        Variable.objects.filter(dataset__study=study)
-        .exclude(statistics_data=None)
-        .prefetch_related("dataset")
+    relation = VariableStatistic.independent_variables.through
+    dimensions: Dict[UUID, Dict[UUID, Dict[str, Any]]] = defaultdict(dict)
+    for (
+        variable_id,
+        independent_variable_id,
+        name,
+        label,
+        values,
+    ) in relation.objects.filter(
+        variablestatistic__variable__dataset__study=study
+    ).values_list(
+        "variablestatistic__variable_id",
+        "independentvariable_id",
+        "independentvariable__variable__name",
+        "independentvariable__variable__label_de",
+        "independentvariable__labels",
     ):
-        independent_variables = {}
-        start_year = 0
-        end_year = 0
-        for statistic in variable.statistics_data.all():
-            if not start_year or start_year > statistic.start_year:
-                start_year = statistic.start_year
-            if not end_year or end_year > statistic.end_year:
-                end_year = statistic.end_year
-            for independent_variable in statistic.independent_variables.all():
-                independent_variables[independent_variable.id] = independent_variable
-        metadata = StatisticsMetadata()
-        metadata.variable = variable
-        metadata.metadata = {
-            "study": study.name,
-            "title": variable.label_de,
-            "variable": variable.name,
-            "id": str(variable.id),
-            "dataset": variable.dataset.name,
-            "dimensions": [
-                {
-                    "variable": independent_variable.variable.name,
-                    "label": independent_variable.variable.label_de,
-                    "values": independent_variable.labels,
-                }
-                for independent_variable in independent_variables.values()
-            ],
-            "start_year": start_year,
-            "end_year": end_year,
+        dimensions[variable_id][independent_variable_id] = {
+            "variable": name,
+            "label": label,
+            "values": values,
         }
-        objects.append(metadata)
-    StatisticsMetadata.objects.bulk_create(objects, ignore_conflicts=True)
-
+    variables = (
+        Variable.objects.filter(dataset__study=study, statistics_data__isnull=False)
+        .values("id", "name", "label_de", "dataset__name")
+        .annotate(
+            start_year=Min("statistics_data__start_year"),
+            end_year=Max("statistics_data__end_year"),
+        )
+    )
+    StatisticsMetadata.objects.bulk_create(
+        [
+            StatisticsMetadata(
+                variable_id=variable["id"],
+                metadata={
+                    "study": study.name,
+                    "title": variable["label_de"],
+                    "variable": variable["name"],
+                    "id": str(variable["id"]),
+                    "dataset": variable["dataset__name"],
+                    "dimensions": list(dimensions[variable["id"]].values()),
+                    "start_year": variable["start_year"],
+                    "end_year": variable["end_year"],
+                },
+            )
+            for variable in variables
+        ],
+        batch_size=BULK_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
 
-def _import_single_variable(variable: Dict[str, str], study: Study) -> None:
-    """Import statistics data for a single defined value."""
 
-    try:
-        variable_object = Variable.objects.get(
-            name=variable["name"], dataset__name=variable["dataset"], dataset__study=study
-        )
-    except Exception as error:
-        raise ValueError(f"{variable}") from error
-    import_base_path: Path = study.import_path().parent
-    statistics_base_path = import_base_path.joinpath("statistics")
-    if variable["type"] in ["numerical", "categorical"]:
-        _import_single_type(variable_object, statistics_base_path, variable["type"])
-    if variable["type"] == "ordinal":
-        _import_single_type(variable_object, statistics_base_path, "numerical")
-        _import_single_type(variable_object, statistics_base_path, "categorical")
+def _collect_statistics_files(file: Path, study: Study) -> List[StatisticsFile]:
+    """List the statistics files of all variables marked in variables.csv."""
+    variables = [
+        variable for variable in read_source(file) if variable["statistics"] == "True"
+    ]
+    variable_ids = {
+        (dataset, name): variable_id
+        for dataset, name, variable_id in Variable.objects.filter(
+            dataset__study=study, name__in={variable["name"] for variable in variables}
+        ).values_list("dataset__name", "name", "id")
+    }
+    statistics_base_path = study.import_path().parent.joinpath("statistics")
+    files: List[StatisticsFile] = []
+    for variable in variables:
+        try:
+            variable_id = variable_ids[(variable["dataset"], variable["name"])]
+        except KeyError as error:
+            raise ValueError(f"{variable}") from error
+        if variable["type"] in ["numerical", "categorical"]:
+            stat_types = [variable["type"]]
+        elif variable["type"] == "ordinal":
+            stat_types = ["numerical", "categorical"]
+        else:
+            continue
+        for stat_type in stat_types:
+            files.extend(
+                _collect_single_type(
+                    variable_id, variable["name"], statistics_base_path, stat_type
+                )
+            )
+    return files
 
 
 def _import_independent_variables(path: Path) -> List[str]:
@@ -119,44 +247,111 @@ def _import_independent_variables(path: Path) -> List[str]:
     return independent_variable_names
 
 
-def _import_single_type(variable: Variable, base_path: Path, stat_type: str) -> None:
-    """Import alle statistics for a single value and of a single type."""
-    statistics_path = base_path.joinpath(f"{stat_type}/{variable.name}")
+def _collect_single_type(
+    variable_id: UUID, variable_name: str, base_path: Path, stat_type: str
+) -> List[StatisticsFile]:
+    """List all statistics files for a single value and of a single type."""
+    statistics_path = base_path.joinpath(f"{stat_type}/{variable_name}")
     independent_variables = _import_independent_variables(statistics_path)
-    files = glob(f"{statistics_path}/{variable.name}*.csv")
-    for file in files:
+    files = []
+    for file in glob(f"{statistics_path}/{variable_name}*.csv"):
         statistics = VariableStatistic()
-        statistics.variable = variable
+        statistics.variable_id = variable_id
         statistics.plot_type = stat_type
         independent_variable_names = []
         for independent_variable in independent_variables:
             if independent_variable in file:
                 independent_variable_names.append(independent_variable)
         statistics.set_independent_variable_names(independent_variable_names)
-        # statistics.save() in _store_csv_data
-        statistics.start_year, statistics.end_year = _get_start_and_end_year(Path(file))
-        _store_csv_data(Path(file), statistics)
-        for name in independent_variable_names:
-            statistics.independent_variables.add(CACHE[name])
-        statistics.save()
-
-
-def _get_start_and_end_year(file_path) -> Tuple[int, int]:
-    with open(file_path, "r", encoding="utf8") as file:
-        file.seek(0)
-        reader = DictReader(file)
-        years = set()
-        for line in reader:
-            years.add(line["year"])
-
-        return (int(min(years)), int(max(years)))
-
-
-def _store_csv_data(file_path: Path, statistics: VariableStatistic) -> None:
-    """Get content and limited metadata from a csv statistics file."""
-    with open(file_path, "r", encoding="utf8") as file:
-        file.seek(0)
-        statistics.statistics.save(
-            file_path.name + "/" + file_path.parent.parent.name, File(file)
+        statistics.id = statistics.generate_id()
+        files.append(
+            StatisticsFile(
+                Path(file),
+                statistics,
+                [CACHE[name] for name in independent_variable_names],
+            )
         )
-        statistics.save()
+    return files
+
+
+def _independent_variable_ids(statistics_file: StatisticsFile) -> str:
+    """Identify the linked independent variables as part of the digest.
+
+    Changed value labels create new independent variables, which have to be
+    linked again even if the statistics file did not change.
+    """
+    return ",".join(
+        sorted(str(variable.id) for variable in statistics_file.independent_variables)
+    )
+
+
+def _read_statistics_file(
+    path: Path, salt: str, known_digest: str
+) -> StatisticsFileContent:
+    """Read a statistics file once and compute its digest, years and columns."""
+    content = path.read_bytes()
+    digest = hashlib.sha256(salt.encode("utf8") + b"\0" + content).hexdigest()
+    if digest == known_digest:
+        return StatisticsFileContent(digest)
+    columns = build_column_store(content)
+    start_year, end_year = _get_start_and_end_year(columns)
+    return StatisticsFileContent(digest, start_year, end_year, content, columns)
+
+
+def _read_statistics_files(
+    tasks: List[Tuple[Path, str, str]]
+) -> List[StatisticsFileContent]:
+    """Read statistics files in a pool of worker processes.
+
+    The workers do not use the database. Inside of a transaction the files are
+    still read in this process, because its connection can not be closed
+    before forking.
+    """
+    if settings.IMPORT_WORKERS < 2 or len(tasks) < 2 or connection.in_atomic_block:
+        return [_read_statistics_file(*task) for task in tasks]
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=settings.IMPORT_WORKERS,
+        mp_context=multiprocessing.get_context("fork"),
+    ) as executor:
+        return list(
+            executor.map(
+                _read_statistics_file,
+                *zip(*tasks),
+                chunksize=max(1, len(tasks) // (settings.IMPORT_WORKERS * 4)),
+            )
+        )
+
+
+def _get_start_and_end_year(columns: ColumnStore) -> Tuple[int, int]:
+    positions = select_rows(columns, start_year=0)
+    years = slice_columns(columns, positions, [YEAR_COLUMN])[YEAR_COLUMN]
+    return (min(years), max(years))
+
+
+def _write_statistics(files: List[StatisticsFile]) -> None:
+    """Create or update changed statistics and link their independent variables."""
+    VariableStatistic.objects.bulk_create(
+        [statistics_file.statistic for statistics_file in files],
+        batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=STATISTICS_FIELDS,
+    )
+    relation = VariableStatistic.independent_variables.through
+    relation.objects.filter(
+        variablestatistic_id__in=[
+            statistics_file.statistic.id for statistics_file in files
+        ]
+    ).delete()
+    relation.objects.bulk_create(
+        [
+            relation(
+                variablestatistic_id=statistics_file.statistic.id,
+                independentvariable_id=independent_variable.id,
+            )
+            for statistics_file in files
+            for independent_variable in statistics_file.independent_variables
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
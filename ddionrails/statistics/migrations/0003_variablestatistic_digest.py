@@ -0,0 +1,19 @@
+# Generated by Django 4.1.2 on 2026-10-18 10:12
+# pylint: disable=all
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("statistics", "0002_alter_variablestatistic_statistics"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="variablestatistic",
+            name="digest",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
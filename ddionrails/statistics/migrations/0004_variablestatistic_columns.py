@@ -0,0 +1,26 @@
+# Generated by Django 4.1.2 on 2026-10-18 11:05
+# pylint: disable=all
+
+from django.db import migrations, models
+
+
+def reset_digests(apps, schema_editor):
+    """Let the next import parse the columns of all statistics files."""
+    VariableStatistic = apps.get_model("statistics", "VariableStatistic")
+    VariableStatistic.objects.update(digest="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("statistics", "0003_variablestatistic_digest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="variablestatistic",
+            name="columns",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(reset_digests, migrations.RunPython.noop),
+    ]
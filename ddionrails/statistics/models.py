@@ -1,6 +1,7 @@
 """Models for the statistics-server App."""
 
 from typing import Iterable, Optional
+from uuid import UUID
 
 from django.db import models
 
@@ -76,11 +77,20 @@ class VariableStatistic(models.Model):
     independent_variable_names = models.JSONField(default=[])
     start_year = models.IntegerField(null=False, blank=False)
     end_year = models.IntegerField(null=False, blank=False)
+    digest = models.CharField(max_length=64, blank=True, default="")
+    # Parsed content of the statistics file, see ddionrails.statistics.columns
+    columns = models.JSONField(default=dict, blank=True)
 
     def set_independent_variable_names(self, names: list[str]) -> None:
         """Save the names of related indep. var. in a helper field."""
         self.independent_variable_names = sorted(names)
 
+    def generate_id(self) -> UUID:
+        """Generate UUID used in the objects save method."""
+        return hash_with_namespace_uuid(
+            self.variable_id, f"{self.plot_type}{self.independent_variable_names}"
+        )
+
     def save(
         self,
         force_insert: bool = False,
@@ -89,9 +99,7 @@ class VariableStatistic(models.Model):
         update_fields: Optional[Iterable[str]] = None,
     ) -> None:
         if not self.id:
-            self.id = hash_with_namespace_uuid(  # pylint: disable = invalid-name
-                self.variable.id, f"{self.plot_type}{self.independent_variable_names}"
-            )
+            self.id = self.generate_id()  # pylint: disable = invalid-name
         return super().save(
             force_insert=force_insert,
             force_update=force_update,
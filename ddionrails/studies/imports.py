@@ -17,5 +17,7 @@ class StudyDescriptionImport(imports.JekyllImport):
 
 
 class StudyImport(imports.CSVImport):
+    batch_import = True
+
     class DOR:  # pylint: disable=missing-docstring,too-few-public-methods
         form = StudyInitialForm
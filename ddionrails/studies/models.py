@@ -141,9 +141,13 @@ class Study(ModelMixin, TimeStampedModel):
         io_fields = ["name", "label", "description"]
         id_fields = ["name"]
 
+    def generate_id(self, cache=False):
+        """Generate UUID used in the objects save method."""
+        return hash_with_base_uuid(self.name, cache=cache)
+
     def save(self, *args, **kwargs):
         """ "Set id and call parents save()."""
-        self.id = hash_with_base_uuid(self.name, cache=False)  # pylint: disable=C0103
+        self.id = self.generate_id()  # pylint: disable=C0103
 
         super().save(*args, **kwargs)
 
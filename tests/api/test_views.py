@@ -3,6 +3,7 @@
 
 """ Test cases for views in ddionrails.api app """
 
+import gzip
 import json
 import unittest
 from typing import Dict, List
@@ -10,10 +11,14 @@ from unittest.mock import PropertyMock, patch
 from uuid import UUID, uuid4
 
 import pytest
+from django.core.files.base import ContentFile
 from django.test.client import Client
 from rest_framework.test import APIClient, APIRequestFactory
 
 from ddionrails.instruments.models.concept_question import ConceptQuestion
+from ddionrails.statistics.columns import build_column_store
+from ddionrails.statistics.files import store_encoded_variants
+from ddionrails.statistics.models import VariableStatistic
 from ddionrails.workspace.models import Basket, BasketVariable
 from tests import status
 from tests.concepts.factories import ConceptFactory, TopicFactory
@@ -361,6 +366,143 @@ class TestDatasetViewSet(unittest.TestCase):
         self.assertEqual(getattr(dataset, "name"), content["results"][0]["name"])
 
 
+STATISTIC_CSV = (
+    "year,alter_gr,n,percent\n"
+    "2000,16-34 Jahre alt,264,0.5\n"
+    "2000,35-65 Jahre alt,456,0.25\n"
+    "2001,16-34 Jahre alt,270,0.75\n"
+)
+
+
+@pytest.mark.django_db
+class TestStatisticViewSet(unittest.TestCase):
+
+    API_PATH = "/api/statistic/"
+    client: APIClient
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.variable = VariableFactory(name="some-variable")
+        self.statistic = VariableStatistic(
+            variable=self.variable,
+            plot_type="categorical",
+            start_year=2000,
+            end_year=2001,
+            columns=build_column_store(STATISTIC_CSV),
+            digest="some-digest",
+        )
+        self.statistic.set_independent_variable_names(["alter_gr"])
+        self.statistic.statistics.save(
+            "some-variable.csv", ContentFile(STATISTIC_CSV.encode("utf8")), save=False
+        )
+        self.statistic.save()
+        store_encoded_variants(
+            self.statistic.statistics.storage,
+            self.statistic.statistics.name,
+            STATISTIC_CSV.encode("utf8"),
+        )
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        storage = self.statistic.statistics.storage
+        storage.delete(self.statistic.statistics.name + ".gz")
+        self.statistic.statistics.delete(save=False)
+        return super().tearDown()
+
+    def _get(self, parameters: str = "", **headers):
+        return self.client.get(
+            f"{self.API_PATH}?variable={self.variable.id}"
+            f"&type=categorical&dimensions=alter_gr{parameters}",
+            **headers,
+        )
+
+    def test_whole_file(self) -> None:
+        response = self._get()
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(STATISTIC_CSV.encode("utf8"), response.getvalue())
+        self.assertEqual('"some-digest"', response["ETag"])
+        self.assertEqual(str(len(STATISTIC_CSV)), response["Content-Length"])
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_whole_file_not_modified(self) -> None:
+        response = self._get(HTTP_IF_NONE_MATCH='"other", "some-digest"')
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+        response = self._get(HTTP_IF_NONE_MATCH='"some-digest.gzip"')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_precompressed_file(self) -> None:
+        response = self._get(HTTP_ACCEPT_ENCODING="br;q=0, gzip, deflate")
+        self.assertEqual("gzip", response["Content-Encoding"])
+        self.assertEqual('"some-digest.gzip"', response["ETag"])
+        self.assertEqual(
+            STATISTIC_CSV.encode("utf8"), gzip.decompress(response.getvalue())
+        )
+        response = self._get(HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_byte_ranges(self) -> None:
+        response = self._get(HTTP_RANGE="bytes=0-3")
+        self.assertEqual(status.HTTP_206_PARTIAL_CONTENT, response.status_code)
+        self.assertEqual(b"year", response.getvalue())
+        self.assertEqual(f"bytes 0-3/{len(STATISTIC_CSV)}", response["Content-Range"])
+        response = self._get(HTTP_RANGE="bytes=-5")
+        self.assertEqual(b"0.75\n", response.getvalue())
+        response = self._get(HTTP_RANGE=f"bytes={len(STATISTIC_CSV) - 2}-")
+        self.assertEqual(b"5\n", response.getvalue())
+        response = self._get(HTTP_RANGE=f"bytes={len(STATISTIC_CSV)}-")
+        self.assertEqual(
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, response.status_code
+        )
+
+    def test_byte_range_with_changed_file(self) -> None:
+        response = self._get(HTTP_RANGE="bytes=0-3", HTTP_IF_RANGE='"some-digest"')
+        self.assertEqual(status.HTTP_206_PARTIAL_CONTENT, response.status_code)
+        response = self._get(HTTP_RANGE="bytes=0-3", HTTP_IF_RANGE='"old-digest"')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(STATISTIC_CSV.encode("utf8"), response.getvalue())
+
+    def test_slice_not_modified(self) -> None:
+        response = self._get("&start_year=2001")
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"some-digest-'))
+        response = self._get("&start_year=2001", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+        response = self._get("&start_year=2000", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_year_range_and_columns(self) -> None:
+        response = self._get("&start_year=2001&columns=year,n")
+        self.assertEqual("year,n\n2001,270\n", response.content.decode("utf8"))
+
+    def test_dimension_filter_as_json(self) -> None:
+        response = self._get("&filter=alter_gr:35-65 Jahre alt&format=json")
+        self.assertTrue(response_is_json(response))
+        self.assertEqual(
+            {
+                "year": [2000],
+                "alter_gr": ["35-65 Jahre alt"],
+                "n": [456],
+                "percent": [0.25],
+            },
+            response.json(),
+        )
+
+    def test_statistic_without_columns(self) -> None:
+        VariableStatistic.objects.filter(id=self.statistic.id).update(columns={})
+        response = self._get("&end_year=2000&columns=percent")
+        self.assertEqual("percent\n0.5\n0.25\n", response.content.decode("utf8"))
+
+    def test_invalid_parameters(self) -> None:
+        for parameters in (
+            "&columns=sex",
+            "&filter=sex:weiblich",
+            "&filter=alter_gr",
+            "&start_year=x",
+        ):
+            response = self._get(parameters)
+            self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+
 @pytest.mark.django_db
 class TestInstrumentViewSet(unittest.TestCase):
 
@@ -106,6 +106,26 @@ class TestPeriodImport:
         expected = None
         assert expected is response
 
+    def test_import_batch(
+        self, period_importer, valid_period_data, empty_data, django_assert_num_queries
+    ):
+        other_period_data = dict(valid_period_data, period_name="other-period")
+        # One query resolves the study of all rows, one query upserts them.
+        with django_assert_num_queries(2):
+            response = period_importer.import_batch(
+                [valid_period_data, other_period_data, empty_data]
+            )
+        assert 2 == len(response)
+        assert 2 == Period.objects.count()
+        period = Period.objects.get(name="some-period")
+        assert period.id == period.generate_id()
+        assert valid_period_data["label"] == period.label
+
+        changed_period_data = dict(valid_period_data, label="Changed Period")
+        period_importer.import_batch([changed_period_data])
+        assert 2 == Period.objects.count()
+        assert "Changed Period" == Period.objects.get(name="some-period").label
+
 
 class TestTopicJsonImport:
     def test_execute_import_method(self, topic_json_importer, mocker):
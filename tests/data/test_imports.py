@@ -7,25 +7,30 @@ import os
 import unittest
 from io import BytesIO, StringIO
 from pathlib import Path
+from tempfile import TemporaryDirectory
 from typing import Dict, TypedDict
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 from ddionrails.concepts.imports import ConceptImport
-from ddionrails.concepts.models import AnalysisUnit, ConceptualDataset, Period
+from ddionrails.concepts.models import AnalysisUnit, Concept, ConceptualDataset, Period
 from ddionrails.data.imports import (
     DatasetImport,
     DatasetJsonImport,
     TransformationImport,
     VariableImport,
+    variables_images_import,
 )
 from ddionrails.data.models import Dataset, Transformation, Variable
 from ddionrails.imports.manager import StudyImportManager
+from ddionrails.imports.models import ImportRun
+from ddionrails.imports.shadow import create_shadow_schema, use_shadow_schema
 from ddionrails.studies.models import Study
 from tests.concepts.factories import ConceptFactory
 from tests.conftest import VariableImageFile
 from tests.data.factories import DatasetFactory
+from tests.studies.factories import StudyFactory
 
 from .factories import VariableFactory
 
@@ -130,19 +135,20 @@ class TestDatasetJsonImport:
         mocked__import_dataset.assert_called_once()
 
     def test_import_dataset_method(self, mocker, dataset_json_importer):
-        mocked_import_variable = mocker.patch.object(
-            DatasetJsonImport, "_import_variable"
+        mocked_write_variables = mocker.patch.object(
+            DatasetJsonImport, "_write_variables"
         )
         name = "some-dataset"
         content = [dict(study="some-study", dataset="some-dataset", name="some-variable")]
         dataset_json_importer._import_dataset(  # pylint: disable=protected-access
             name, content
         )
-        mocked_import_variable.assert_called_once()
+        mocked_write_variables.assert_called_once()
+        assert 1 == len(mocked_write_variables.call_args.args[0])
 
     def test_import_dataset_method_with_dictionary(self, mocker, dataset_json_importer):
-        mocked_import_variable = mocker.patch.object(
-            DatasetJsonImport, "_import_variable"
+        mocked_write_variables = mocker.patch.object(
+            DatasetJsonImport, "_write_variables"
         )
         name = "some-dataset"
         content = dict(
@@ -153,7 +159,22 @@ class TestDatasetJsonImport:
         dataset_json_importer._import_dataset(  # pylint: disable=protected-access
             name, content
         )
-        mocked_import_variable.assert_called_once()
+        mocked_write_variables.assert_called_once()
+        assert 1 == len(mocked_write_variables.call_args.args[0])
+
+    def test_import_dataset_keeps_missing_fields(self, dataset_json_importer, dataset):
+        variable = Variable.objects.create(
+            dataset=dataset, name="some-variable", label="old", statistics={"valid": 1}
+        )
+        content = [dict(name="some-variable", label="new"), dict(name="other-variable")]
+        dataset_json_importer._import_dataset(  # pylint: disable=protected-access
+            dataset.name, content
+        )
+        assert 2 == Variable.objects.count()
+        variable.refresh_from_db()
+        assert "new" == variable.label
+        assert {"valid": 1} == variable.statistics
+        assert 1 == Variable.objects.get(name="other-variable").sort_id
 
     def test_import_variable_method(self, dataset_json_importer, dataset):
         assert 0 == Variable.objects.count()
@@ -304,6 +325,59 @@ class TestTransformationImport:
         with TEST_CASE.assertRaisesRegex(Variable.DoesNotExist, "Target.*"):
             transformation_importer.import_element(element)
 
+    @pytest.mark.django_db
+    def test_import_batch(
+        self, transformation_importer, study, dataset, django_assert_num_queries
+    ):
+        origin_variables = [VariableFactory(name=f"origin-{index}") for index in range(3)]
+        target_variable = VariableFactory(name="target")
+        elements = [
+            dict(
+                origin_study=study.name,
+                origin_dataset=dataset.name,
+                origin_variable=origin_variable.name,
+                target_study=study.name,
+                target_dataset=dataset.name,
+                target_variable=target_variable.name,
+            )
+            for origin_variable in origin_variables + origin_variables[:1]
+        ]
+        with django_assert_num_queries(2):
+            transformation_importer.import_batch(elements)
+        transformation_importer.import_batch(elements)
+        assert 3 == Transformation.objects.filter(target=target_variable).count()
+
+    @pytest.mark.django_db
+    def test_import_batch_in_shadow_schema(self, study, dataset):
+        other_dataset = DatasetFactory(
+            name="other-dataset", study=StudyFactory(name="other-study")
+        )
+        other_variable = VariableFactory(name="other-target", dataset=other_dataset)
+        stale_variable = VariableFactory(name="stale-target", dataset=dataset)
+        run = ImportRun.objects.create(study=study)
+        create_shadow_schema(run)
+        importer = TransformationImport("DUMMY.csv", study)
+        with use_shadow_schema(run.schema):
+            origin_variable = VariableFactory(name="origin")
+            element = dict(
+                origin_study=study.name,
+                origin_dataset=dataset.name,
+                origin_variable=origin_variable.name,
+                target_study=other_dataset.study.name,
+                target_dataset=other_dataset.name,
+                target_variable=other_variable.name,
+            )
+            importer.import_batch([element])
+            assert [other_variable.id] == list(
+                Transformation.objects.values_list("target", flat=True)
+            )
+            # Live variables of the imported study are replaced by the import.
+            element.update(target_study=study.name, target_dataset=dataset.name)
+            element.update(target_variable=stale_variable.name)
+            with TEST_CASE.assertRaisesRegex(Variable.DoesNotExist, "Target.*"):
+                importer.import_batch([element])
+        assert not Transformation.objects.exists()
+
 
 @pytest.mark.django_db
 @pytest.mark.usefixtures(("mock_import_path"))
@@ -392,6 +466,87 @@ class TestVariableImport:
         assert variable.description == element["description"]
         assert variable.concept.name == element["concept_name"]
 
+    @pytest.mark.parametrize("copy_loader", [False, True])
+    def test_execute_import_updates_existing_variables(
+        self, variable_importer, variable, settings, copy_loader
+    ):
+        settings.IMPORT_COPY_LOADER = copy_loader
+        variable.label = "Existing label"
+        variable.save()
+        concept = ConceptFactory(name="some-concept")
+        concept.save()
+        variable_importer.content = [
+            dict(
+                dataset=variable.dataset.name,
+                name=variable.name,
+                concept=concept.name,
+                label="New label",
+                description="some-description",
+                statistics="True",
+            ),
+            dict(
+                dataset_name=variable.dataset.name,
+                variable_name="some-new-variable",
+                label="Some new label",
+            ),
+        ]
+        variable_importer.execute_import()
+
+        updated_variable = Variable.objects.get(id=variable.id)
+        assert "Existing label" == updated_variable.label
+        assert "some-description" == updated_variable.description
+        assert concept == updated_variable.concept
+        assert updated_variable.statistics_flag
+        new_variable = Variable.objects.get(name="some-new-variable")
+        new_variable_id = new_variable.id
+        new_variable.save()
+        assert new_variable_id == new_variable.id
+        assert "Some new label" == new_variable.label
+        assert variable.dataset.period_id == new_variable.period_id
+
+    def test_execute_import_skips_unchanged_variables(self, variable_importer, variable):
+        row = dict(dataset=variable.dataset.name, name=variable.name, description="a")
+        variable_importer.content = [row]
+        variable_importer.execute_import()
+        Variable.objects.filter(id=variable.id).update(description="changed")
+
+        variable_importer.content = [dict(row)]
+        variable_importer.execute_import()
+        assert "changed" == Variable.objects.get(id=variable.id).description
+
+        variable_importer.content = [dict(row, description="b")]
+        variable_importer.execute_import()
+        assert "b" == Variable.objects.get(id=variable.id).description
+
+    def test_execute_import_deletes_removed_variables(self, variable_importer, variable):
+        variable_importer.content = [
+            dict(dataset=variable.dataset.name, name=variable.name),
+            dict(dataset=variable.dataset.name, name="some-other-variable"),
+        ]
+        variable_importer.execute_import()
+        assert 2 == Variable.objects.count()
+
+        variable_importer.content = [
+            dict(dataset=variable.dataset.name, name="some-other-variable")
+        ]
+        variable_importer.execute_import()
+        assert ["some-other-variable"] == [
+            _variable.name for _variable in Variable.objects.all()
+        ]
+
+    def test_execute_import_with_missing_dataset(self, variable_importer, dataset):
+        variable_importer.content = [dict(dataset="missing-dataset", name="variable")]
+        with TEST_CASE.assertRaisesRegex(Dataset.DoesNotExist, "missing-dataset"):
+            variable_importer.execute_import()
+
+    def test_execute_import_with_missing_concept(self, variable_importer, dataset):
+        variable_importer.content = [
+            dict(dataset=dataset.name, name="variable", concept="missing-concept")
+        ]
+        with TEST_CASE.assertRaisesRegex(Concept.DoesNotExist, "missing-concept"):
+            variable_importer.execute_import()
+        assert 0 == Variable.objects.count()
+
 
 class ImageDummy(TypedDict, total=False):
     """Typing help for TestVariableImageImport."""
@@ -431,3 +586,22 @@ class TestVariableImageImport(unittest.TestCase):
         csv_writer.writeheader()
         csv_writer.writerow(csv_file_content)
         self.csv_file = csv_file_handler.getvalue()
+
+    def test_variables_images_import(self):
+        with TemporaryDirectory() as directory:
+            images_file = Path(directory).joinpath("variables_images.csv")
+            images_file.write_text(self.csv_file, encoding="utf8")
+            variables_images_import(images_file, self.variable.dataset.study)
+        self.variable.refresh_from_db()
+        self.assertEqual(
+            {"en": self.images["image"]["url"], "de": self.images["image_de"]["url"]},
+            self.variable.images,
+        )
+
+    def test_variables_images_import_unknown_variable(self):
+        Variable.objects.all().delete()
+        with TemporaryDirectory() as directory:
+            images_file = Path(directory).joinpath("variables_images.csv")
+            images_file.write_text(self.csv_file, encoding="utf8")
+            with self.assertRaisesRegex(Variable.DoesNotExist, self.variable.name):
+                variables_images_import(images_file, self.variable.dataset.study)
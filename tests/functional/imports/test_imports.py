@@ -127,6 +127,33 @@ class TestStudyImportManagerUnittest(unittest.TestCase):
         TEST_CASE.assertEqual("https://some-study.de", attachment.url)
         TEST_CASE.assertEqual("some-study", attachment.url_text)
 
+    def test_import_attachments_for_all_targets(self):
+        dataset = Dataset.objects.create(study=self.study, name="some-dataset")
+        variable = Variable.objects.create(dataset=dataset, name="some-variable")
+        instrument = Instrument.objects.create(study=self.study, name="some-instrument")
+        question = Question.objects.create(instrument=instrument, name="some-question")
+        import_path = self.study_import_manager.study.import_path().joinpath(
+            "attachments.csv"
+        )
+        header = ("type", "dataset", "variable", "instrument", "question", "url")
+        rows = [
+            dict(type="dataset", dataset=dataset.name),
+            dict(type="variable", dataset=dataset.name, variable=variable.name),
+            dict(type="instrument", instrument=instrument.name),
+            dict(type="question", instrument=instrument.name, question=question.name),
+        ]
+        with open(import_path, "w", encoding="utf8") as attachements_file:
+            writer = csv.DictWriter(attachements_file, fieldnames=header + ("url_text",))
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(dict(row, url=f"https://{row['type']}.de"))
+        self.study_import_manager.import_single_entity("attachments")
+
+        for target in (dataset, variable, instrument, question):
+            attachment = target.attachments.get()
+            TEST_CASE.assertEqual(self.study, attachment.context_study)
+            TEST_CASE.assertEqual(f"https://{target._meta.model_name}.de", attachment.url)
+
 
 @pytest.mark.django_db
 @pytest.mark.usefixtures("mock_import_path", "clean_search_index")
@@ -323,6 +350,13 @@ class TestStudyImportManager:
         TEST_CASE.assertEqual(concept, relation.concept)
         TEST_CASE.assertEqual(question, relation.question)
 
+    def test_import_concepts_questions_without_concept(
+        self, study_import_manager, question  # pylint: disable=unused-argument
+    ):
+        with TEST_CASE.assertRaises(Concept.DoesNotExist):
+            study_import_manager.import_single_entity("concepts_questions")
+        TEST_CASE.assertEqual(0, ConceptQuestion.objects.count())
+
     def test_import_transformations(self, study_import_manager, variable):
         TEST_CASE.assertEqual(0, Transformation.objects.count())
         other_variable = VariableFactory(name="some-other-variable")
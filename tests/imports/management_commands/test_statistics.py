@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring,invalid-name
+
+""" Test cases for "statistics" management command for ddionrails project """
+
+import unittest
+from shutil import rmtree
+
+import pytest
+from django.core.management import call_command
+
+from ddionrails.studies.models import Study
+
+TEST_CASE = unittest.TestCase()
+
+MICRODATA = (
+    "syear,some-variable,some-other-variable,some-third-variable,alter_gr\n"
+    "2000,1,1,1,1\n"
+    "2000,2,2,2,2\n"
+    "2001,3,1,3,1\n"
+)
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.mark.usefixtures("tmp_import_path")
+def test_statistics_command(study: Study, tmp_path):
+    """ Test statistics management command writes the files of marked variables """
+    statistics_path = study.import_path().parent.joinpath("statistics")
+    rmtree(statistics_path)
+    microdata = tmp_path.joinpath("microdata.csv")
+    microdata.write_text(MICRODATA, encoding="utf8")
+    call_command("statistics", study.name, str(microdata), "-d", "alter_gr", "-w", "1")
+    TEST_CASE.assertEqual(
+        [
+            "categorical/some-other-variable/meta.json",
+            "categorical/some-other-variable/some-other-variable_year.csv",
+            "categorical/some-other-variable/some-other-variable_year_alter_gr.csv",
+            "categorical/some-third-variable/meta.json",
+            "categorical/some-third-variable/some-third-variable_year.csv",
+            "categorical/some-third-variable/some-third-variable_year_alter_gr.csv",
+            "numerical/some-third-variable/meta.json",
+            "numerical/some-third-variable/some-third-variable_year.csv",
+            "numerical/some-third-variable/some-third-variable_year_alter_gr.csv",
+            "numerical/some-variable/meta.json",
+            "numerical/some-variable/some-variable_year.csv",
+            "numerical/some-variable/some-variable_year_alter_gr.csv",
+        ],
+        sorted(
+            path.relative_to(statistics_path).as_posix()
+            for path in statistics_path.rglob("*")
+            if path.is_file()
+        ),
+    )
+
+
+@pytest.mark.usefixtures("tmp_import_path")
+def test_statistics_command_with_missing_columns(study: Study, tmp_path):
+    """ Test statistics management command exits for incomplete microdata """
+    microdata = tmp_path.joinpath("microdata.csv")
+    microdata.write_text("syear,some-variable\n2000,1\n", encoding="utf8")
+    with TEST_CASE.assertRaises(SystemExit):
+        call_command("statistics", study.name, str(microdata))
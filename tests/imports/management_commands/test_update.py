@@ -12,6 +12,7 @@ import pytest
 from _pytest.capture import CaptureFixture
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.management import call_command
+from django.core.management.base import CommandError
 
 from ddionrails.concepts.models import Period
 from ddionrails.data.models import Dataset, Variable
@@ -128,6 +129,64 @@ def test_update_single_study_entity_filename(study, mocked_import_single_entity)
     TEST_CASE.assertEqual(Path(filename), mocked_import_single_entity.call_args.args[1])
 
 
+def test_update_single_study_incremental(study, mocker, mocked_import_all_entities):
+    study.current_commit = "1"
+    study.save()
+    manager = StudyImportManager(study, redis=False)
+    manager.repo.repo = mocker.MagicMock()
+    manager.repo.repo.git.diff.return_value = "ddionrails/periods.csv\n"
+    mocked_import_changed_entities = mocker.patch.object(
+        StudyImportManager, "import_changed_entities"
+    )
+    update.update_single_study(study, True, (), None, manager=manager, incremental=True)
+    manager.repo.repo.git.diff.assert_called_once()
+    TEST_CASE.assertEqual("1", manager.repo.repo.git.diff.call_args.args[0])
+    mocked_import_changed_entities.assert_called_once_with(["ddionrails/periods.csv"])
+    mocked_import_all_entities.assert_not_called()
+
+
+def test_update_single_study_records_imported_commit(
+    study, mocker, mocked_import_all_entities
+):
+    mocker.patch("ddionrails.imports.manager.StudyImportManager.update_repo")
+    manager = StudyImportManager(study, redis=False)
+    manager.repo.repo = mocker.MagicMock()
+    manager.repo.repo.head.commit = "2"
+    manager.start_run()
+    mocked_import_all_entities.return_value = {}
+    update.update_single_study(study, False, (), None, manager=manager)
+    study.refresh_from_db()
+    TEST_CASE.assertEqual("2", study.current_commit)
+
+
+def test_update_single_study_failed_import_keeps_commit(
+    study, mocker, mocked_import_all_entities
+):
+    study.current_commit = "1"
+    study.save()
+    mocker.patch("ddionrails.imports.manager.StudyImportManager.update_repo")
+    manager = StudyImportManager(study, redis=False)
+    manager.repo.repo = mocker.MagicMock()
+    manager.repo.repo.head.commit = "2"
+    mocked_import_all_entities.side_effect = ValueError
+    with TEST_CASE.assertRaises(ValueError):
+        update.update_single_study(study, False, (), None, manager=manager)
+    study.refresh_from_db()
+    TEST_CASE.assertEqual("1", study.current_commit)
+
+
+def test_update_single_study_incremental_without_commit(
+    study, mocker, mocked_import_all_entities
+):
+    manager = StudyImportManager(study, redis=False)
+    mocked_import_changed_entities = mocker.patch.object(
+        StudyImportManager, "import_changed_entities"
+    )
+    update.update_single_study(study, True, (), None, manager=manager, incremental=True)
+    mocked_import_changed_entities.assert_not_called()
+    mocked_import_all_entities.assert_called_once()
+
+
 @pytest.mark.usefixtures(("mock_import_path"))
 def test_update_single_study_entity_filename_without_redis(study):
     filename = Study().import_path().joinpath("instruments/some-instrument.json")
@@ -155,6 +214,25 @@ def test_update_single_study_entity_nonexistent_filename(study):
         )
 
 
+def test_update_single_study_failed_clean_import(variable, mocker):
+    study = variable.dataset.study
+    manager = StudyImportManager(study)
+
+    def _failing_import():
+        manager.start_run()
+        raise ValueError("broken import")
+
+    mocker.patch.object(manager, "import_all_entities", side_effect=_failing_import)
+    with TEST_CASE.assertRaises(ValueError):
+        update.update_single_study(study, True, clean_import=True, manager=manager)
+
+    # The previous content is kept and the shadow schema is dropped.
+    TEST_CASE.assertTrue(manager.redis)
+    TEST_CASE.assertTrue(Variable.objects.filter(id=variable.id).exists())
+    manager.run.refresh_from_db()
+    TEST_CASE.assertEqual("", manager.run.schema)
+
+
 def test_update_all_studies_completely(
     study, mocked_update_single_study  # pylint: disable=unused-argument
 ):
@@ -162,6 +240,49 @@ def test_update_all_studies_completely(
     mocked_update_single_study.assert_called_once()
 
 
+def test_update_all_studies_completely_parallel(study, mocker):
+    mocked_parallel = mocker.patch(
+        "ddionrails.imports.management.commands.update.update_studies_in_parallel"
+    )
+    update.update_all_studies_completely(True, redis=False, workers=2)
+    mocked_parallel.assert_called_once_with(True, False, False, 2)
+
+
+def test_update_all_studies_completely_clean_import_is_sequential(
+    study, mocker, mocked_update_single_study
+):
+    mocked_parallel = mocker.patch(
+        "ddionrails.imports.management.commands.update.update_studies_in_parallel"
+    )
+    update.update_all_studies_completely(True, clean_import=True, workers=2)
+    mocked_parallel.assert_not_called()
+    mocked_update_single_study.assert_called_once()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_update_studies_in_parallel(mocker, capsys: CaptureFixture):
+    Study.objects.create(name="some-study")
+    Study.objects.create(name="other-study")
+
+    def _update_single_study(study, *_args, **_kwargs):
+        if study.name == "other-study":
+            raise ValueError("broken import")
+
+    # The workers are forked after patching, so they run the patched function.
+    mocker.patch(
+        "ddionrails.imports.management.commands.update.update_single_study",
+        side_effect=_update_single_study,
+    )
+    with TEST_CASE.assertRaises(CommandError) as error:
+        update.update_studies_in_parallel(True, False, False, 2)
+
+    TEST_CASE.assertIn("other-study", str(error.exception))
+    TEST_CASE.assertNotIn("some-study", str(error.exception))
+    output = capsys.readouterr().out
+    TEST_CASE.assertIn("ValueError: broken import", output)
+    TEST_CASE.assertIn("Updated 1 of 2 studies", output)
+
+
 @pytest.mark.parametrize("option", ("-h", "--help"))
 def test_update_command_shows_help(option, capsys: CaptureFixture):
     """Test "update" shows help"""
@@ -195,7 +316,22 @@ def test_update_command_without_study_name_local(
         call_command("update", option)
 
     TEST_CASE.assertEqual(0, error.exception.code)
-    mocked_update_all_studies_completely.assert_called_once_with(True, False, redis=True)
+    mocked_update_all_studies_completely.assert_called_once_with(
+        True, False, redis=True, incremental=False, workers=1
+    )
+
+
+@pytest.mark.parametrize("option", ("-w", "--workers"))
+def test_update_command_without_study_name_workers(
+    option, mocked_update_all_studies_completely
+):
+    with TEST_CASE.assertRaises(SystemExit) as error:
+        call_command("update", option, "4")
+
+    TEST_CASE.assertEqual(0, error.exception.code)
+    mocked_update_all_studies_completely.assert_called_once_with(
+        False, False, redis=True, incremental=False, workers=4
+    )
 
 
 def test_update_command_with_invalid_study_name(capsys: CaptureFixture):
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for row level change detection in ddionrails.imports app """
+
+import pytest
+
+from ddionrails.data.models import Variable
+from ddionrails.imports.delta import DigestStore, row_digest
+from ddionrails.imports.models import RowDigest
+
+pytestmark = [pytest.mark.imports]  # pylint: disable=invalid-name
+
+
+def test_row_digest_ignores_key_order():
+    assert row_digest({"a": "1", "b": "2"}) == row_digest({"b": "2", "a": "1"})
+    assert row_digest({"a": "1"}) != row_digest({"a": "2"})
+    assert row_digest({"a": "1"}, {"a": "2"}) != row_digest({"a": "2"}, {"a": "1"})
+
+
+def test_row_digest_with_surplus_cells():
+    assert row_digest({"a": "1", None: [""]}) != row_digest({"a": "1"})
+
+
+@pytest.mark.django_db
+class TestDigestStore:
+    def test_new_objects_are_changed(self, study, variable):
+        store = DigestStore(study, "variables", Variable)
+        assert {variable.id} == store.changed({variable.id: "digest"})
+
+    def test_saved_objects_are_unchanged(self, study, variable):
+        DigestStore(study, "variables", Variable).save({variable.id: "digest"})
+        store = DigestStore(study, "variables", Variable)
+        assert set() == store.changed({variable.id: "digest"})
+        assert {variable.id} == store.changed({variable.id: "other-digest"})
+
+    def test_save_updates_digests(self, study, variable):
+        DigestStore(study, "variables", Variable).save({variable.id: "digest"})
+        DigestStore(study, "variables", Variable).save({variable.id: "other-digest"})
+        digest = RowDigest.objects.get(study=study, entity="variables")
+        assert "other-digest" == digest.digest
+
+    def test_deleted_objects_are_changed(self, study, variable):
+        variable_id = variable.id
+        DigestStore(study, "variables", Variable).save({variable_id: "digest"})
+        variable.delete()
+        store = DigestStore(study, "variables", Variable)
+        assert {variable_id} == store.changed({variable_id: "digest"})
+
+    def test_deleted(self, study, variable):
+        DigestStore(study, "variables", Variable).save({variable.id: "digest"})
+        store = DigestStore(study, "variables", Variable)
+        store.changed({})
+        assert {variable.id} == store.deleted()
+        store.forget(store.deleted())
+        assert 0 == RowDigest.objects.count()
+
+    def test_without_study(self, variable):
+        store = DigestStore(None, "variables", Variable)
+        store.save({variable.id: "digest"})
+        assert 0 == RowDigest.objects.count()
+        assert {variable.id} == store.changed({variable.id: "digest"})
@@ -3,10 +3,12 @@
 
 """ Test cases for importer classes in ddionrails.imports app """
 
+import csv
 
 import pytest
 
-from ddionrails.imports.imports import CSVImport, Import, JekyllImport
+from ddionrails.imports.imports import CSVImport, Import, JekyllImport, StreamingCSVImport
+from ddionrails.imports.models import ImportCheckpoint
 
 pytestmark = [pytest.mark.imports]
 
@@ -72,3 +74,84 @@ class TestCSVImport:
         element = "element"
         respone = csv_importer.process_element(element)
         assert respone == element
+
+
+class SampleStreamingImport(StreamingCSVImport):
+    chunk_size = 2
+
+    def __init__(self, filename, study=None, system=None):
+        super().__init__(filename, study, system)
+        self.imported = []
+        self.skipped = []
+
+    def import_element(self, element):
+        if element["name"] == "fail":
+            raise ValueError(element["name"])
+        self.imported.append(element["name"])
+
+    def skip_chunk(self, rows):
+        self.skipped.extend(row["name"] for row in rows)
+
+
+@pytest.fixture(name="streaming_csv_file")
+def _streaming_csv_file(tmp_path):
+    csv_file = tmp_path.joinpath("sample.csv")
+
+    def _write(*names):
+        with open(csv_file, "w", encoding="utf8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["name"])
+            writer.writerows([name] for name in names)
+        return csv_file
+
+    return _write
+
+
+@pytest.mark.django_db
+class TestStreamingCSVImport:
+    def test_run_import(self, study, streaming_csv_file):
+        csv_file = streaming_csv_file("a", "b", "c")
+        importer = SampleStreamingImport(csv_file, study)
+        importer.read_file()
+        importer.execute_import()
+        assert ["a", "b", "c"] == importer.imported
+        assert 0 == ImportCheckpoint.objects.count()
+
+    def test_interrupted_import_keeps_committed_chunks(self, study, streaming_csv_file):
+        csv_file = streaming_csv_file("a", "b", "c", "fail", "e")
+        with pytest.raises(ValueError):
+            SampleStreamingImport.run_import(csv_file, study)
+        checkpoint = ImportCheckpoint.objects.get(study=study)
+        assert 2 == checkpoint.rows
+        assert "SampleStreamingImport" == checkpoint.importer
+
+    def test_import_resumes_from_checkpoint(self, study, streaming_csv_file):
+        csv_file = streaming_csv_file("a", "b", "c", "d", "e")
+        importer = SampleStreamingImport(csv_file, study)
+        importer.read_file()
+        ImportCheckpoint.objects.create(
+            study=study,
+            importer="SampleStreamingImport",
+            filename=str(csv_file),
+            file_digest=importer.file_digest,
+            rows=2,
+        )
+        importer.execute_import()
+        assert ["a", "b"] == importer.skipped
+        assert ["c", "d", "e"] == importer.imported
+        assert 0 == ImportCheckpoint.objects.count()
+
+    def test_checkpoint_of_changed_file_is_ignored(self, study, streaming_csv_file):
+        csv_file = streaming_csv_file("a", "b", "c")
+        ImportCheckpoint.objects.create(
+            study=study,
+            importer="SampleStreamingImport",
+            filename=str(csv_file),
+            file_digest="outdated",
+            rows=2,
+        )
+        importer = SampleStreamingImport(csv_file, study)
+        importer.read_file()
+        importer.execute_import()
+        assert [] == importer.skipped
+        assert ["a", "b", "c"] == importer.imported
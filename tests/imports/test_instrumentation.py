@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for import instrumentation in ddionrails.imports app """
+
+import multiprocessing
+import time
+import unittest
+
+import pytest
+from django.db import DatabaseError, connection, transaction
+
+from ddionrails.imports.instrumentation import format_report, run_instrumented
+from ddionrails.imports.manager import StudyImportManager
+from ddionrails.imports.models import ImportRun, ImportRunEntry
+from ddionrails.imports.sources import read_source, release_source_cache
+from ddionrails.studies.models import Study
+
+pytestmark = [pytest.mark.imports]
+
+TEST_CASE = unittest.TestCase()
+
+
+def _sample_import(file, study):  # pylint: disable=unused-argument
+    list(read_source(file))
+    list(Study.objects.all())
+    list(Study.objects.all())
+    return "imported"
+
+
+def _failing_import(file, study):
+    raise ValueError(f"{file} {study}")
+
+
+def _unread_import(file, study):  # pylint: disable=unused-argument
+    return None
+
+
+def _allocating_import(file, study):  # pylint: disable=unused-argument
+    content = b"x" * 2**26
+    return len(content)
+
+
+def _busy_wait():
+    end = time.process_time() + 0.2
+    while time.process_time() < end:
+        pass
+
+
+def _forking_import(file, study):  # pylint: disable=unused-argument
+    process = multiprocessing.get_context("fork").Process(target=_busy_wait)
+    process.start()
+    process.join()
+
+
+def _duplicate_study_import(file, study):  # pylint: disable=unused-argument
+    Study.objects.create(name=study.name)
+
+
+def _invalid_sql_import(file, study):  # pylint: disable=unused-argument
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT * FROM missing_table")
+
+
+@pytest.fixture(name="source_cache")
+def _source_cache():
+    yield
+    release_source_cache()
+
+
+@pytest.fixture(name="csv_file")
+def _csv_file(tmp_path):
+    csv_file = tmp_path.joinpath("sample.csv")
+    csv_file.write_text('name,label\na,"multi\nline"\nb,label\n', encoding="utf8")
+    return csv_file
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("source_cache")
+class TestRunInstrumented:
+    def test_run_instrumented(self, study, csv_file):
+        run = ImportRun.objects.create(study=study)
+        result = run_instrumented(run.id, "sample", _sample_import, csv_file, study)
+        assert "imported" == result
+        entry = ImportRunEntry.objects.get(run=run)
+        assert "sample" == entry.entity
+        assert str(csv_file) == entry.filename
+        assert 2 == entry.rows
+        assert 2 == entry.queries
+        assert entry.succeeded
+        assert 0 < entry.peak_memory
+
+    def test_run_instrumented_peak_memory_per_import(self, study, csv_file):
+        run = ImportRun.objects.create(study=study)
+        run_instrumented(run.id, "allocating", _allocating_import, csv_file, study)
+        run_instrumented(run.id, "unread", _unread_import, csv_file, study)
+        allocating = ImportRunEntry.objects.get(run=run, entity="allocating")
+        unread = ImportRunEntry.objects.get(run=run, entity="unread")
+        assert 2**25 < allocating.peak_memory - unread.peak_memory
+
+    def test_run_instrumented_cpu_time_of_child_processes(self, study, csv_file):
+        run = ImportRun.objects.create(study=study)
+        run_instrumented(run.id, "forking", _forking_import, csv_file, study)
+        assert 0.2 <= ImportRunEntry.objects.get(run=run).cpu_time
+
+    def test_run_instrumented_without_reading_file(self, study, csv_file):
+        run = ImportRun.objects.create(study=study)
+        run_instrumented(run.id, "sample", _sample_import, csv_file, study)
+        run_instrumented(run.id, "unread", _unread_import, csv_file, study)
+        entry = ImportRunEntry.objects.get(run=run, entity="unread")
+        assert entry.rows is None
+
+    def test_run_instrumented_with_error(self, study, csv_file):
+        run = ImportRun.objects.create(study=study)
+        with TEST_CASE.assertRaisesRegex(ValueError, "sample.csv"):
+            run_instrumented(run.id, "sample", _failing_import, csv_file, study)
+        entry = ImportRunEntry.objects.get(run=run)
+        assert not entry.succeeded
+        assert entry.rows is None
+
+    @pytest.mark.parametrize(
+        "import_function", (_duplicate_study_import, _invalid_sql_import)
+    )
+    def test_run_instrumented_with_error_in_transaction(
+        self, study, csv_file, import_function
+    ):
+        run = ImportRun.objects.create(study=study)
+        with TEST_CASE.assertRaises(DatabaseError):
+            with transaction.atomic():
+                run_instrumented(run.id, "sample", import_function, csv_file, study)
+        # The entry is rolled back with the transaction of the failed import.
+        assert not ImportRunEntry.objects.filter(run=run).exists()
+
+    def test_format_report(self, study, csv_file):
+        run = ImportRun.objects.create(study=study)
+        run_instrumented(run.id, "sample", _sample_import, csv_file, study)
+        run_instrumented(run.id, "sample", _sample_import, csv_file, study)
+        with TEST_CASE.assertRaises(ValueError):
+            run_instrumented(run.id, "failing", _failing_import, csv_file, study)
+        report = format_report(run).splitlines()
+        assert report[0].startswith("Entity")
+        sample_line = next(line for line in report if line.startswith("sample"))
+        assert ["sample", "2"] == sample_line.split()[:2]
+        assert any(line.startswith("failing (failed)") for line in report)
+        assert report[-1].startswith("Total (failed)")
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_import_path")
+def test_manager_records_import_run(study):
+    manager = StudyImportManager(study, redis=False)
+    manager.import_single_entity("periods")
+    entry = ImportRunEntry.objects.get(run=manager.run)
+    assert "periods" == entry.entity
+    assert entry.filename.endswith("periods.csv")
+    assert 0 < entry.queries
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for the incremental JSON reader in ddionrails.imports app """
+
+import json
+from io import StringIO
+
+import pytest
+
+from ddionrails.imports.json_stream import (
+    JSONStreamReader,
+    iter_json_items,
+    read_json_object,
+)
+
+pytestmark = [pytest.mark.imports]
+
+INSTRUMENT = {
+    "label": 'Some [instrument] with "quotes", {braces} and ümlauts',
+    "questions": {
+        "1": {"question": "1", "sn": 1, "items": [{"item": "a", "values": [1, 2.5]}]},
+        "2": {"question": "2", "sn": 12345678, "items": []},
+    },
+    "period": 2001.0,
+    "analysis_unit": None,
+}
+
+
+def _members(content, chunk_size):
+    reader = JSONStreamReader(StringIO(content), chunk_size=chunk_size)
+    return [(key, reader.value()) for key in reader.members()]
+
+
+@pytest.mark.parametrize("chunk_size", (1, 2, 3, 7, 1024))
+def test_members_with_any_chunk_size(chunk_size):
+    content = json.dumps([1234567, -0.5e10, True, None, "a,b]", {"nested": [1, {}]}])
+    expected = [(None, value) for value in json.loads(content)]
+    assert expected == _members(content, chunk_size)
+    content = json.dumps(INSTRUMENT, indent=4)
+    assert list(INSTRUMENT.items()) == _members(content, chunk_size)
+
+
+def test_members_of_empty_containers():
+    assert [] == _members(" [ ] ", 1)
+    assert [] == _members("{}", 1)
+
+
+def test_iter_json_items():
+    content = json.dumps([{"name": "some-variable"}, {"name": "other-variable"}])
+    assert [
+        (None, {"name": "some-variable"}),
+        (None, {"name": "other-variable"}),
+    ] == list(iter_json_items(StringIO(content)))
+
+
+def test_iter_json_items_with_path():
+    content = json.dumps(INSTRUMENT)
+    assert list(INSTRUMENT["questions"].items()) == list(
+        iter_json_items(StringIO(content), ("questions",))
+    )
+    assert [] == list(iter_json_items(StringIO(content), ("missing",)))
+
+
+def test_read_json_object():
+    content = json.dumps(INSTRUMENT)
+    expected = {key: value for key, value in INSTRUMENT.items() if key != "questions"}
+    assert expected == read_json_object(StringIO(content), exclude=("questions",))
+
+
+@pytest.mark.parametrize("content", ("[1, 2", "[1 2]", '{"a" 1}', '{"a": tru}', "1"))
+def test_invalid_json(content):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_items(StringIO(content)))
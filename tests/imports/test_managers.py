@@ -3,9 +3,17 @@
 
 """ Test cases for ddionrails.imports.manager """
 
+import json
+from pathlib import Path
+
 import pytest
 
-from ddionrails.imports.manager import Repository
+from ddionrails.data.models import Variable
+from ddionrails.imports import manager as manager_module
+from ddionrails.imports.instrumentation import run_instrumented
+from ddionrails.imports.manager import IMPORT_DEPENDENCIES, Repository, StudyImportManager
+from ddionrails.instruments.imports import question_import, question_variable_import
+from ddionrails.studies.models import Study
 
 pytestmark = [pytest.mark.imports]
 
@@ -82,6 +90,7 @@ class TestRepository:
         result = repository.list_changed_files()
         expected = ["1.txt", "2.txt"]
         assert expected == result
+        assert "statistics/" in mocked_repo.git.diff.call_args.args
 
     def test_list_all_files_method(self, repository):
         result = repository.list_all_files()
@@ -96,3 +105,189 @@ class TestRepository:
         mocked_list_all_files = mocker.patch.object(Repository, "list_all_files")
         repository.import_list(import_all=True)
         mocked_list_all_files.assert_called_once()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_single_entity_in_parallel(settings, tmp_path, mocker):
+    study = Study.objects.create(name="some-study")
+    tmp_path.joinpath("datasets").mkdir()
+    for dataset in ("some-dataset", "other-dataset"):
+        tmp_path.joinpath("datasets", f"{dataset}.json").write_text(
+            json.dumps([{"name": f"{dataset}-variable"}]), encoding="utf8"
+        )
+    mocker.patch.object(Study, "import_path", return_value=tmp_path)
+    settings.IMPORT_WORKERS = 2
+    pool = mocker.spy(manager_module, "import_files_in_parallel")
+    manager = StudyImportManager(study, redis=False)
+
+    assert [] == manager.import_single_entity("datasets.json")
+    pool.assert_called_once()
+    assert {"some-dataset-variable", "other-dataset-variable"} == set(
+        Variable.objects.values_list("name", flat=True)
+    )
+    assert 2 == manager.run.entries.count()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_import_path")
+class TestStudyImportManagerScheduling:
+    def test_import_order_satisfies_dependencies(self, study):
+        manager = StudyImportManager(study)
+        order = list(manager.import_order.keys())
+        assert set(order) == set(IMPORT_DEPENDENCIES.keys())
+        for entity, dependencies in IMPORT_DEPENDENCIES.items():
+            for dependency in dependencies:
+                assert order.index(dependency) < order.index(entity)
+
+    def test_import_all_entities_chains_jobs(self, study, mocker):
+        jobs = {}
+
+        def _enqueue(function, *args, **kwargs):
+            assert run_instrumented is function
+            import_function = args[2]
+            job = mocker.MagicMock(name=import_function.__name__)
+            jobs[import_function] = (job, kwargs.get("depends_on", []))
+            return job
+
+        mocker.patch("django_rq.enqueue", side_effect=_enqueue)
+        manager = StudyImportManager(study)
+        manager.import_all_entities()
+
+        question_job, question_dependencies = jobs[question_import.question_import]
+        relation_job, relation_dependencies = jobs[
+            question_variable_import.question_variable_import
+        ]
+        assert question_job in relation_dependencies
+        assert relation_job not in question_dependencies
+
+    def test_import_entities_skips_missing_dependencies(self, study, mocker):
+        mocked_import_single_entity = mocker.patch.object(
+            StudyImportManager, "import_single_entity"
+        )
+        periods_job = mocker.MagicMock()
+        mocked_import_single_entity.side_effect = lambda entity, **_: {
+            "periods": [periods_job]
+        }.get(entity, [])
+        manager = StudyImportManager(study)
+        manager.import_entities(["datasets.json", "periods", "datasets.csv"])
+
+        calls = mocked_import_single_entity.call_args_list
+        assert ["periods", "datasets.csv", "datasets.json"] == [
+            call.args[0] for call in calls
+        ]
+        assert [periods_job] == calls[2].kwargs["depends_on"]
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("mock_import_path")
+class TestStudyImportManagerIncremental:
+    def test_changed_entities(self):
+        entities = StudyImportManager.changed_entities(
+            [Path("periods.csv"), Path("instruments/some-instrument.json")]
+        )
+        assert {"periods", "instruments.json"} == entities
+
+    def test_with_dependents(self):
+        entities = StudyImportManager.with_dependents(["questions"])
+        assert "answers_relations" in entities
+        assert "questions_variables" in entities
+        assert "variables" not in entities
+
+    def test_import_changed_entities_single_file(self, study, mocker):
+        mocked_import_entities = mocker.patch.object(
+            StudyImportManager, "import_entities"
+        )
+        manager = StudyImportManager(study, redis=False)
+        manager.import_changed_entities(["ddionrails/instruments/some-instrument.json"])
+        entities, entity_files = mocked_import_entities.call_args.args
+        assert "instruments.json" in entities
+        assert "questions" in entities
+        assert "periods" not in entities
+        assert {
+            "instruments.json": [Path("instruments/some-instrument.json")]
+        } == entity_files
+
+    def test_import_changed_entities_with_changed_dependency(self, study, mocker):
+        mocked_import_entities = mocker.patch.object(
+            StudyImportManager, "import_entities"
+        )
+        manager = StudyImportManager(study, redis=False)
+        manager.import_changed_entities(
+            ["ddionrails/periods.csv", "ddionrails/instruments/some-instrument.json"]
+        )
+        entities, entity_files = mocked_import_entities.call_args.args
+        assert {"periods", "instruments.json", "datasets.json"}.issubset(entities)
+        assert {} == entity_files
+
+    def test_import_changed_entities_with_statistics_file(self, study, mocker):
+        mocked_import_entities = mocker.patch.object(
+            StudyImportManager, "import_entities"
+        )
+        manager = StudyImportManager(study, redis=False)
+        statistics_file = manager.base_dir.parent.joinpath(
+            "statistics", "some-dataset", "categorical", "some-variable.csv"
+        )
+        statistics_file.parent.mkdir(parents=True)
+        statistics_file.write_text("year,value\n", encoding="utf8")
+        manager.import_changed_entities(
+            ["statistics/some-dataset/categorical/some-variable.csv"]
+        )
+        entities, _ = mocked_import_entities.call_args.args
+        assert {"statistics"} == entities
+
+    def test_import_changed_entities_with_deleted_file(self, study, mocker):
+        mocked_import_all_entities = mocker.patch.object(
+            StudyImportManager, "import_all_entities"
+        )
+        manager = StudyImportManager(study, redis=False)
+        manager.import_changed_entities(["ddionrails/instruments/deleted.json"])
+        mocked_import_all_entities.assert_called_once()
+
+
+@pytest.mark.django_db
+class TestStudyImportManagerFinishImport:
+    def _manager(self, study, mocker, redis):
+        manager = StudyImportManager(study, redis=redis)
+        manager.repo.repo = mocker.MagicMock()
+        manager.repo.repo.head.commit = "2"
+        manager.start_run()
+        return manager
+
+    def test_finish_import(self, study, mocker):
+        manager = self._manager(study, mocker, redis=False)
+        manager.finish_import({})
+        study.refresh_from_db()
+        assert "2" == study.current_commit
+
+    def test_finish_import_queued(self, study, mocker):
+        mocked_enqueue = mocker.patch("django_rq.enqueue")
+        manager = self._manager(study, mocker, redis=True)
+        job = mocker.MagicMock()
+        manager.finish_import({"periods": [job], "topics.csv": []})
+        mocked_enqueue.assert_called_once_with(
+            manager_module.save_imported_commit, study.id, "2", depends_on=[job]
+        )
+        study.refresh_from_db()
+        assert "" == study.current_commit
+
+    def test_finish_import_queued_shadow(self, study, mocker):
+        mocked_enqueue = mocker.patch("django_rq.enqueue")
+        manager = StudyImportManager(study, shadow=True)
+        manager.repo.repo = mocker.MagicMock()
+        manager.repo.repo.head.commit = "2"
+        manager.start_run()
+        job = mocker.MagicMock()
+        manager.finish_import({"periods": [job]})
+        swap_job = mocked_enqueue.return_value
+        assert [
+            mocker.call(
+                manager_module.swap_shadow_schema, manager.run.id, depends_on=[job]
+            ),
+            mocker.call(
+                manager_module.remove_stale_rows, manager.run.id, depends_on=[swap_job]
+            ),
+            mocker.call(
+                manager_module.save_imported_commit, study.id, "2", depends_on=[swap_job]
+            ),
+        ] == mocked_enqueue.call_args_list
+        manager.discard_shadow()
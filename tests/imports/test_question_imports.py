@@ -1,4 +1,6 @@
 """Test imports from the instruments app."""
+
+import json
 import unittest
 from pathlib import Path
 from shutil import copytree
@@ -7,12 +9,14 @@ from typing import Generator
 
 import pytest
 
+from ddionrails.instruments.imports.instrument_import import InstrumentImport
+from ddionrails.instruments.imports.question_image_import import questions_images_import
 from ddionrails.instruments.imports.question_import import (
     answer_import,
     answer_relation_import,
     question_import,
 )
-from ddionrails.instruments.models import Answer, Instrument, Question
+from ddionrails.instruments.models import Answer, Instrument, Question, QuestionItem
 
 TEST_FILES = Path("./tests/imports/test_data/").absolute()
 
@@ -113,6 +117,91 @@ class QuestionImport(unittest.TestCase):
         for field, value in expected_fields_last_item.items():
             self.assertEqual(value, getattr(question_items[7], field))
 
+    def test_question_reimport(self) -> None:
+        """Only changed questions are written and removed ones are deleted."""
+        questions_file = self.data_dir.joinpath("questions.csv")
+        question_import(file=questions_file, study=self.instrument.study)
+        Question.objects.filter(name="1").update(label="changed")
+        question_import(file=questions_file, study=self.instrument.study)
+        question = Question.objects.get(name="1", instrument=self.instrument)
+        self.assertEqual("changed", question.label)
+        self.assertEqual(8, question.question_items.count())
+
+        with open(questions_file, "r", encoding="utf8") as csv_file:
+            lines = csv_file.readlines()
+        with TemporaryDirectory() as directory:
+            changed_file = Path(directory).joinpath("questions.csv")
+            with open(changed_file, "w", encoding="utf8") as csv_file:
+                csv_file.writelines(
+                    line for line in lines if ",some-instrument,1," not in line
+                )
+            question_import(file=changed_file, study=self.instrument.study)
+        self.assertFalse(Question.objects.filter(name="1").exists())
+        self.assertTrue(Question.objects.filter(name="0").exists())
+
+    def test_question_import_updates_existing_question(self) -> None:
+        """Existing questions get new metadata and keep their other fields."""
+        existing = Question.objects.create(
+            name="1", instrument=self.instrument, label="old", images={"en": "a.png"}
+        )
+        question_import(
+            file=self.data_dir.joinpath("questions.csv"), study=self.instrument.study
+        )
+        question = Question.objects.get(id=existing.id)
+        self.assertEqual(
+            "Please state the first name, sex, and date of birth:", question.label
+        )
+        self.assertEqual({"en": "a.png"}, question.images)
+        self.assertEqual(self.instrument.period, question.period)
+        self.assertEqual(8, question.question_items.count())
+
+    def test_questions_images_import(self) -> None:
+        """Image metadata is written to the images field of the questions."""
+        question_import(
+            file=self.data_dir.joinpath("questions.csv"), study=self.instrument.study
+        )
+        images_file = self.data_dir.joinpath("questions_images.csv")
+        images_file.write_text(
+            "instrument,question,url,label,url_de,label_de\n"
+            "some-instrument,1,https://image.com/1.png,Image,"
+            "https://image.de/1.png,Bild\n",
+            encoding="utf8",
+        )
+        questions_images_import(images_file, self.instrument.study)
+        question = Question.objects.get(name="1", instrument=self.instrument)
+        self.assertEqual(
+            {
+                "de": {"url": "https://image.de/1.png", "label": "Bild"},
+                "en": {"url": "https://image.com/1.png", "label": "Image"},
+            },
+            question.images,
+        )
+
+    def test_instrument_json_import(self) -> None:
+        """Questions of an instrument JSON file are written in bulk."""
+        existing = Question.objects.create(
+            name="1", instrument=self.instrument, label="old", images={"en": "a.png"}
+        )
+        importer = InstrumentImport("some-instrument.json", self.instrument.study)
+        importer.content = json.dumps(
+            {
+                "label": "Some Instrument",
+                "questions": {
+                    "1": {"question": "1", "sn": "1", "label": "first"},
+                    "2": {"question": "2", "sn": "2", "items": [{"item": "a"}]},
+                },
+            }
+        )
+        importer.execute_import()
+
+        existing.refresh_from_db()
+        self.assertEqual("first", existing.label)
+        self.assertEqual({"en": "a.png"}, existing.images)
+        question = Question.objects.get(name="2", instrument=self.instrument)
+        self.assertEqual(2, question.sort_id)
+        self.assertEqual([{"item": "a"}], question.items)
+        self.assertEqual(question.instrument.period, question.period)
+
     def test_answer_import(self) -> None:
         """ Test the import and linking of answers to question items. """
         question_import(
@@ -134,3 +223,17 @@ class QuestionImport(unittest.TestCase):
         first_answers: Answer = first_cat_item.answers.all().order_by("value")
         self.assertEqual(1, first_answers[0].value)
         self.assertEqual(2, first_answers[1].value)
+
+    def test_answer_relation_import_without_question_item(self) -> None:
+        """Categorical items of the questions.csv have to be imported."""
+        question_import(
+            file=self.data_dir.joinpath("questions.csv"), study=self.instrument.study
+        )
+        answer_import(
+            file=self.data_dir.joinpath("answers.csv"), study=self.instrument.study
+        )
+        QuestionItem.objects.filter(scale="cat").delete()
+        with self.assertRaises(QuestionItem.DoesNotExist):
+            answer_relation_import(
+                file=self.data_dir.joinpath("answers.csv"), study=self.instrument.study
+            )
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for shadow schemas of clean imports in ddionrails.imports app """
+
+import pytest
+from django.db import connection
+
+from ddionrails.concepts.models import Concept
+from ddionrails.data.models import Variable
+from ddionrails.imports.models import ImportRun
+from ddionrails.imports.shadow import (
+    create_shadow_schema,
+    current_shadow_schema,
+    drop_shadow_schema,
+    remove_stale_rows,
+    swap_shadow_schema,
+    use_shadow_schema,
+)
+from ddionrails.workspace.models import BasketVariable
+from tests.concepts.factories import ConceptFactory, TopicFactory
+from tests.studies.factories import StudyFactory
+
+pytestmark = [pytest.mark.imports, pytest.mark.django_db]  # pylint: disable=invalid-name
+
+
+def _schema_exists(schema):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.schemata WHERE schema_name = %s", [schema]
+        )
+        return cursor.fetchone() is not None
+
+
+def _copy_to_shadow(*instances):
+    for instance in instances:
+        type(instance).objects.bulk_create([instance])
+
+
+@pytest.fixture(name="run")
+def _run(study):
+    run = ImportRun.objects.create(study=study)
+    create_shadow_schema(run)
+    return run
+
+
+def test_create_and_drop_shadow_schema(run):
+    schema = run.schema
+    assert "import_run_" + str(run.id) == schema
+    assert _schema_exists(schema)
+    drop_shadow_schema(run)
+    assert not _schema_exists(schema)
+    assert "" == ImportRun.objects.get(id=run.id).schema
+
+
+def test_shadow_writes_are_not_visible(run, variable):
+    with use_shadow_schema(run.schema):
+        assert run.schema == current_shadow_schema()
+        assert not Variable.objects.exists()
+        variable.name = "renamed"
+        _copy_to_shadow(variable)
+        assert "renamed" == Variable.objects.get(id=variable.id).name
+    assert current_shadow_schema() is None
+    assert "some-variable" == Variable.objects.get(id=variable.id).name
+
+
+def test_swap_shadow_schema(run, variable, basket):
+    dataset = variable.dataset
+    stale = Variable.objects.create(name="stale-variable", dataset=dataset)
+    BasketVariable.objects.create(basket=basket, variable=variable)
+    BasketVariable.objects.create(basket=basket, variable=stale)
+    variable.label = "changed label"
+    added = Variable(name="added-variable", dataset=dataset)
+    added.id = added.generate_id()
+    with use_shadow_schema(run.schema):
+        _copy_to_shadow(
+            dataset.analysis_unit,
+            dataset.conceptual_dataset,
+            dataset.period,
+            dataset,
+            variable,
+            added,
+        )
+
+    swap_shadow_schema(run.id)
+
+    assert "changed label" == Variable.objects.get(id=variable.id).label
+    assert Variable.objects.filter(id=added.id).exists()
+    assert Variable.objects.filter(id=stale.id).exists()
+
+    remove_stale_rows(run.id)
+
+    assert not Variable.objects.filter(id=stale.id).exists()
+    assert [variable.id] == list(
+        BasketVariable.objects.filter(basket=basket).values_list("variable", flat=True)
+    )
+    assert not _schema_exists(run.schema)
+    assert "" == ImportRun.objects.get(id=run.id).schema
+
+
+def test_shadow_schema_starts_with_shared_rows(study):
+    concept = ConceptFactory(name="other-study-concept")
+    run = ImportRun.objects.create(study=study)
+    create_shadow_schema(run)
+    with use_shadow_schema(run.schema):
+        assert [concept.id] == list(Concept.objects.values_list("id", flat=True))
+    drop_shadow_schema(run)
+
+
+def test_swap_shadow_schema_many_to_many(study):
+    other_study = StudyFactory(name="other-study")
+    topic = TopicFactory(name="some-topic", study=study)
+    other_topic = TopicFactory(name="other-topic", study=other_study)
+    concept = ConceptFactory(name="some-concept")
+    stale_concept = ConceptFactory(name="stale-concept")
+    concept.topics.add(topic, other_topic)
+    stale_concept.topics.add(topic)
+    links = Concept.topics.through.objects
+    run = ImportRun.objects.create(study=study)
+    create_shadow_schema(run)
+    with use_shadow_schema(run.schema):
+        _copy_to_shadow(topic)
+        links.create(concept=concept, topic=topic)
+
+    swap_shadow_schema(run.id)
+    remove_stale_rows(run.id)
+
+    assert {(concept.id, topic.id), (concept.id, other_topic.id)} == set(
+        links.values_list("concept", "topic")
+    )
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for the run scoped source cache in ddionrails.imports app """
+
+import csv
+import os
+
+import pytest
+
+from ddionrails.imports import sources
+from ddionrails.imports.instrumentation import run_instrumented
+from ddionrails.imports.models import ImportRun
+from ddionrails.imports.sources import (
+    SourceCache,
+    activate_source_cache,
+    forget_row_count,
+    read_source,
+    release_source_cache,
+    row_count,
+    source_header,
+    stream_source,
+)
+
+pytestmark = [pytest.mark.imports]  # pylint: disable=invalid-name
+
+CSV_CONTENT = 'name,label\na,"multi\nline"\n\nb\nc,label,extra\n'
+
+
+@pytest.fixture(name="csv_file")
+def _csv_file(tmp_path):
+    csv_file = tmp_path.joinpath("sample.csv")
+    csv_file.write_text(CSV_CONTENT, encoding="utf8")
+    return csv_file
+
+
+@pytest.fixture(name="source_cache")
+def _source_cache():
+    yield activate_source_cache(0)
+    release_source_cache()
+
+
+def _dict_reader_rows(csv_file):
+    with open(csv_file, "r", encoding="utf8") as file:
+        return list(csv.DictReader(file))
+
+
+def test_read_source_without_run(csv_file):
+    release_source_cache()
+    assert _dict_reader_rows(csv_file) == list(read_source(csv_file))
+    assert ("name", "label") == source_header(csv_file)
+
+
+def test_read_source_with_run(csv_file, source_cache):
+    assert _dict_reader_rows(csv_file) == list(read_source(csv_file))
+    assert ("name", "label") == source_header(csv_file)
+    assert source_cache.get(csv_file) is source_cache.get(csv_file)
+
+
+def test_read_source_returns_fresh_rows(csv_file, source_cache):
+    # pylint: disable=unused-argument
+    first = next(read_source(csv_file))
+    first["label"] = "changed"
+    assert "multi\nline" == next(read_source(csv_file))["label"]
+
+
+def test_stream_source_bypasses_cache(csv_file, source_cache):
+    assert _dict_reader_rows(csv_file) == list(stream_source(csv_file))
+    assert {} == source_cache._sources  # pylint: disable=protected-access
+
+
+def test_row_count_of_streamed_file(csv_file):
+    forget_row_count(csv_file)
+    rows = stream_source(csv_file)
+    next(rows)
+    assert row_count(csv_file) is None
+    list(rows)
+    assert 3 == row_count(csv_file)
+
+
+def test_row_count_of_cached_file(csv_file, source_cache):
+    # pylint: disable=unused-argument
+    forget_row_count(csv_file)
+    next(read_source(csv_file))
+    assert 3 == row_count(csv_file)
+
+
+def test_source_cache_parses_changed_files(csv_file):
+    cache = SourceCache()
+    first = cache.get(csv_file)
+    csv_file.write_text("name,label\nd,other label\n", encoding="utf8")
+    os.utime(csv_file, ns=(first.modified + 10**9, first.modified + 10**9))
+    assert [{"name": "d", "label": "other label"}] == list(cache.get(csv_file))
+
+
+def test_source_cache_invalidate(csv_file):
+    cache = SourceCache()
+    first = cache.get(csv_file)
+    cache.invalidate(csv_file)
+    assert first is not cache.get(csv_file)
+
+
+@pytest.mark.django_db
+def test_run_instrumented_shares_source_cache(study, csv_file):
+    run = ImportRun.objects.create(study=study)
+    parsed = []
+
+    def _import(file, _study):
+        parsed.append(sources._CACHE.get(file))  # pylint: disable=protected-access
+
+    try:
+        run_instrumented(run.id, "sample", _import, csv_file, study)
+        run_instrumented(run.id, "sample", _import, csv_file, study)
+    finally:
+        release_source_cache()
+    assert parsed[0] is parsed[1]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for the COPY based bulk loader in ddionrails.imports app """
+
+import pytest
+
+from ddionrails.data.models import Variable
+from ddionrails.imports.helpers import hash_with_namespace_uuid
+from ddionrails.imports.staging import CopyStream, copy_loader_enabled, copy_upsert
+from ddionrails.instruments.models import QuestionVariable
+
+pytestmark = [pytest.mark.imports, pytest.mark.django_db]
+
+
+def _variable(dataset, name, **fields):
+    variable = Variable(dataset=dataset, name=name, **fields)
+    variable.id = hash_with_namespace_uuid(dataset.id, name, cache=False)
+    return variable
+
+
+def test_copy_loader_enabled(settings):
+    settings.IMPORT_COPY_LOADER = False
+    assert not copy_loader_enabled()
+    settings.IMPORT_COPY_LOADER = True
+    assert copy_loader_enabled()
+
+
+def test_copy_stream_reads_in_parts(dataset):
+    variables = [_variable(dataset, name) for name in ("a", "b", "c")]
+    stream = CopyStream(variables, [Variable._meta.get_field("name")])
+    assert "a\nb" == stream.read(3)
+    assert "\nc\n" == stream.read(10)
+    assert "" == stream.read(10)
+
+
+def test_copy_upsert_inserts_variables(dataset):
+    description = 'Tab\tnew line\nback\\slash "quoted" \\N ümlaut'
+    variables = [
+        _variable(dataset, "some-variable", description=description),
+        _variable(dataset, "other-variable", statistics_flag=True),
+    ]
+    assert 2 == copy_upsert(Variable, variables)
+    variable = Variable.objects.get(name="some-variable")
+    assert description == variable.description
+    assert variable.dataset == dataset
+    assert Variable.objects.get(name="other-variable").statistics_flag
+
+
+def test_copy_upsert_updates_variables(dataset):
+    _variable(dataset, "some-variable", label="label", description="old").save()
+    variables = [
+        _variable(dataset, "some-variable", label="changed", description="first"),
+        _variable(dataset, "some-variable", label="changed", description="last"),
+    ]
+    copy_upsert(Variable, variables, ["description"])
+    variable = Variable.objects.get(name="some-variable")
+    # The last occurrence wins and only the update fields are changed.
+    assert "last" == variable.description
+    assert "label" == variable.label
+
+
+def test_copy_upsert_ignores_existing_variables(dataset):
+    _variable(dataset, "some-variable", description="old").save()
+    copy_upsert(Variable, [_variable(dataset, "some-variable", description="new")])
+    assert "old" == Variable.objects.get(name="some-variable").description
+
+
+def test_copy_upsert_with_automatic_primary_key(question, variable):
+    relations = [
+        QuestionVariable(question=question, variable=variable),
+        QuestionVariable(question=question, variable=variable),
+    ]
+    copy_upsert(QuestionVariable, relations)
+    assert 1 == QuestionVariable.objects.count()
+    copy_upsert(QuestionVariable, relations)
+    assert 1 == QuestionVariable.objects.count()
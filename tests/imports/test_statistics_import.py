@@ -1,15 +1,57 @@
 """ Statistics import related tests. """
 import unittest
+from csv import DictReader
 from pathlib import Path
+from shutil import rmtree
 
+import numpy as np
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ddionrails.statistics.imports import statistics_import
-from ddionrails.statistics.models import IndependentVariable, VariableStatistic
+from ddionrails.statistics.engine import Microdata, compute_statistics
+from ddionrails.statistics.imports import (
+    StatisticsFileContent,
+    _metadata_import,
+    _read_statistics_files,
+    statistics_import,
+)
+from ddionrails.statistics.models import (
+    IndependentVariable,
+    StatisticsMetadata,
+    VariableStatistic,
+)
 from ddionrails.studies.models import Study
 from tests.data.factories import VariableFactory
 
 
+def file_content_row(path: Path, year: str) -> str:
+    """Copy the last row of a statistics file with another year."""
+    with open(path, "r", encoding="utf8") as file:
+        rows = list(DictReader(file))
+    row = dict(rows[-1], year=year)
+    return ",".join(row[column] for column in rows[0].keys()) + "\n"
+
+
+def test_read_statistics_files_in_parallel(tmp_path: Path, settings) -> None:
+    """Test reading statistics files in a pool of processes."""
+    settings.IMPORT_WORKERS = 2
+    paths = []
+    for year in range(3):
+        path = tmp_path.joinpath(f"{year}.csv")
+        path.write_text(f"year,value\n{2000 + year}\n2010,1\n", encoding="utf8")
+        paths.append(path)
+    contents = _read_statistics_files([(path, "", "") for path in paths])
+    assert [(2000, 2010), (2001, 2010), (2002, 2010)] == [
+        (content.start_year, content.end_year) for content in contents
+    ]
+    assert [path.read_bytes() for path in paths] == [
+        content.content for content in contents
+    ]
+    known = _read_statistics_files([(paths[0], "", contents[0].digest)])
+    assert [StatisticsFileContent(contents[0].digest)] == known
+
+
 @pytest.mark.usefixtures("tmp_import_path")
 @pytest.mark.django_db
 class TestStatisticsImport(unittest.TestCase):
@@ -40,6 +82,11 @@ class TestStatisticsImport(unittest.TestCase):
             linked_variables.add(statistic.variable)
             self.assertEqual(1984, statistic.start_year)
             self.assertEqual(2019, statistic.end_year)
+            self.assertIn("year", statistic.columns["names"])
+            self.assertLess(0, statistic.columns["length"])
+            self.assertTrue(
+                statistic.statistics.storage.exists(statistic.statistics.name + ".gz")
+            )
         self.assertEqual(3, len(linked_variables))
 
     def test_independent_variable_import(self) -> None:
@@ -53,6 +100,98 @@ class TestStatisticsImport(unittest.TestCase):
         )
         self.assertEqual(2, variable.independent_variables.all().count())
 
+    def test_statistics_import_skips_unchanged_files(self) -> None:
+        """Test that only changed statistics files are stored again."""
+        variables_file = self.import_path.joinpath("variables.csv")
+        statistics_import(variables_file, self.study)
+        files = dict(VariableStatistic.objects.values_list("id", "statistics"))
+        changed_file = self.import_path.parent.joinpath(
+            "statistics/numerical/some-variable/some-variable_year.csv"
+        )
+        with open(changed_file, "a", encoding="utf8") as file:
+            file.write(file_content_row(changed_file, year="2020"))
+        statistics_import(variables_file, self.study)
+        changed = VariableStatistic.objects.exclude(
+            statistics__in=list(files.values())
+        ).get()
+        self.assertEqual(
+            ("some-variable", "numerical", []),
+            (
+                changed.variable.name,
+                changed.plot_type,
+                changed.independent_variable_names,
+            ),
+        )
+        self.assertEqual(2020, changed.end_year)
+        self.assertEqual(16, VariableStatistic.objects.count())
+
+    def test_statistics_import_removes_missing_files(self) -> None:
+        """Test that statistics without a file are deleted."""
+        variables_file = self.import_path.joinpath("variables.csv")
+        statistics_import(variables_file, self.study)
+        self.import_path.parent.joinpath(
+            "statistics/numerical/some-variable/some-variable_year_alter_gr.csv"
+        ).unlink()
+        statistics_import(variables_file, self.study)
+        self.assertEqual(15, VariableStatistic.objects.count())
+        variable = VariableStatistic.objects.get(
+            independent_variable_names=["alter_gr", "bildungsniveau"],
+            variable__name="some-variable",
+        )
+        self.assertEqual(2, variable.independent_variables.count())
+
+    def test_metadata_import(self) -> None:
+        """Test that metadata is built with a constant number of queries."""
+        variables_file = self.import_path.joinpath("variables.csv")
+        statistics_import(variables_file, self.study)
+        VariableStatistic.objects.filter(
+            variable__name="some-variable", independent_variable_names=[]
+        ).update(end_year=2021)
+        with CaptureQueriesContext(connection) as queries:
+            _metadata_import(self.study)
+        self.assertEqual(4, len(queries))
+        self.assertEqual(3, StatisticsMetadata.objects.count())
+        metadata = StatisticsMetadata.objects.get(variable__name="some-variable").metadata
+        self.assertEqual(1984, metadata["start_year"])
+        self.assertEqual(2021, metadata["end_year"])
+        self.assertEqual(
+            ["alter_gr", "bildungsniveau"],
+            sorted(dimension["variable"] for dimension in metadata["dimensions"]),
+        )
+
+    def test_import_of_computed_statistics(self) -> None:
+        """Test that files written by the statistics engine can be imported."""
+        statistics_path = self.import_path.parent.joinpath("statistics")
+        rmtree(statistics_path)
+        columns = ["some-variable", "some-other-variable", "some-third-variable"]
+        data = Microdata(
+            {
+                "syear": np.array([2000.0, 2000.0, 2001.0, 2002.0]),
+                "alter_gr": np.array([1.0, 2.0, 1.0, 2.0]),
+                "bildungsniveau": np.array([1.0, 1.0, 2.0, 2.0]),
+                **{name: np.array([1.0, 2.0, 3.0, 4.0]) for name in columns},
+            },
+            "syear",
+        )
+        compute_statistics(
+            data,
+            {
+                "some-variable": "numerical",
+                "some-other-variable": "categorical",
+                "some-third-variable": "ordinal",
+            },
+            statistics_path,
+            ["alter_gr", "bildungsniveau"],
+        )
+        statistics_import(self.import_path.joinpath("variables.csv"), self.study)
+        self.assertEqual(16, VariableStatistic.objects.count())
+        statistic = VariableStatistic.objects.get(
+            variable__name="some-variable",
+            independent_variable_names=["alter_gr", "bildungsniveau"],
+        )
+        self.assertEqual((2000, 2002), (statistic.start_year, statistic.end_year))
+        self.assertEqual(2, statistic.independent_variables.count())
+
     def tearDown(self) -> None:
         Study.objects.filter(name="some-study").delete()
         return super().tearDown()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for the synthetic study generator in ddionrails.imports app """
+
+import csv
+import json
+from unittest.mock import patch
+
+import pytest
+
+from ddionrails.data.models import Variable
+from ddionrails.imports.manager import StudyImportManager
+from ddionrails.imports.synthetic import SyntheticStudy, SyntheticStudyScale
+
+pytestmark = [pytest.mark.imports]
+
+SCALE = SyntheticStudyScale(
+    datasets=2, variables=4, instruments=1, questions=3, statistics=2
+)
+
+
+def _read_csv(path):
+    with open(path, "r", encoding="utf8") as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def test_synthetic_study_files(tmp_path):
+    import_path = SyntheticStudy("some-study", SCALE).write(tmp_path)
+
+    variables = _read_csv(import_path.joinpath("variables.csv"))
+    # The first dataset contains the dimension variable of the statistics.
+    assert 2 * 4 + 1 == len(variables)
+    assert 2 == len([row for row in variables if row["statistics"] == "True"])
+    questions = _read_csv(import_path.joinpath("questions.csv"))
+    assert 3 * SCALE.items == len(questions)
+    with open(
+        import_path.joinpath("datasets", "dataset-1.json"), encoding="utf8"
+    ) as file:
+        assert 4 == len(json.load(file))
+    for variable in (row for row in variables if row["statistics"] == "True"):
+        statistics_path = tmp_path.joinpath(
+            "statistics", variable["type"], variable["name"]
+        )
+        assert statistics_path.joinpath("meta.json").is_file()
+        assert statistics_path.joinpath(f"{variable['name']}_year_sex.csv").is_file()
+
+
+def test_synthetic_study_is_deterministic(tmp_path):
+    first = SyntheticStudy("some-study", SCALE, seed=1).write(tmp_path / "first")
+    second = SyntheticStudy("some-study", SCALE, seed=1).write(tmp_path / "second")
+    for file in first.rglob("*"):
+        if file.is_file():
+            relative = file.relative_to(first)
+            assert file.read_bytes() == second.joinpath(relative).read_bytes()
+
+
+@pytest.mark.django_db
+def test_synthetic_study_import(study, tmp_path):
+    import_path = SyntheticStudy(study.name, SCALE).write(tmp_path)
+    with patch("ddionrails.studies.models.Study.import_path", return_value=import_path):
+        manager = StudyImportManager(study, redis=False)
+        manager.import_entities(
+            ["concepts", "periods", "analysis_units", "conceptual_datasets"]
+            + ["datasets.csv", "datasets.json", "variables"]
+        )
+    assert 2 * 4 + 1 == Variable.objects.filter(dataset__study=study).count()
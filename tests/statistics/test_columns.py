@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for the columnar statistics store in ddionrails.statistics app """
+
+import json
+
+import pytest
+
+from ddionrails.statistics.columns import (
+    build_column_store,
+    select_rows,
+    slice_columns,
+    to_csv,
+)
+
+CSV_CONTENT = (
+    "year,alter_gr,n,percent\n"
+    "2000,16-34 Jahre alt,264,0.5\n"
+    "2000,35-65 Jahre alt,456,\n"
+    "2001,16-34 Jahre alt,270,0.25\n"
+    "2002,35-65 Jahre alt,400,0.75\n"
+)
+
+
+@pytest.fixture(name="store")
+def _store():
+    return build_column_store(CSV_CONTENT.encode("utf8"))
+
+
+def test_build_column_store(store):
+    assert ["year", "alter_gr", "n", "percent"] == store["names"]
+    assert 4 == store["length"]
+    year, alter_gr, number, percent = store["columns"]
+    assert [2000, 2000, 2001, 2002] == year
+    assert {"levels": ["16-34 Jahre alt", "35-65 Jahre alt"], "codes": [0, 1, 0, 1]} == (
+        alter_gr
+    )
+    assert [264, 456, 270, 400] == number
+    assert [0.5, None, 0.25, 0.75] == percent
+    assert store == json.loads(json.dumps(store))
+
+
+def test_select_rows(store):
+    assert [0, 1, 2, 3] == select_rows(store)
+    assert [0, 1, 2, 3] == select_rows(store, start_year=2000, end_year=2002)
+    assert [2, 3] == select_rows(store, start_year=2001)
+    assert [0, 1] == select_rows(store, end_year=2000)
+    assert [3] == select_rows(
+        store, start_year=2001, filters={"alter_gr": {"35-65 Jahre alt"}}
+    )
+    assert [0, 2] == select_rows(store, filters={"n": {"264", "270"}})
+
+
+def test_select_rows_with_unknown_column(store):
+    with pytest.raises(KeyError):
+        select_rows(store, filters={"sex": {"weiblich"}})
+
+
+def test_slice_columns(store):
+    positions = select_rows(store, filters={"alter_gr": {"35-65 Jahre alt"}})
+    assert {"year": [2000, 2002], "percent": [None, 0.75]} == slice_columns(
+        store, positions, ["percent", "year"]
+    )
+    with pytest.raises(KeyError):
+        slice_columns(store, positions, ["sex"])
+
+
+def test_to_csv(store):
+    assert CSV_CONTENT == to_csv(slice_columns(store, select_rows(store)))
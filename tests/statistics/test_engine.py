@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for the statistics engine in ddionrails.statistics app """
+
+import json
+
+import numpy as np
+import pytest
+
+from ddionrails.statistics.columns import build_column_store
+from ddionrails.statistics.engine import (
+    categorical_statistics,
+    compute_statistics,
+    dimension_sets,
+    numerical_statistics,
+    read_microdata,
+    weighted_quantiles,
+)
+
+MICRODATA = (
+    "syear,weight,income,job,sex\n"
+    "2000,1,10,1,1\n"
+    "2000,1,20,2,2\n"
+    "2000,2,30,1,1\n"
+    "2000,1,,2,2\n"
+    "2000,1,-1,-2,1\n"
+    "2001,1,40,1,\n"
+    "2001,3,60,2,2\n"
+)
+LABELS = {
+    "sex": {"label": "Geschlecht", "values": {"1": "maennlich", "2": "weiblich"}},
+    "job": {"values": {"1": "einfach", "2": "qualifiziert"}},
+}
+
+
+@pytest.fixture(name="microdata")
+def _microdata(tmp_path):
+    microdata_file = tmp_path.joinpath("microdata.csv")
+    microdata_file.write_text(MICRODATA, encoding="utf8")
+    labels_file = tmp_path.joinpath("labels.json")
+    labels_file.write_text(json.dumps(LABELS), encoding="utf8")
+    return read_microdata(
+        microdata_file, ["income", "job", "sex"], weight="weight", labels=labels_file
+    )
+
+
+def test_read_microdata_marks_missing_values(microdata):
+    assert [10, 20, 30] == microdata.columns["income"][:3].tolist()
+    assert np.isnan(microdata.columns["income"][3:5]).all()
+    assert np.isnan(microdata.columns["sex"][5])
+
+
+def test_read_microdata_with_missing_column(tmp_path):
+    microdata_file = tmp_path.joinpath("microdata.csv")
+    microdata_file.write_text(MICRODATA, encoding="utf8")
+    with pytest.raises(KeyError, match="wage"):
+        read_microdata(microdata_file, ["wage"])
+
+
+def test_weighted_quantiles():
+    values = np.array([3.0, 1.0, 2.0, 4.0, 10.0])
+    weights = np.array([1.0, 1.0, 1.0, 3.0, 1.0])
+    group = np.array([0, 0, 0, 1, 1])
+    assert [2.0, 4.0] == weighted_quantiles(
+        values, weights, group, np.array([0.5, 0.5])
+    ).tolist()
+    assert [1.0, 10.0] == weighted_quantiles(
+        values, weights, group, np.array([0.0, 1.0])
+    ).tolist()
+
+
+def test_numerical_statistics(microdata):
+    rows = numerical_statistics(microdata, "income")
+    assert [2000, 2001] == [row[0] for row in rows]
+    year, mean, median, count, mean_lower, mean_upper, *median_bounds = rows[0]
+    assert 2000 == year
+    assert 22.5 == pytest.approx(mean)
+    assert 20.0 == median
+    assert 3 == count
+    assert mean_lower < mean < mean_upper
+    assert pytest.approx(mean - mean_lower) == mean_upper - mean
+    assert all(10.0 <= bound <= 30.0 for bound in median_bounds)
+    assert 55.0 == pytest.approx(rows[1][1])
+
+
+def test_numerical_statistics_with_dimension(microdata):
+    rows = numerical_statistics(microdata, "income", ["sex"])
+    assert [(2000, "maennlich"), (2000, "weiblich"), (2001, "weiblich")] == [
+        tuple(row[:2]) for row in rows
+    ]
+    assert pytest.approx(70 / 3) == rows[0][2]
+
+
+def test_categorical_statistics(microdata):
+    rows = categorical_statistics(microdata, "job", ["sex"])
+    assert [
+        ["einfach", 2000, "maennlich", 2, 1.0],
+        ["qualifiziert", 2000, "weiblich", 2, 1.0],
+        ["qualifiziert", 2001, "weiblich", 1, 1.0],
+    ] == [row[:5] for row in rows]
+    rows = categorical_statistics(microdata, "job")
+    assert ["einfach", 2000, 2, 0.6] == pytest.approx(rows[0][:4])
+    assert ["qualifiziert", 2000, 2, 0.4] == pytest.approx(rows[1][:4])
+    assert ["einfach", 2001, 1, 0.25] == pytest.approx(rows[2][:4])
+    assert 0 <= rows[2][4] < 0.25 < rows[2][5] <= 1
+
+
+def test_dimension_sets():
+    assert [(), ("a",), ("b",), ("a", "b")] == dimension_sets(["a", "b"])
+    assert [(), ("a",), ("b",)] == dimension_sets(["a", "b"], 1)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compute_statistics(microdata, tmp_path, workers):
+    base_path = tmp_path.joinpath("statistics")
+    files = compute_statistics(
+        microdata,
+        {"income": "ordinal", "job": "categorical"},
+        base_path,
+        ["sex"],
+        1,
+        workers,
+    )
+    assert {
+        "numerical/income/income_year.csv",
+        "numerical/income/income_year_sex.csv",
+        "categorical/income/income_year.csv",
+        "categorical/income/income_year_sex.csv",
+        "categorical/job/job_year.csv",
+        "categorical/job/job_year_sex.csv",
+    } == {file.relative_to(base_path).as_posix() for file in files}
+    store = build_column_store(
+        base_path.joinpath("numerical/income/income_year_sex.csv").read_bytes()
+    )
+    assert [
+        "year",
+        "sex",
+        "mean",
+        "median",
+        "n",
+        "mean_lower_confidence",
+        "mean_upper_confidence",
+        "median_lower_confidence",
+        "median_upper_confidence",
+    ] == store["names"]
+    assert ["job", "year", "n", "percent"] == build_column_store(
+        base_path.joinpath("categorical/job/job_year.csv").read_bytes()
+    )["names"][:4]
+    meta = json.loads(base_path.joinpath("categorical/job/meta.json").read_text("utf8"))
+    assert [
+        {"variable": "sex", "label": "Geschlecht", "values": ["maennlich", "weiblich"]}
+    ] == meta
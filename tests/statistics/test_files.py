@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring
+
+""" Test cases for precompressed statistics files in ddionrails.statistics app """
+
+import gzip
+
+import pytest
+from django.core.files.storage import FileSystemStorage
+
+from ddionrails.statistics.files import (
+    ENCODINGS,
+    accepted_encodings,
+    encoded_name,
+    preferred_encoding,
+    store_encoded_variants,
+)
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        ("", []),
+        ("gzip", ["gzip"]),
+        ("GZip, br;q=0.5, identity", ["gzip", "br", "identity"]),
+        ("gzip;q=0, br;q=0.0", []),
+        ("gzip;q=invalid, deflate", ["deflate"]),
+    ],
+)
+def test_accepted_encodings(header, expected):
+    assert expected == list(accepted_encodings(header))
+
+
+def test_preferred_encoding():
+    assert "gzip" == preferred_encoding("deflate, gzip")
+    assert preferred_encoding("deflate") is None
+
+
+def test_store_encoded_variants(tmp_path):
+    storage = FileSystemStorage(location=tmp_path)
+    store_encoded_variants(storage, "some.csv", b"old")
+    store_encoded_variants(storage, "some.csv", b"year\n2000\n")
+    assert {encoded_name("some.csv", encoding) for encoding in ENCODINGS} == {
+        path.name for path in tmp_path.iterdir()
+    }
+    with storage.open("some.csv.gz", "rb") as file:
+        assert b"year\n2000\n" == gzip.decompress(file.read())
@@ -3,9 +3,12 @@
 """ HTTP status codes for test cases """
 
 HTTP_200_OK = 200
+HTTP_206_PARTIAL_CONTENT = 206
 HTTP_302_FOUND = 302
+HTTP_304_NOT_MODIFIED = 304
 HTTP_400_BAD_REQUEST = 400
 HTTP_401_UNAUTHORIZED = 401
 HTTP_403_FORBIDDEN = 403
 HTTP_404_NOT_FOUND = 404
+HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE = 416
 HTTP_500_INTERNAL_SERVER_ERROR = 500
@@ -41,6 +41,23 @@ class TestStudyImport:
         response = study_importer.import_element(invalid_study_data)
         assert response is None
 
+    def test_import_batch(self, study_importer):
+        study_data = [
+            dict(name="Some-Study", repo="some-repo"),
+            dict(name="other-study", repo="other-repo"),
+            dict(name=""),
+        ]
+        response = study_importer.import_batch(study_data)
+        assert 2 == len(response)
+        study = Study.objects.get(name="some-study")
+        assert study.id == study.generate_id()
+        modified = study.modified
+
+        study_importer.import_batch([dict(name="some-study", repo="changed-repo")])
+        study.refresh_from_db()
+        assert "changed-repo" == study.repo
+        assert modified < study.modified
+
 
 class TestStudyDescriptionImport:
     def test_import_with_valid_data(self, study_description_importer):